@@ -0,0 +1,19 @@
+"""
+ASGI config for app project.
+
+Django 2.2 only speaks WSGI, so the WSGI application is adapted with
+asgiref and each request runs on a worker thread. It exposes the ASGI
+callable as a module-level variable named ``application``.
+
+Serve it with uvicorn workers under gunicorn, see app.gunicorn_conf.
+"""
+
+import os
+
+from asgiref.wsgi import WsgiToAsgi
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+
+application = WsgiToAsgi(get_wsgi_application())
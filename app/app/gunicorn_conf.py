@@ -0,0 +1,59 @@
+"""
+Gunicorn config for serving the app in production.
+
+WSGI workers::
+
+    gunicorn -c python:app.gunicorn_conf app.wsgi:application
+
+ASGI workers::
+
+    GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker \\
+        gunicorn -c python:app.gunicorn_conf app.asgi:application
+
+The app is imported once in the master and workers are forked from it.
+Every worker is replaced gracefully after about GUNICORN_MAX_REQUESTS
+requests to bound memory growth.
+"""
+
+import gc
+import multiprocessing
+import os
+
+
+def cpu_count():
+    """ Return the CPUs this process may run on, e.g. a container's quota. """
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return multiprocessing.cpu_count()
+
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', cpu_count() * 2 + 1))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+
+preload_app = True
+
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = max_requests // 10
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = '-'
+
+
+def when_ready(server):
+    """ Finish importing the app in the master before the first fork. """
+    from django.db import connections
+    from django.urls import get_resolver
+
+    # URLconf and views are otherwise imported by each worker's first
+    # request.
+    get_resolver().url_patterns
+    connections.close_all()
+    # Keep the preloaded objects out of the collector so forked workers
+    # don't copy their pages when it runs.
+    if hasattr(gc, 'freeze'):
+        gc.freeze()
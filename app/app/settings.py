@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
+import importlib.util
 import os
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
@@ -45,13 +46,16 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'app.urls'
@@ -78,20 +82,76 @@ WSGI_APPLICATION = 'app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# Connections are kept open for CONN_MAX_AGE seconds and checked before
+# reuse by the core backend; set DB_CONN_MAX_AGE=0 to close them after
+# every request, e.g. behind pgbouncer in transaction mode.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': os.environ.get('DB_ENGINE', 'core.db.backends.postgresql'),
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 5)),
+        },
     }
 }
 
+# Safe requests on the recipe API read from a replica when DB_REPLICA_HOST
+# is set. The replica alias always exists so tests can run it as a second
+# database.
+DATABASES['replica'] = {
+    **DATABASES['default'],
+    'HOST': os.environ.get('DB_REPLICA_HOST', DATABASES['default']['HOST']),
+    'TEST': {'NAME': 'test_replica'},
+}
+
+DATABASE_ROUTERS = ['core.db.routers.ReplicaRouter']
+
+# Clients read from the primary for PIN_SECONDS after a write. BACKEND
+# optionally names a shared cache alias from CACHES holding the pins.
+READ_REPLICAS = {
+    'ALIASES': ['replica'] if os.environ.get('DB_REPLICA_HOST') else [],
+    'PIN_SECONDS': 5,
+    'PIN_COOKIE': 'primary_pin',
+    'MAX_PINNED': 10000,
+    'BACKEND': os.environ.get('READ_REPLICAS_BACKEND'),
+}
+
+# Caches shared by every worker process live in the 'shared' alias, on
+# memcached when MEMCACHED_LOCATION is set. Without it only the process
+# local default cache exists.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+SHARED_CACHE = None
+if os.environ.get('MEMCACHED_LOCATION'):
+    SHARED_CACHE = 'shared'
+    CACHES[SHARED_CACHE] = {
+        'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+        'LOCATION': os.environ['MEMCACHED_LOCATION'],
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
+# New passwords use Argon2 or bcrypt when their libraries are installed;
+# older hashes are upgraded on the next successful login.
+PASSWORD_HASHERS = [
+    hasher for hasher, module in (
+        ('django.contrib.auth.hashers.Argon2PasswordHasher', 'argon2'),
+        ('django.contrib.auth.hashers.BCryptSHA256PasswordHasher', 'bcrypt'),
+        ('django.contrib.auth.hashers.PBKDF2PasswordHasher', None),
+        ('django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher', None),
+    ) if module is None or importlib.util.find_spec(module)
+]
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -131,4 +191,147 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = '/vol/web/media'
 STATIC_ROOT = '/vol/web/static'
 
+# Media and static files are served by core.views. SENDFILE_BACKEND
+# ('x-accel-redirect' or 'x-sendfile') hands the body to the front end
+# server; with X-Accel-Redirect the file's URL is prefixed with
+# SENDFILE_ACCEL_PREFIX, which nginx must map to an internal location.
+# Hashed filenames are cached for a year, everything else for
+# MEDIA_CACHE_MAX_AGE seconds.
+SENDFILE_BACKEND = os.environ.get('SENDFILE_BACKEND')
+SENDFILE_ACCEL_PREFIX = '/internal'
+MEDIA_CACHE_MAX_AGE = 3600
+
+# Uploads are stored once per content digest, see core.storage.
+DEFAULT_FILE_STORAGE = 'core.storage.ContentAddressedStorage'
+
+# Uploaded recipe images are resized to these widths in a worker pool of
+# RECIPE_IMAGE_WORKERS threads; 0 processes them inline after commit.
+RECIPE_IMAGE_VARIANT_SIZES = (256, 1024)
+RECIPE_IMAGE_WORKERS = int(os.environ.get('RECIPE_IMAGE_WORKERS', 2))
+
 AUTH_USER_MODEL = 'core.User'
+
+
+# Django REST framework
+# https://www.django-rest-framework.org/api-guide/settings/
+
+# The JSON renderer and parser use orjson when it is installed and fall
+# back to the standard library otherwise.
+# NUM_PROXIES is the number of trusted proxies in front of the app. Client
+# addresses, e.g. for login throttling, are read from X-Forwarded-For only
+# as far back as those proxies; with none the header is ignored, as any
+# client could send one.
+REST_FRAMEWORK = {
+    'PAGE_SIZE': int(os.environ.get('API_PAGE_SIZE', 50)),
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'core.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+}
+
+# Tag and ingredient list responses are cached for TIMEOUT seconds in
+# BACKEND, a cache alias every worker shares, so a write in one worker
+# expires the lists of all of them. They aren't cached without one.
+RECIPE_ATTRS_CACHE = {
+    'BACKEND': SHARED_CACHE,
+    'TIMEOUT': 300,
+}
+
+# Pagination classes are set per viewset, PAGE_SIZE only provides the default.
+SILENCED_SYSTEM_CHECKS = ['rest_framework.W001']
+
+# Responses of at least MIN_SIZE bytes are compressed with brotli (when
+# installed) or gzip. METRICS_HOOK names a callable receiving each
+# response's sizes and compression CPU time; by default they are logged.
+COMPRESSION = {
+    'MIN_SIZE': 500,
+    'GZIP_LEVEL': 6,
+    'BROTLI_QUALITY': 4,
+    'METRICS_HOOK': None,
+}
+
+# Login attempts are throttled with token buckets per client IP and per
+# email: BURST attempts at once, refilled at PER_MINUTE.
+LOGIN_THROTTLE = {
+    'MAX_KEYS': 100000,
+    'IP_BURST': 20,
+    'IP_PER_MINUTE': 10,
+    'EMAIL_BURST': 5,
+    'EMAIL_PER_MINUTE': 2,
+}
+
+# Failed credentials are remembered for FAILURE_CACHE_TIMEOUT seconds and
+# password hashes are checked on a pool of HASH_WORKERS threads with at
+# most HASH_MAX_PENDING attempts waiting, see user.login.
+LOGIN = {
+    'FAILURE_CACHE_SIZE': 10000,
+    'FAILURE_CACHE_TIMEOUT': 300,
+    'HASH_WORKERS': int(os.environ.get('LOGIN_HASH_WORKERS', 2)),
+    'HASH_MAX_PENDING': 16,
+    'HASH_TIMEOUT': 10,
+}
+
+# Token lookups are cached per process and, in BACKEND, a cache alias
+# shared by every worker, for TIMEOUT seconds. Each hit checks the token's
+# revocation version in BACKEND, so deleted tokens and deactivated users
+# are refused by every worker at once. Without BACKEND other workers keep
+# accepting them for up to LOCAL_TIMEOUT seconds, the local entries' TTL.
+TOKEN_AUTH_CACHE = {
+    'MAX_SIZE': 10000,
+    'TIMEOUT': 60,
+    'LOCAL_TIMEOUT': 2,
+    'BACKEND': os.environ.get('TOKEN_AUTH_CACHE_BACKEND', SHARED_CACHE),
+}
+
+# Every request is timed and its queries counted, see
+# core.middleware.InstrumentationMiddleware. Views may set query_budget to
+# override QUERY_BUDGET. SERVER_TIMING exposes the timings to clients, so
+# it is only on while debugging. METRICS_ALLOWED_IPS limits who may read
+# /metrics/ to the local host, plus the space separated addresses in
+# METRICS_ALLOWED_IPS, e.g. a Prometheus server's; None allows everyone.
+INSTRUMENTATION = {
+    'SERVER_TIMING': DEBUG,
+    'QUERY_BUDGET': 50,
+    'METRICS_ALLOWED_IPS': ['127.0.0.1', '::1'] + os.environ.get(
+        'METRICS_ALLOWED_IPS', ''
+    ).split(),
+}
+
+# Stacks of RATE percent of requests to VIEWS (view names, all when empty)
+# are sampled every INTERVAL seconds when ENABLED, and of any request
+# sending HEADER_TOKEN in an X-Profile header. Profiles are written to
+# OUTPUT_DIR as collapsed stacks for flame graphs, see
+# core.middleware.ProfilingMiddleware.
+PROFILING = {
+    'ENABLED': bool(os.environ.get('PROFILING_ENABLED')),
+    'VIEWS': [],
+    'RATE': float(os.environ.get('PROFILING_RATE', 1)),
+    'HEADER_TOKEN': os.environ.get('PROFILING_TOKEN'),
+    'INTERVAL': 0.005,
+    'OUTPUT_DIR': os.environ.get('PROFILING_DIR', '/tmp/profiles'),
+}
+
+# Request lines are logged as JSON by core.instrumentation: at INFO for
+# every request, at WARNING for requests over their query budget.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'core.instrumentation': {
+            'handlers': ['console'],
+            'level': os.environ.get('REQUEST_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+    },
+}
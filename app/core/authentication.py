@@ -0,0 +1,131 @@
+import copy
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from core.cache import TTLCache
+
+
+CACHE_SETTINGS = {
+    "MAX_SIZE": 10000,
+    "TIMEOUT": 60,
+    "LOCAL_TIMEOUT": 2,
+    "BACKEND": None,
+}
+CACHE_SETTINGS.update(getattr(settings, "TOKEN_AUTH_CACHE", {}))
+
+
+def local_timeout():
+    """ Return how long a process may reuse a lookup on its own.
+
+    With a shared cache every hit is checked against the token's version
+    there, so entries may live for TIMEOUT. Without one, other processes
+    never hear of a revocation, so entries only live for LOCAL_TIMEOUT.
+    """
+    if CACHE_SETTINGS["BACKEND"]:
+        return CACHE_SETTINGS["TIMEOUT"]
+
+    return CACHE_SETTINGS["LOCAL_TIMEOUT"]
+
+
+token_cache = TTLCache(CACHE_SETTINGS["MAX_SIZE"], local_timeout())
+
+
+def shared_cache():
+    """ Return the configured shared cache backend, if any. """
+    if CACHE_SETTINGS["BACKEND"]:
+        return caches[CACHE_SETTINGS["BACKEND"]]
+
+    return None
+
+
+def _digest(key):
+    """ Return a token's digest, so cache keys don't expose it. """
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def version_key(key):
+    """ Return the shared cache key holding a token's version. """
+    return f"auth-token:version:{_digest(key)}"
+
+
+def get_version(cache, key):
+    """ Return a token's current version, replaced on each revocation. """
+    return cache.get_or_set(version_key(key), lambda: uuid.uuid4().hex, None)
+
+
+def shared_cache_key(key, version):
+    """ Return the shared cache key of a token's lookup at a version. """
+    return f"auth-token:{_digest(key)}:{version}"
+
+
+def invalidate_token(key):
+    """ Stop accepting a token's cached lookup in every process. """
+    token_cache.delete(key)
+    cache = shared_cache()
+    if cache is not None:
+        cache.delete(version_key(key))
+
+
+def invalidate_user(user):
+    """ Stop accepting cached lookups of user's tokens in every process. """
+    token_cache.delete_matching(lambda entry: entry[0].pk == user.pk)
+    cache = shared_cache()
+    if cache is not None:
+        keys = Token.objects.filter(user=user).values_list("key", flat=True)
+        cache.delete_many([version_key(key) for key in keys])
+
+
+def _detached(instance):
+    """ Return a copy of a cached instance sharing no state with it.
+
+    A shallow copy shares ``_state``, and with it the related objects
+    loaded or assigned on the copy, with the cached instance.
+    """
+    clone = copy.copy(instance)
+    clone._state = copy.copy(instance._state)
+    clone._state.fields_cache = {}
+    clone.__dict__.pop("_prefetched_objects_cache", None)
+
+    return clone
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """ Token authentication that caches the token to user lookup.
+
+    Lookups are kept in a per-process LRU with a TTL and, when
+    ``TOKEN_AUTH_CACHE["BACKEND"]`` names a cache alias, in that shared
+    cache too. Every entry records the token's version in the shared
+    cache when it was looked up, and is only used while that version is
+    current; deleting a token or saving its user replaces the version, so
+    every process stops accepting it at once. Without a shared cache,
+    other processes keep accepting it for up to ``LOCAL_TIMEOUT`` seconds.
+    """
+
+    def authenticate_credentials(self, key):
+        cache = shared_cache()
+        # Read before the lookup, so a revocation racing it isn't missed.
+        version = None if cache is None else get_version(cache, key)
+        entry = token_cache.get(key)
+        if entry is None or entry[2] != version:
+            entry = None if cache is None else cache.get(
+                shared_cache_key(key, version)
+            )
+            if entry is None:
+                entry = (*super().authenticate_credentials(key), version)
+                if cache is not None:
+                    cache.set(
+                        shared_cache_key(key, version),
+                        entry,
+                        CACHE_SETTINGS["TIMEOUT"]
+                    )
+            token_cache.set(key, entry)
+        user, token = _detached(entry[0]), _detached(entry[1])
+        token.user = user
+
+        return user, token
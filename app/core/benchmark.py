@@ -0,0 +1,47 @@
+import math
+import time
+from contextlib import contextmanager
+
+from django.db import transaction
+
+
+def percentile(values, pct):
+    """ Return the pct percentile of values using nearest rank. """
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(int(math.ceil(pct / 100 * len(ordered))), 1)
+
+    return ordered[rank - 1]
+
+
+def summarize(timings):
+    """ Return summary statistics for timings in milliseconds. """
+    return {
+        "count": len(timings),
+        "min": min(timings),
+        "p50": percentile(timings, 50),
+        "p95": percentile(timings, 95),
+        "p99": percentile(timings, 99),
+        "max": max(timings),
+        "mean": sum(timings) / len(timings),
+    }
+
+
+def measure(func, repeat):
+    """ Call func repeat times and return each call's time in ms. """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return timings
+
+
+@contextmanager
+def rolled_back():
+    """ Run the block in a transaction that is always rolled back. """
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
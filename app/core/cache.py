@@ -0,0 +1,58 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """ Thread safe in-process LRU mapping with expiring entries. """
+
+    def __init__(self, max_size, timeout):
+        self.max_size = max_size
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        """ Return the live value for key, refreshing its recency. """
+        with self._lock:
+            try:
+                expires, value = self._data[key]
+            except KeyError:
+                return default
+            if expires <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+
+            return value
+
+    def set(self, key, value):
+        """ Store value for key, evicting the least recently used. """
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.timeout, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        """ Remove key if present. """
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_matching(self, predicate):
+        """ Remove every entry whose value satisfies predicate. """
+        with self._lock:
+            stale = [
+                key for key, (_, value) in self._data.items()
+                if predicate(value)
+            ]
+            for key in stale:
+                del self._data[key]
+
+    def clear(self):
+        """ Remove every entry. """
+        with self._lock:
+            self._data.clear()
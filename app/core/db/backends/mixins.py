@@ -0,0 +1,40 @@
+class HealthCheckMixin:
+    """ Check persistent connections are alive before reusing them.
+
+    Mixed into a backend's DatabaseWrapper. With ``CONN_HEALTH_CHECKS``
+    set in the database settings, the first query of each request on a
+    connection kept open by ``CONN_MAX_AGE`` is preceded by a check, and
+    a dead connection is replaced instead of failing the request. Fresh
+    connections and connections inside a transaction aren't checked.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.health_check_enabled = False
+        self.health_check_done = False
+
+    def connect(self):
+        super().connect()
+        self.health_check_enabled = self.settings_dict.get(
+            "CONN_HEALTH_CHECKS", False
+        )
+        self.health_check_done = True
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        # Called as each request starts and finishes, so the connection
+        # is checked again before it next serves a query.
+        self.health_check_done = False
+
+    def close_if_health_check_failed(self):
+        """ Close the connection if it's due a check and no longer works. """
+        if (self.connection is None or not self.health_check_enabled or
+                self.health_check_done or self.in_atomic_block):
+            return
+        if not self.is_usable():
+            self.close()
+        self.health_check_done = True
+
+    def _cursor(self, name=None):
+        self.close_if_health_check_failed()
+        return super()._cursor(name)
@@ -0,0 +1,7 @@
+from django.db.backends.postgresql import base
+
+from core.db.backends.mixins import HealthCheckMixin
+
+
+class DatabaseWrapper(HealthCheckMixin, base.DatabaseWrapper):
+    """ PostgreSQL backend checking persistent connections before reuse. """
@@ -0,0 +1,119 @@
+import random
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+
+from core.cache import TTLCache
+
+
+REPLICA_SETTINGS = {
+    "ALIASES": [],
+    "PIN_SECONDS": 5,
+    "PIN_COOKIE": "primary_pin",
+    "MAX_PINNED": 10000,
+    "BACKEND": None,
+}
+REPLICA_SETTINGS.update(getattr(settings, "READ_REPLICAS", {}))
+
+pinned_users = TTLCache(
+    REPLICA_SETTINGS["MAX_PINNED"],
+    REPLICA_SETTINGS["PIN_SECONDS"]
+)
+_local = threading.local()
+
+
+def read_alias():
+    """ Return the alias reads are routed to, or None for the primary. """
+    return getattr(_local, "alias", None)
+
+
+def route_reads(alias):
+    """ Route this thread's reads to alias until reset with None. """
+    _local.alias = alias
+
+
+def iterate_reading_from(alias, iterable):
+    """ Iterate, routing reads to alias, e.g. for a streamed response. """
+    previous = read_alias()
+    route_reads(alias)
+    try:
+        yield from iterable
+    finally:
+        route_reads(previous)
+
+
+def shared_cache():
+    """ Return the configured shared cache backend, if any. """
+    if REPLICA_SETTINGS["BACKEND"]:
+        return caches[REPLICA_SETTINGS["BACKEND"]]
+
+    return None
+
+
+def pin_key(user):
+    return f"primary-pin:{user.pk}"
+
+
+def pin(request, response):
+    """ Send the client's reads to the primary for the next PIN_SECONDS.
+
+    The pin is kept for the user, in process and in the shared cache, so
+    token clients are covered, and in a cookie so browsers stay pinned on
+    processes without a shared cache.
+    """
+    seconds = REPLICA_SETTINGS["PIN_SECONDS"]
+    if request.user.is_authenticated:
+        pinned_users.set(request.user.pk, True)
+        cache = shared_cache()
+        if cache is not None:
+            cache.set(pin_key(request.user), True, seconds)
+    response.set_cookie(
+        REPLICA_SETTINGS["PIN_COOKIE"],
+        "1",
+        max_age=seconds,
+        httponly=True,
+        samesite="Lax"
+    )
+
+
+def is_pinned(request):
+    """ Return whether the client wrote within the last PIN_SECONDS. """
+    if REPLICA_SETTINGS["PIN_COOKIE"] in request.COOKIES:
+        return True
+    if not request.user.is_authenticated:
+        return False
+    if pinned_users.get(request.user.pk):
+        return True
+    cache = shared_cache()
+
+    return cache is not None and bool(cache.get(pin_key(request.user)))
+
+
+def choose_replica(request):
+    """ Return the replica to read from for request, or None. """
+    aliases = REPLICA_SETTINGS["ALIASES"]
+    if not aliases or is_pinned(request):
+        return None
+
+    return random.choice(aliases)
+
+
+class ReplicaRouter:
+    """ Route reads to the replica chosen for the current request.
+
+    Reads go to the primary unless a view routed them with
+    ``route_reads``; writes always go to the primary, even for objects
+    loaded from a replica.
+    """
+
+    def db_for_read(self, model, **hints):
+        return read_alias()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
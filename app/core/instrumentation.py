@@ -0,0 +1,260 @@
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+
+
+INSTRUMENTATION_SETTINGS = {
+    "SERVER_TIMING": settings.DEBUG,
+    "QUERY_BUDGET": 50,
+    "METRICS_ALLOWED_IPS": ["127.0.0.1", "::1"],
+}
+INSTRUMENTATION_SETTINGS.update(getattr(settings, "INSTRUMENTATION", {}))
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+METRICS = {
+    "http_requests_total": ("counter", "Requests handled."),
+    "http_request_duration_seconds": (
+        "histogram", "Wall time from the first middleware to the response."
+    ),
+    "http_request_queries": ("histogram", "Database queries per request."),
+    "http_request_db_seconds_total": ("counter", "Time spent in queries."),
+    "http_request_serialize_seconds_total": (
+        "counter", "Time spent serializing response data."
+    ),
+    "http_request_render_seconds_total": (
+        "counter", "Time spent rendering response bodies."
+    ),
+    "http_response_bytes_total": ("counter", "Bytes of response bodies."),
+    "http_query_budget_exceeded_total": (
+        "counter", "Requests issuing more queries than their budget."
+    ),
+    "login_hash_in_flight": (
+        "gauge", "Password checks running or waiting for a worker."
+    ),
+    "login_hash_queued": ("gauge", "Password checks waiting for a worker."),
+    "login_hash_max_in_flight": (
+        "gauge", "Most password checks in flight at once."
+    ),
+    "login_hash_completed_total": ("counter", "Password checks finished."),
+    "login_hash_rejected_total": (
+        "counter", "Logins refused because the hashing pool was full."
+    ),
+    "login_hash_timed_out_total": (
+        "counter", "Logins given up on while their password check ran."
+    ),
+}
+
+_local = threading.local()
+
+
+class RequestMetrics:
+    """ Timings and counts collected while handling one request. """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.timings = defaultdict(float)
+        self._depth = defaultdict(int)
+
+    def record_query(self, execute, sql, params, many, context):
+        """ Database execute wrapper counting and timing queries. """
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+    def server_timing(self, wall):
+        """ Return the Server-Timing header value, durations in ms. """
+        entries = [
+            f"total;dur={wall * 1000:.1f}",
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+        ]
+        entries += [
+            f"{name};dur={seconds * 1000:.1f}"
+            for name, seconds in sorted(self.timings.items())
+        ]
+
+        return ", ".join(entries)
+
+
+def current():
+    """ Return the metrics of the request handled on this thread. """
+    return getattr(_local, "metrics", None)
+
+
+def start(metrics):
+    _local.metrics = metrics
+
+
+def finish():
+    _local.metrics = None
+
+
+@contextmanager
+def timed(name):
+    """ Add the block's duration to the current request's name timing.
+
+    Nested blocks with the same name are counted once, so nested
+    serializers don't add their time twice.
+    """
+    metrics = current()
+    if metrics is None:
+        yield
+        return
+    metrics._depth[name] += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics._depth[name] -= 1
+        if not metrics._depth[name]:
+            metrics.timings[name] += time.perf_counter() - started
+
+
+class TimedSerializerMixin:
+    """ Count a serializer's representation time as serialize time. """
+
+    def to_representation(self, instance):
+        with timed("serialize"):
+            return super().to_representation(instance)
+
+
+def _escape(value):
+    return (str(value).replace("\\", "\\\\").replace("\n", "\\n")
+            .replace('"', '\\"'))
+
+
+def _key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in labels)
+
+    return "{" + pairs + "}"
+
+
+class MetricsRegistry:
+    """ Thread safe in-process counters and histograms.
+
+    Each process keeps its own values; scraping a preforked server reads
+    the worker that answers. Values kept elsewhere are read at scrape
+    time from collectors.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._histograms = {}
+        self._collectors = []
+
+    def add_collector(self, collect):
+        """ Render the (name, labels, value) samples collect() returns. """
+        with self._lock:
+            self._collectors.append(collect)
+
+    def inc(self, name, labels, value=1):
+        """ Add value to a counter. """
+        with self._lock:
+            self._counters[name, _key(labels)] += value
+
+    def observe(self, name, labels, value, buckets):
+        """ Record value in a histogram with the given upper bounds. """
+        key = (name, _key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {
+                    "buckets": buckets,
+                    "counts": [0] * len(buckets),
+                    "sum": 0.0,
+                    "count": 0,
+                }
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram["counts"][index] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render(self):
+        """ Return every metric in the Prometheus text format. """
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(
+                (key, dict(value, counts=list(value["counts"])))
+                for key, value in self._histograms.items()
+            )
+            collectors = list(self._collectors)
+        lines = []
+        described = set()
+
+        def describe(name):
+            if name not in described:
+                kind, help_text = METRICS[name]
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                described.add(name)
+
+        for (name, labels), value in counters:
+            describe(name)
+            lines.append(f"{name}{_labels(labels)} {value:g}")
+        for (name, labels), histogram in histograms:
+            describe(name)
+            bounds = [f"{bound:g}" for bound in histogram["buckets"]]
+            for bound, count in zip(bounds + ["+Inf"],
+                                    histogram["counts"] +
+                                    [histogram["count"]]):
+                bucket_labels = labels + (("le", bound),)
+                lines.append(f"{name}_bucket{_labels(bucket_labels)} {count}")
+            lines.append(f"{name}_sum{_labels(labels)} {histogram['sum']:g}")
+            lines.append(f"{name}_count{_labels(labels)} {histogram['count']}")
+        for collect in collectors:
+            for name, labels, value in collect():
+                describe(name)
+                lines.append(f"{name}{_labels(_key(labels))} {value:g}")
+
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+def record(method, view, status, wall, metrics, size, over_budget):
+    """ Add one request's figures to the registry. """
+    labels = {"view": view}
+    registry.inc("http_requests_total", {
+        "method": method,
+        "view": view,
+        "status": status,
+    })
+    registry.observe(
+        "http_request_duration_seconds", labels, wall, DURATION_BUCKETS
+    )
+    registry.observe(
+        "http_request_queries", labels, metrics.queries, QUERY_BUCKETS
+    )
+    registry.inc("http_request_db_seconds_total", labels, metrics.db_time)
+    for name in ("serialize", "render"):
+        registry.inc(
+            f"http_request_{name}_seconds_total",
+            labels,
+            metrics.timings.get(name, 0.0)
+        )
+    if size is not None:
+        registry.inc("http_response_bytes_total", labels, size)
+    if over_budget:
+        registry.inc("http_query_budget_exceeded_total", labels)
@@ -0,0 +1,140 @@
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmark import summarize
+
+
+SERVERS = {
+    "runserver": lambda address: [
+        sys.executable, "manage.py", "runserver", address, "--noreload",
+    ],
+    "gunicorn": lambda address: [
+        sys.executable, "-m", "gunicorn", "-c", "python:app.gunicorn_conf",
+        "--bind", address, "app.wsgi:application",
+    ],
+    "uvicorn": lambda address: [
+        sys.executable, "-m", "gunicorn", "-c", "python:app.gunicorn_conf",
+        "--bind", address, "--worker-class",
+        "uvicorn.workers.UvicornWorker", "app.asgi:application",
+    ],
+}
+
+
+class Command(BaseCommand):
+    """ Django command to benchmark the app under each server. """
+    help = "Compare startup time and steady state latency of servers."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--server",
+            action="append",
+            choices=sorted(SERVERS),
+            help="Server to run, may be repeated. Defaults to all."
+        )
+        parser.add_argument("--port", type=int, default=8100)
+        parser.add_argument("--path", default="/admin/login/")
+        parser.add_argument(
+            "--header",
+            action="append",
+            default=[],
+            help="Request header as 'Name: value', may be repeated."
+        )
+        parser.add_argument("--requests", type=int, default=1000)
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--warmup", type=int, default=50)
+        parser.add_argument("--startup-timeout", type=float, default=60)
+
+    def handle(self, *args, **options):
+        headers = {}
+        for header in options["header"]:
+            name, _, value = header.partition(":")
+            headers[name.strip()] = value.strip()
+        self.stdout.write(
+            f"{'server':<10} {'startup ms':>10} {'req/s':>8} "
+            f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>6}"
+        )
+        for index, name in enumerate(options["server"] or sorted(SERVERS)):
+            address = f"127.0.0.1:{options['port'] + index}"
+            url = f"http://{address}{options['path']}"
+            process = subprocess.Popen(
+                SERVERS[name](address),
+                cwd=settings.BASE_DIR,
+                env=dict(os.environ),
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL
+            )
+            try:
+                startup = self._wait_until_serving(
+                    process, url, options["startup_timeout"]
+                )
+                for _ in range(options["warmup"]):
+                    fetch(url, headers)
+                rate, timings, errors = self._load(url, headers, options)
+            finally:
+                process.terminate()
+                process.wait()
+
+            stats = summarize(timings)
+            self.stdout.write(
+                f"{name:<10} {startup:>10.0f} {rate:>8.0f} "
+                f"{stats['p50']:>8.2f} {stats['p95']:>8.2f} "
+                f"{stats['p99']:>8.2f} {errors:>6}"
+            )
+
+    def _wait_until_serving(self, process, url, timeout):
+        """ Return the ms until the server answers its first request. """
+        started = time.perf_counter()
+        while time.perf_counter() - started < timeout:
+            if process.poll() is not None:
+                raise CommandError(f"Server exited with {process.returncode}")
+            try:
+                fetch(url, {})
+                return (time.perf_counter() - started) * 1000
+            except OSError:
+                time.sleep(0.05)
+
+        raise CommandError(f"Server didn't answer within {timeout} seconds")
+
+    def _load(self, url, headers, options):
+        """ Send the requests concurrently; return rate, timings, errors. """
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options["concurrency"]) as pool:
+            results = list(pool.map(
+                lambda _: timed_fetch(url, headers),
+                range(options["requests"])
+            ))
+        elapsed = time.perf_counter() - started
+        timings = [elapsed_ms for elapsed_ms, _ in results]
+        errors = sum(1 for _, ok in results if not ok)
+
+        return len(results) / elapsed, timings, errors
+
+
+def fetch(url, headers):
+    """ Request url and return its status, raising OSError if unreachable. """
+    request = urllib.request.Request(url, headers=headers)
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as exc:
+        return exc.code
+
+
+def timed_fetch(url, headers):
+    """ Return the ms a request took and whether it succeeded. """
+    started = time.perf_counter()
+    try:
+        ok = fetch(url, headers) < 500
+    except OSError:
+        ok = False
+
+    return (time.perf_counter() - started) * 1000, ok
@@ -0,0 +1,43 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+
+from core.authentication import CachedTokenAuthentication, token_cache
+from core.benchmark import measure, rolled_back, summarize
+
+
+class Command(BaseCommand):
+    """ Django command to benchmark token authentication overhead. """
+    help = "Measure per request token authentication cost."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            user = get_user_model().objects.create_user(
+                "bench-auth@hackfeed.com",
+                "benchpass"
+            )
+            key = Token.objects.create(user=user).key
+            factory = RequestFactory()
+            token_cache.clear()
+
+            for name, auth in (
+                ("TokenAuthentication", TokenAuthentication()),
+                ("CachedTokenAuthentication", CachedTokenAuthentication()),
+            ):
+                def authenticate():
+                    auth.authenticate(Request(
+                        factory.get("/", HTTP_AUTHORIZATION=f"Token {key}")
+                    ))
+
+                stats = summarize(measure(authenticate, options["repeat"]))
+                self.stdout.write(
+                    f"{name:<26} p50 {stats['p50'] * 1000:>8.1f} us  "
+                    f"p99 {stats['p99'] * 1000:>8.1f} us"
+                )
@@ -0,0 +1,118 @@
+import os
+from collections import Counter
+from datetime import datetime, timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import Recipe, RecipeImageVariant, StoredFile
+
+
+UPLOADS_DIR = "uploads"
+
+
+class Command(BaseCommand):
+    """ Django command to remove media files nothing references. """
+    help = "Recount stored file references and delete orphaned uploads."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace",
+            type=int,
+            default=3600,
+            help="Seconds an unreferenced file is kept after it was saved."
+        )
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        cutoff = timezone.now() - timedelta(seconds=options["grace"])
+        references = self._references()
+
+        drifted = self._recount(references, dry_run)
+        removed = self._collect_stored(references, cutoff, dry_run)
+        removed += self._collect_untracked(references, cutoff, dry_run)
+
+        verb = "Would remove" if dry_run else "Removed"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {removed} files, fixed {drifted} reference counts."
+        ))
+
+    def _references(self):
+        """ Count how many rows reference each media file. """
+        references = Counter()
+        for model in (Recipe, RecipeImageVariant):
+            references.update(
+                model.objects.exclude(image="").exclude(image__isnull=True)
+                .values_list("image", flat=True)
+            )
+
+        return references
+
+    def _recount(self, references, dry_run):
+        """ Reset reference counts that drifted from the real references. """
+        drifted = 0
+        stored_files = StoredFile.objects.values_list("id", "name", "refs")
+        for pk, name, refs in stored_files.iterator():
+            actual = references[name]
+            if refs == actual:
+                continue
+            drifted += 1
+            self.stdout.write(f"{name}: {refs} references counted, {actual} "
+                              f"found")
+            if not dry_run:
+                # Skip rows whose count changed since it was read.
+                StoredFile.objects.filter(pk=pk, refs=refs).update(
+                    refs=actual
+                )
+
+        return drifted
+
+    def _collect_stored(self, references, cutoff, dry_run):
+        """ Delete tracked files without references past the grace time. """
+        removed = 0
+        unreferenced = StoredFile.objects.filter(
+            refs=0,
+            created_at__lt=cutoff
+        ).values_list("id", "name")
+        for pk, name in unreferenced.iterator():
+            if references[name]:
+                continue
+            if not dry_run:
+                if not StoredFile.objects.filter(pk=pk, refs=0).delete()[0]:
+                    continue
+                self._remove(name)
+            removed += 1
+            self.stdout.write(f"Orphaned {name}")
+
+        return removed
+
+    def _collect_untracked(self, references, cutoff, dry_run):
+        """ Delete untracked upload files no row references. """
+        removed = 0
+        root = default_storage.path(UPLOADS_DIR)
+        tracked = set(StoredFile.objects.values_list("name", flat=True))
+        for directory, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, default_storage.location)
+                modified = datetime.fromtimestamp(
+                    os.path.getmtime(path),
+                    timezone.utc
+                )
+                if name in references or name in tracked or modified > cutoff:
+                    continue
+                if not dry_run:
+                    self._remove(name)
+                removed += 1
+                self.stdout.write(f"Untracked {name}")
+
+        return removed
+
+    def _remove(self, name):
+        """ Remove a file from disk, bypassing shared storage semantics. """
+        if hasattr(default_storage, "purge"):
+            default_storage.purge(name)
+        else:
+            default_storage.delete(name)
@@ -2,20 +2,65 @@ import time
 
 from django.db import connections
 from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
 
 class Command(BaseCommand):
     """ Django command to pause execution until database is available. """
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--database",
+            default="default",
+            help="Alias of the database to wait for."
+        )
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=60,
+            help="Seconds to wait before giving up."
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=0.5,
+            help="Seconds to wait after the first failed attempt."
+        )
+        parser.add_argument(
+            "--max-interval",
+            type=float,
+            default=5,
+            help="Longest wait between attempts."
+        )
+
     def handle(self, *args, **options):
         self.stdout.write("Waiting for database...")
-        db_conn = None
-        while not db_conn:
+        connection = connections[options["database"]]
+        delay = options["interval"]
+        started = time.monotonic()
+        attempts = 0
+        while True:
+            attempts += 1
+            probe_started = time.monotonic()
             try:
-                db_conn = connections["default"]
-            except OperationalError:
-                self.stdout.write("Database unavaliable, waiting 1 second...")
-                time.sleep(1)
+                connection.ensure_connection()
+                break
+            except OperationalError as exc:
+                waited = time.monotonic() - started
+                if waited + delay > options["timeout"]:
+                    raise CommandError(
+                        f"Database unavailable after {attempts} attempts "
+                        f"in {waited:.1f} seconds: {exc}"
+                    )
+                self.stdout.write(
+                    f"Database unavailable, waiting {delay:g} seconds..."
+                )
+                time.sleep(delay)
+                delay = min(delay * 2, options["max_interval"])
 
-        self.stdout.write(self.style.SUCCESS("Database available!"))
+        finished = time.monotonic()
+        self.stdout.write(self.style.SUCCESS(
+            f"Database available! Connected in "
+            f"{(finished - probe_started) * 1000:.1f} ms after {attempts} "
+            f"attempts and {finished - started:.1f} seconds."
+        ))
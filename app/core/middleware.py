@@ -0,0 +1,350 @@
+import hmac
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+import uuid
+import zlib
+from contextlib import ExitStack
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+from django.utils.module_loading import import_string
+
+from core import instrumentation, profiling
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+logger = logging.getLogger(__name__)
+request_logger = logging.getLogger("core.instrumentation")
+
+COMPRESSION_SETTINGS = {
+    "MIN_SIZE": 500,
+    "GZIP_LEVEL": 6,
+    "BROTLI_QUALITY": 4,
+    "METRICS_HOOK": None,
+}
+COMPRESSIBLE_TYPES = re.compile(
+    r"^(text/|application/(json|x-ndjson|javascript|xml)|image/svg\+xml)"
+)
+ACCEPT_ENCODING = re.compile(r"^\s*([\w*-]+)\s*(?:;\s*q=([\d.]+))?\s*$")
+
+
+def compression_exempt(view):
+    """ Mark the responses of a view or viewset action as uncompressed. """
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        response = view(*args, **kwargs)
+        response.compression_exempt = True
+        return response
+
+    return wrapped
+
+
+def accepted_encodings(header):
+    """ Return the encodings in an Accept-Encoding header with q > 0. """
+    accepted = set()
+    for item in header.split(","):
+        match = ACCEPT_ENCODING.match(item)
+        if not match:
+            continue
+        encoding, quality = match.groups()
+        try:
+            if quality is not None and float(quality) <= 0:
+                continue
+        except ValueError:
+            continue
+        accepted.add(encoding.lower())
+
+    return accepted
+
+
+def log_metrics(metrics):
+    """ Default metrics hook, logging each compressed response. """
+    logger.debug(
+        "%(encoding)s %(path)s %(original_size)d -> %(compressed_size)d "
+        "bytes (%(ratio).2f) in %(cpu_ms).2f ms CPU",
+        metrics
+    )
+
+
+class GzipCompressor:
+    """ Incremental gzip compressor. """
+    encoding = "gzip"
+
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        """ Compress data, flushing so it can be sent right away. """
+        return (self._compressor.compress(data) +
+                self._compressor.flush(zlib.Z_SYNC_FLUSH))
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class BrotliCompressor:
+    """ Incremental brotli compressor. """
+    encoding = "br"
+
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        """ Compress data, flushing so it can be sent right away. """
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class CompressionMiddleware:
+    """ Compress responses with brotli or gzip as the client accepts.
+
+    Brotli is preferred when the ``brotli`` package is installed. Bodies
+    below ``MIN_SIZE`` bytes, partial content, already encoded bodies,
+    binary content types and responses of views marked with
+    ``compression_exempt`` are sent as they are. Streamed responses are
+    compressed chunk by chunk. Every compressed response is reported to
+    ``METRICS_HOOK`` with its sizes and the CPU time spent compressing.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.settings = dict(COMPRESSION_SETTINGS)
+        self.settings.update(getattr(settings, "COMPRESSION", {}))
+        hook = self.settings["METRICS_HOOK"]
+        self.metrics_hook = import_string(hook) if hook else log_metrics
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not self._compressible(response):
+            return response
+        patch_vary_headers(response, ("Accept-Encoding",))
+        compressor = self._negotiate(request)
+        if compressor is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = self._stream(
+                compressor,
+                response.streaming_content,
+                request.path
+            )
+            del response["Content-Length"]
+        else:
+            started = time.thread_time()
+            content = compressor.compress(response.content)
+            content += compressor.finish()
+            if len(content) >= len(response.content):
+                return response
+            self._report(compressor, request.path, len(response.content),
+                         len(content), time.thread_time() - started)
+            response.content = content
+            response["Content-Length"] = str(len(content))
+
+        response["Content-Encoding"] = compressor.encoding
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            # The encoded body is no longer byte for byte the validated one.
+            response["ETag"] = "W/" + etag
+
+        return response
+
+    def _compressible(self, response):
+        """ Return whether the response may be compressed at all. """
+        if getattr(response, "compression_exempt", False):
+            return False
+        if response.status_code == 206 or response.has_header(
+                "Content-Encoding"):
+            return False
+        if not COMPRESSIBLE_TYPES.match(response.get("Content-Type", "")):
+            return False
+
+        return (response.streaming or
+                len(response.content) >= self.settings["MIN_SIZE"])
+
+    def _negotiate(self, request):
+        """ Return a compressor for the best encoding the client accepts. """
+        accepted = accepted_encodings(
+            request.META.get("HTTP_ACCEPT_ENCODING", "")
+        )
+        if brotli is not None and accepted & {"br", "*"}:
+            return BrotliCompressor(self.settings["BROTLI_QUALITY"])
+        elif accepted & {"gzip", "*"}:
+            return GzipCompressor(self.settings["GZIP_LEVEL"])
+
+        return None
+
+    def _stream(self, compressor, content, path):
+        """ Compress a streamed body chunk by chunk. """
+        original_size = compressed_size = 0
+        cpu = 0.0
+        for chunk in content:
+            started = time.thread_time()
+            compressed = compressor.compress(chunk)
+            cpu += time.thread_time() - started
+            original_size += len(chunk)
+            compressed_size += len(compressed)
+            if compressed:
+                yield compressed
+        started = time.thread_time()
+        tail = compressor.finish()
+        cpu += time.thread_time() - started
+        self._report(compressor, path, original_size,
+                     compressed_size + len(tail), cpu)
+        yield tail
+
+    def _report(self, compressor, path, original_size, compressed_size, cpu):
+        """ Pass one response's compression figures to the metrics hook. """
+        self.metrics_hook({
+            "encoding": compressor.encoding,
+            "path": path,
+            "original_size": original_size,
+            "compressed_size": compressed_size,
+            "ratio": compressed_size / original_size if original_size else 1,
+            "cpu_ms": cpu * 1000,
+        })
+
+
+class InstrumentationMiddleware:
+    """ Measure every request and report it three ways.
+
+    Wall time, query count and time on every database, serializer and
+    renderer time and the response size are sent as a ``Server-Timing``
+    header, logged as one JSON line and added to the metrics served by
+    ``core.views.metrics``. Requests issuing more queries than their
+    view's ``query_budget`` attribute, or ``QUERY_BUDGET``, are logged as
+    warnings. Queries run while a streamed body is sent aren't counted.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.settings = instrumentation.INSTRUMENTATION_SETTINGS
+
+    def __call__(self, request):
+        metrics = instrumentation.RequestMetrics()
+        instrumentation.start(metrics)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(metrics.record_query)
+                    )
+                response = self.get_response(request)
+        finally:
+            instrumentation.finish()
+        wall = time.perf_counter() - metrics.started
+
+        view, budget = self._view(request)
+        over_budget = budget is not None and metrics.queries > budget
+        size = None if response.streaming else len(response.content)
+        if self.settings["SERVER_TIMING"]:
+            response["Server-Timing"] = metrics.server_timing(wall)
+        instrumentation.record(request.method, view, response.status_code,
+                               wall, metrics, size, over_budget)
+        line = json.dumps({
+            "method": request.method,
+            "path": request.path,
+            "view": view,
+            "status": response.status_code,
+            "wall_ms": round(wall * 1000, 2),
+            "queries": metrics.queries,
+            "db_ms": round(metrics.db_time * 1000, 2),
+            "serialize_ms": round(metrics.timings["serialize"] * 1000, 2),
+            "render_ms": round(metrics.timings["render"] * 1000, 2),
+            "bytes": size,
+            "query_budget": budget,
+            "over_budget": over_budget,
+        })
+        if over_budget:
+            request_logger.warning(line)
+        else:
+            request_logger.info(line)
+
+        return response
+
+    def _view(self, request):
+        """ Return the matched view's name and its query budget. """
+        match = getattr(request, "resolver_match", None)
+        if match is None:
+            return "unmatched", self.settings["QUERY_BUDGET"]
+        view = getattr(match.func, "cls", match.func)
+
+        return (match.view_name,
+                getattr(view, "query_budget", self.settings["QUERY_BUDGET"]))
+
+
+class ProfilingMiddleware:
+    """ Sample the stacks of chosen requests into flame graph files.
+
+    A request is profiled when it sends ``HEADER_TOKEN`` in an
+    ``X-Profile`` header or, with ``ENABLED``, for ``RATE`` percent of
+    requests to the views named in ``VIEWS``, every view when empty. Each
+    profile is written to ``OUTPUT_DIR`` in the collapsed stack format
+    read by flamegraph.pl and speedscope. With neither ``ENABLED`` nor a
+    token the middleware isn't loaded at all.
+    """
+
+    def __init__(self, get_response):
+        self.settings = profiling.PROFILING_SETTINGS
+        if not (self.settings["ENABLED"] or self.settings["HEADER_TOKEN"]):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        sampler = getattr(request, "stack_sampler", None)
+        if sampler is not None:
+            sampler.stop()
+            response["X-Profile-Output"] = self._write(request, sampler)
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if self._wanted(request):
+            request.stack_sampler = profiling.StackSampler(
+                threading.get_ident(),
+                self.settings["INTERVAL"]
+            )
+            request.stack_sampler.start()
+
+    def _wanted(self, request):
+        """ Return whether to profile the request. """
+        token = self.settings["HEADER_TOKEN"]
+        sent = request.META.get("HTTP_X_PROFILE")
+        if token and sent and hmac.compare_digest(sent, token):
+            return True
+        if not self.settings["ENABLED"]:
+            return False
+        views = self.settings["VIEWS"]
+        if views and request.resolver_match.view_name not in views:
+            return False
+
+        return random.random() * 100 < self.settings["RATE"]
+
+    def _write(self, request, sampler):
+        """ Write a request's samples; return the file name. """
+        view = request.resolver_match.view_name.replace(":", ".") or "view"
+        name = (f"{time.strftime('%Y%m%dT%H%M%S')}-{view}-{os.getpid()}-"
+                f"{uuid.uuid4().hex[:8]}.collapsed")
+        os.makedirs(self.settings["OUTPUT_DIR"], exist_ok=True)
+        sampler.write(os.path.join(self.settings["OUTPUT_DIR"], name))
+        logger.info(
+            "Profiled %s %s: %d samples in %.1f ms, written to %s",
+            request.method, request.path, sum(sampler.stacks.values()),
+            sampler.duration * 1000, name
+        )
+
+        return name
@@ -0,0 +1,46 @@
+# Generated by Django 2.2.28 on 2026-10-16 23:25
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicates(apps, schema_editor):
+    """ Fold attributes sharing a user and name into the oldest one. """
+    Recipe = apps.get_model('core', 'Recipe')
+    for model_name, field_name in (('Tag', 'tags'), ('Ingredient', 'ingredients')):
+        model = apps.get_model('core', model_name)
+        field = Recipe._meta.get_field(field_name)
+        through = field.remote_field.through
+        target = field.m2m_reverse_field_name()
+        duplicates = model.objects.values('user', 'name').annotate(
+            keep=Min('id'),
+            total=Count('id'),
+        ).filter(total__gt=1)
+        for duplicate in duplicates:
+            keep = duplicate['keep']
+            others = model.objects.filter(
+                user=duplicate['user'],
+                name=duplicate['name'],
+            ).exclude(id=keep)
+            linked = set(through.objects.filter(
+                **{target: keep}
+            ).values_list('recipe_id', flat=True))
+            for row in through.objects.filter(**{f'{target}__in': others}):
+                if row.recipe_id not in linked:
+                    linked.add(row.recipe_id)
+                    through.objects.create(
+                        recipe_id=row.recipe_id,
+                        **{f'{target}_id': keep}
+                    )
+            others.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_recipe_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 2.2.28 on 2026-10-16 23:33
+
+from collections import defaultdict
+
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations, models
+
+
+def populate_search(apps, schema_editor):
+    """ Fill the search columns of existing recipes. """
+    Recipe = apps.get_model('core', 'Recipe')
+    names = defaultdict(list)
+    for field_name in ('tags', 'ingredients'):
+        field = Recipe._meta.get_field(field_name)
+        through = field.remote_field.through
+        target = field.m2m_reverse_field_name()
+        rows = through.objects.order_by(f'{target}__name').values_list(
+            'recipe_id', f'{target}__name'
+        )
+        for recipe_id, name in rows.iterator():
+            names[recipe_id].append(name)
+    for recipe_id, recipe_names in names.items():
+        Recipe.objects.filter(id=recipe_id).update(
+            search_terms=' '.join(recipe_names)
+        )
+    if schema_editor.connection.vendor == 'postgresql':
+        Recipe.objects.update(search_vector=(
+            SearchVector('title', weight='A', config='english') +
+            SearchVector('search_terms', weight='B', config='english')
+        ))
+
+
+def create_gin_index(apps, schema_editor):
+    """ Index search_vector where the database supports it. """
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX core_recipe_search_vector_idx '
+            'ON core_recipe USING gin (search_vector);'
+        )
+
+
+def drop_gin_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX core_recipe_search_vector_idx;')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_stored_file'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_terms',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(populate_search, migrations.RunPython.noop),
+        migrations.RunPython(create_gin_index, drop_gin_index),
+    ]
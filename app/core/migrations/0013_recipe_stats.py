@@ -0,0 +1,92 @@
+# Generated by Django 2.2.28 on 2026-10-17 00:20
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+import django.db.models.deletion
+
+
+PRICE_BUCKETS = (
+    ('price_up_to_5', None, 5),
+    ('price_up_to_10', 5, 10),
+    ('price_up_to_20', 10, 20),
+    ('price_up_to_50', 20, 50),
+    ('price_over_50', 50, None),
+)
+
+
+def populate_stats(apps, schema_editor):
+    """ Compute the stats and recipe counts of existing recipes. """
+    Recipe = apps.get_model('core', 'Recipe')
+    RecipeStats = apps.get_model('core', 'RecipeStats')
+    buckets = {}
+    for field, lower, upper in PRICE_BUCKETS:
+        condition = Q()
+        if lower is not None:
+            condition &= Q(price__gt=lower)
+        if upper is not None:
+            condition &= Q(price__lte=upper)
+        buckets[field] = Count('id', filter=condition)
+    totals = Recipe.objects.order_by().values('user_id').annotate(
+        recipe_count=Count('id'),
+        total_time_minutes=Sum('time_minutes'),
+        total_price=Sum('price'),
+        **buckets
+    )
+    RecipeStats.objects.bulk_create(
+        [RecipeStats(**values) for values in totals]
+    )
+    for field_name in ('tags', 'ingredients'):
+        field = Recipe._meta.get_field(field_name)
+        through = field.remote_field.through
+        target = f'{field.m2m_reverse_field_name()}_id'
+        rows = through.objects.order_by().values(target).annotate(
+            recipe_count=Count('recipe_id')
+        ).values_list(target, 'recipe_count')
+        for pk, recipe_count in rows.iterator():
+            field.related_model.objects.filter(id=pk).update(
+                recipe_count=recipe_count
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_recipe_sort_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='recipe_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('recipe_count', models.IntegerField(default=0)),
+                ('total_time_minutes', models.BigIntegerField(default=0)),
+                ('total_price', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('price_up_to_5', models.IntegerField(default=0)),
+                ('price_up_to_10', models.IntegerField(default=0)),
+                ('price_up_to_20', models.IntegerField(default=0)),
+                ('price_up_to_50', models.IntegerField(default=0)),
+                ('price_over_50', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='recipe_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='recipe_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['user', 'recipe_count', 'id'], name='core_ingredient_user_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', 'recipe_count', 'id'], name='core_tag_user_count_idx'),
+        ),
+        migrations.RunPython(populate_stats, migrations.RunPython.noop),
+    ]
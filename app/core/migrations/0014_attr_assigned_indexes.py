@@ -0,0 +1,21 @@
+# Generated by Django 2.2.28 on 2026-10-17 00:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_recipe_stats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(condition=models.Q(recipe_count__gt=0), fields=['user', 'name'], name='core_ingredient_assigned_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(condition=models.Q(recipe_count__gt=0), fields=['user', 'name'], name='core_tag_assigned_idx'),
+        ),
+    ]
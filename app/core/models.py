@@ -2,6 +2,7 @@ import uuid
 import os
 
 from django.db import models
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, \
     PermissionsMixin
 from django.conf import settings
@@ -15,6 +16,14 @@ def recipe_image_file_path(instance, filename):
     return os.path.join("uploads/recipe/", filename)
 
 
+def recipe_image_variant_file_path(instance, filename):
+    """ Generate file path for a resized recipe image. """
+    ext = filename.split(".")[-1]
+    filename = f'{uuid.uuid4()}-{instance.size}.{ext}'
+
+    return os.path.join("uploads/recipe/variants/", filename)
+
+
 class UserManager(BaseUserManager):
 
     def create_user(self, email, password=None, **extra_fields):
@@ -49,7 +58,25 @@ class User(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = "email"
 
 
-class Tag(models.Model):
+class RecipeAttr(models.Model):
+    """ Base for attributes linked to recipes, counting their recipes. """
+    # Maintained by recipe.stats with database side increments.
+    recipe_count = models.IntegerField(default=0, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        """ Save without writing back a possibly stale recipe count. """
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != "recipe_count"
+            ]
+        super().save(*args, **kwargs)
+
+
+class Tag(RecipeAttr):
     """ Tag to be used for a recipe. """
     name = models.CharField(max_length=255)
     user = models.ForeignKey(
@@ -57,11 +84,30 @@ class Tag(models.Model):
         on_delete=models.CASCADE,
     )
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "name"],
+                name="core_tag_user_name_uniq"
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["user", "recipe_count", "id"],
+                name="core_tag_user_count_idx"
+            ),
+            models.Index(
+                fields=["user", "name"],
+                condition=models.Q(recipe_count__gt=0),
+                name="core_tag_assigned_idx"
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
 
-class Ingredient(models.Model):
+class Ingredient(RecipeAttr):
     """ Ingredient to be used in a recipe. """
     name = models.CharField(max_length=255)
     user = models.ForeignKey(
@@ -69,6 +115,25 @@ class Ingredient(models.Model):
         on_delete=models.CASCADE
     )
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "name"],
+                name="core_ingredient_user_name_uniq"
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["user", "recipe_count", "id"],
+                name="core_ingredient_user_count_idx"
+            ),
+            models.Index(
+                fields=["user", "name"],
+                condition=models.Q(recipe_count__gt=0),
+                name="core_ingredient_assigned_idx"
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -86,6 +151,103 @@ class Recipe(models.Model):
     ingredients = models.ManyToManyField("Ingredient")
     tags = models.ManyToManyField("Tag")
     image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    image_status = models.CharField(
+        max_length=16,
+        blank=True,
+        choices=[
+            ("pending", "Pending"),
+            ("ready", "Ready"),
+            ("failed", "Failed"),
+        ]
+    )
+    # Maintained by recipe.search, search_vector only on PostgreSQL.
+    search_terms = models.TextField(blank=True, default="", editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["user", "id"],
+                name="core_recipe_user_id_idx"
+            ),
+            models.Index(
+                fields=["user", "time_minutes", "id"],
+                name="core_recipe_user_time_idx"
+            ),
+            models.Index(
+                fields=["user", "price", "id"],
+                name="core_recipe_user_price_idx"
+            ),
+        ]
 
     def __str__(self):
         return self.title
+
+
+class RecipeImageVariant(models.Model):
+    """ Resized, metadata free copy of a recipe image. """
+    recipe = models.ForeignKey(
+        "Recipe",
+        on_delete=models.CASCADE,
+        related_name="image_variants"
+    )
+    size = models.PositiveIntegerField()
+    format = models.CharField(max_length=8)
+    image = models.ImageField(upload_to=recipe_image_variant_file_path)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["recipe", "size", "format"],
+                name="core_recipeimagevariant_uniq"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.recipe} {self.size}px {self.format}"
+
+
+class StoredFile(models.Model):
+    """ Content addressed file kept by ContentAddressedStorage. """
+    name = models.CharField(max_length=255, unique=True)
+    digest = models.CharField(max_length=64)
+    size = models.BigIntegerField()
+    refs = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+
+class RecipeStats(models.Model):
+    """ Recipe totals of a user, maintained by recipe.stats. """
+    # Field counting recipes priced up to each bound, the last unbounded.
+    PRICE_BUCKETS = (
+        ("price_up_to_5", 5),
+        ("price_up_to_10", 10),
+        ("price_up_to_20", 20),
+        ("price_up_to_50", 50),
+        ("price_over_50", None),
+    )
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="recipe_stats"
+    )
+    recipe_count = models.IntegerField(default=0)
+    total_time_minutes = models.BigIntegerField(default=0)
+    total_price = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0
+    )
+    price_up_to_5 = models.IntegerField(default=0)
+    price_up_to_10 = models.IntegerField(default=0)
+    price_up_to_20 = models.IntegerField(default=0)
+    price_up_to_50 = models.IntegerField(default=0)
+    price_over_50 = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user} {self.recipe_count} recipes"
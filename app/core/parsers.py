@@ -0,0 +1,31 @@
+import io
+
+from django.conf import settings
+
+from rest_framework.parsers import JSONParser
+
+from core.renderers import FastJSONRenderer, orjson
+
+
+class FastJSONParser(JSONParser):
+    """ JSON parser using orjson when it is installed.
+
+    orjson only reads UTF-8 and rejects NaN and Infinity like the strict
+    parser does. Other encodings and bodies it rejects are handed to
+    JSONParser, which also reports the errors.
+    """
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        if (orjson is None or not self.strict or
+                encoding.lower().replace("-", "") != "utf8"):
+            return super().parse(stream, media_type, parser_context)
+
+        body = stream.read()
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            return super().parse(io.BytesIO(body), media_type,
+                                 parser_context)
@@ -0,0 +1,94 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+
+
+PROFILING_SETTINGS = {
+    "ENABLED": False,
+    "VIEWS": [],
+    "RATE": 0.0,
+    "HEADER_TOKEN": None,
+    "INTERVAL": 0.005,
+    "OUTPUT_DIR": "/tmp/profiles",
+}
+PROFILING_SETTINGS.update(getattr(settings, "PROFILING", {}))
+
+_labels = {}
+
+
+def _short_path(filename):
+    """ Return filename relative to the entry of sys.path holding it. """
+    best = filename
+    for entry in sys.path:
+        if entry and filename.startswith(entry + os.sep):
+            relative = filename[len(entry) + 1:]
+            if len(relative) < len(best):
+                best = relative
+
+    return best
+
+
+def frame_label(code):
+    """ Return the flame graph label of a code object. """
+    label = _labels.get(code)
+    if label is None:
+        label = _labels[code] = (
+            f"{code.co_name} ({_short_path(code.co_filename)}:"
+            f"{code.co_firstlineno})"
+        ).replace(";", ",")
+
+    return label
+
+
+def collapse(frame):
+    """ Return a frame's stack as one collapsed line, outermost first. """
+    labels = []
+    while frame is not None:
+        labels.append(frame_label(frame.f_code))
+        frame = frame.f_back
+
+    return ";".join(reversed(labels))
+
+
+class StackSampler:
+    """ Sample a thread's stack every ``interval`` seconds.
+
+    Sampling runs on a background thread, so it is bounded by the GIL
+    switch interval; samples are counted per distinct stack.
+    """
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run,
+            name="stack-sampler",
+            daemon=True
+        )
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self.started
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[collapse(frame)] += 1
+
+    def write(self, path):
+        """ Write the samples in the collapsed stack format. """
+        with open(path, "w") as output:
+            for stack, count in self.stacks.most_common():
+                output.write(f"{stack} {count}\n")
@@ -0,0 +1,63 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from core.instrumentation import timed
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+LINE_SEPARATORS = (
+    (b"\xe2\x80\xa8", b"\\u2028"),
+    (b"\xe2\x80\xa9", b"\\u2029"),
+)
+
+
+def _default(obj):
+    """ Encode what orjson can't the way DRF's encoder does. """
+    return JSONEncoder().default(obj)
+
+
+def dumps(data):
+    """ Encode data to compact UTF-8 JSON with orjson.
+
+    Decimals become floats and datetimes are formatted by DRF's encoder,
+    so the bytes match JSONRenderer's. Raises TypeError for data orjson
+    can't encode, such as integers above 64 bits.
+    """
+    ret = orjson.dumps(
+        data,
+        default=_default,
+        option=orjson.OPT_PASSTHROUGH_DATETIME
+    )
+    for separator, escaped in LINE_SEPARATORS:
+        ret = ret.replace(separator, escaped)
+
+    return ret
+
+
+class FastJSONRenderer(JSONRenderer):
+    """ JSON renderer using orjson when it is installed.
+
+    Produces the same bytes as JSONRenderer. Indented output, non compact
+    or ASCII only settings and data orjson rejects fall back to it.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timed("render"):
+            return self._render(data, accepted_media_type, renderer_context)
+
+    def _render(self, data, accepted_media_type, renderer_context):
+        if (orjson is None or data is None or self.ensure_ascii or
+                not self.compact or self.get_indent(
+                    accepted_media_type, renderer_context or {}
+                ) is not None):
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+        try:
+            return dumps(data)
+        except TypeError:
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
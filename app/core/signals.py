@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from core import storage
+from core.authentication import invalidate_token, invalidate_user
+from core.models import Recipe, RecipeImageVariant
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    """ Stop accepting a deleted token from the auth cache. """
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def user_saved(sender, instance, created, **kwargs):
+    """ Reload users from the database after they change. """
+    if not created:
+        invalidate_user(instance)
+
+
+@receiver(pre_save, sender=Recipe)
+def recipe_image_replacing(sender, instance, update_fields, **kwargs):
+    """ Remember the stored image a save may replace. """
+    instance._replaced_image = None
+    if instance.pk and (update_fields is None or "image" in update_fields):
+        instance._replaced_image = sender.objects.filter(
+            pk=instance.pk
+        ).values_list("image", flat=True).first()
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_image_saved(sender, instance, created, **kwargs):
+    """ Move the reference count from a replaced image to the new one. """
+    old_name = getattr(instance, "_replaced_image", None)
+    new_name = instance.image.name
+    if old_name != new_name:
+        storage.acquire(new_name)
+        storage.release(old_name)
+
+
+@receiver(post_save, sender=RecipeImageVariant)
+def variant_saved(sender, instance, created, **kwargs):
+    """ Count the reference a new image variant holds. """
+    if created:
+        storage.acquire(instance.image.name)
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=RecipeImageVariant)
+def image_owner_deleted(sender, instance, **kwargs):
+    """ Drop the reference a deleted row held to its image. """
+    storage.release(instance.image.name)
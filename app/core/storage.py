@@ -0,0 +1,92 @@
+import hashlib
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+from core.models import StoredFile
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """ File system storage that keeps one copy of identical uploads.
+
+    Uploads are hashed while they are streamed to disk and stored under
+    their SHA-256 digest, so saving the same bytes twice returns the same
+    name. StoredFile rows count the model fields referencing each file;
+    ``delete()`` leaves shared files in place and ``gc_media`` removes the
+    ones nothing references any more.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is derived from the content in _save.
+        return name
+
+    def _save(self, name, content):
+        directory, filename = os.path.split(name)
+        ext = os.path.splitext(filename)[1].lower()
+        os.makedirs(self.path(directory), exist_ok=True)
+
+        hasher = hashlib.sha256()
+        size = 0
+        fd, temp_path = tempfile.mkstemp(dir=self.path(directory))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in content.chunks():
+                    hasher.update(chunk)
+                    size += len(chunk)
+                    f.write(chunk)
+            digest = hasher.hexdigest()
+            name = os.path.join(directory, digest[:2], f"{digest}{ext}")
+            full_path = self.path(name)
+            if os.path.exists(full_path):
+                os.remove(temp_path)
+            else:
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                os.replace(temp_path, full_path)
+                if self.file_permissions_mode is not None:
+                    os.chmod(full_path, self.file_permissions_mode)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        self._record(name, digest, size)
+
+        return name
+
+    def _record(self, name, digest, size):
+        """ Make sure a StoredFile row tracks the saved file. """
+        try:
+            with transaction.atomic():
+                StoredFile.objects.get_or_create(
+                    name=name,
+                    defaults={"digest": digest, "size": size}
+                )
+        except IntegrityError:
+            # Another upload of the same content recorded it first.
+            pass
+
+    def delete(self, name):
+        """ Keep shared content; gc_media removes unreferenced files. """
+
+    def purge(self, name):
+        """ Remove the file from disk. """
+        super().delete(name)
+
+
+def acquire(name):
+    """ Count a new reference to a stored file. """
+    if name:
+        StoredFile.objects.filter(name=name).update(refs=F("refs") + 1)
+
+
+def release(name):
+    """ Drop a reference to a stored file. """
+    if name:
+        StoredFile.objects.filter(name=name, refs__gt=0).update(
+            refs=F("refs") - 1
+        )
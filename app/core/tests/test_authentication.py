@@ -0,0 +1,175 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase, RequestFactory
+
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+
+from core.authentication import (
+    CACHE_SETTINGS, CachedTokenAuthentication, token_cache
+)
+from core.cache import TTLCache
+
+
+def token_request(key):
+    """ Return a request authenticated with the token key. """
+    return Request(
+        RequestFactory().get("/", HTTP_AUTHORIZATION=f"Token {key}")
+    )
+
+
+class TTLCacheTests(TestCase):
+
+    def test_evicts_least_recently_used(self):
+        """ Test the cache keeps at most max_size entries. """
+        cache = TTLCache(max_size=2, timeout=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+
+    @patch("core.cache.time.monotonic")
+    def test_entries_expire(self, monotonic):
+        """ Test entries are dropped after the timeout. """
+        monotonic.return_value = 100
+        cache = TTLCache(max_size=2, timeout=60)
+        cache.set("a", 1)
+
+        monotonic.return_value = 161
+
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(len(cache), 0)
+
+
+class CachedTokenAuthenticationTests(TestCase):
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            "test@hackfeed.com",
+            "testpass"
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.auth = CachedTokenAuthentication()
+
+    def test_authenticate_cached(self):
+        """ Test a cached token authenticates without queries. """
+        self.auth.authenticate(token_request(self.token.key))
+
+        with self.assertNumQueries(0):
+            user, token = self.auth.authenticate(
+                token_request(self.token.key)
+            )
+
+        self.assertEqual(user, self.user)
+        self.assertEqual(token, self.token)
+
+    def test_invalid_token_rejected(self):
+        """ Test an unknown token is still rejected. """
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate(token_request("invalid"))
+
+    def test_deleted_token_invalidated(self):
+        """ Test deleting a token removes it from the cache. """
+        self.auth.authenticate(token_request(self.token.key))
+
+        self.token.delete()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate(token_request(self.token.key))
+
+    def test_inactive_user_invalidated(self):
+        """ Test deactivating a user removes their tokens from the cache. """
+        self.auth.authenticate(token_request(self.token.key))
+
+        self.user.is_active = False
+        self.user.save()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate(token_request(self.token.key))
+
+    def test_cached_user_copied(self):
+        """ Test changes to a returned user don't leak into the cache. """
+        user, _ = self.auth.authenticate(token_request(self.token.key))
+        user.name = "changed"
+
+        cached_user, _ = self.auth.authenticate(token_request(self.token.key))
+
+        self.assertEqual(cached_user.name, "")
+
+    def test_cached_relations_not_shared(self):
+        """ Test related objects loaded on a returned user don't leak. """
+        user, _ = self.auth.authenticate(token_request(self.token.key))
+        loaded = user.auth_token
+
+        cached_user, token = self.auth.authenticate(
+            token_request(self.token.key)
+        )
+
+        self.assertIsNot(cached_user.auth_token, loaded)
+        self.assertIs(cached_user.auth_token, token)
+        self.assertIs(token.user, cached_user)
+
+    def test_local_entries_short_lived_without_shared_cache(self):
+        """ Test other processes can't trust their lookups for long. """
+        self.assertIsNone(CACHE_SETTINGS["BACKEND"])
+        self.assertEqual(token_cache.timeout, CACHE_SETTINGS["LOCAL_TIMEOUT"])
+
+
+class SharedTokenRevocationTests(TestCase):
+    """ Test revocations reach processes through the shared cache. """
+
+    def setUp(self):
+        shared = patch.dict(CACHE_SETTINGS, {"BACKEND": "default"})
+        shared.start()
+        self.addCleanup(shared.stop)
+        token_cache.clear()
+        caches["default"].clear()
+        self.user = get_user_model().objects.create_user(
+            "test@hackfeed.com",
+            "testpass"
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.auth = CachedTokenAuthentication()
+        self.auth.authenticate(token_request(self.token.key))
+
+    def in_other_process(self):
+        """ Revoke as another process would, leaving this LRU untouched. """
+        return patch.multiple(
+            token_cache,
+            delete=lambda key: None,
+            delete_matching=lambda predicate: None
+        )
+
+    def test_shared_hit_skips_database(self):
+        """ Test a lookup cached by another process avoids the database. """
+        token_cache.clear()
+
+        with self.assertNumQueries(0):
+            user, _ = self.auth.authenticate(token_request(self.token.key))
+
+        self.assertEqual(user, self.user)
+
+    def test_token_deleted_in_other_process(self):
+        """ Test a token deleted elsewhere is refused by this process. """
+        with self.in_other_process():
+            self.token.delete()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate(token_request(self.token.key))
+
+    def test_user_deactivated_in_other_process(self):
+        """ Test a user deactivated elsewhere is refused by this process. """
+        with self.in_other_process():
+            self.user.is_active = False
+            self.user.save()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate(token_request(self.token.key))
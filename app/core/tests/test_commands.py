@@ -1,23 +1,45 @@
+from io import StringIO
 from unittest.mock import patch
 
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
 from django.test import TestCase
 
 
+ENSURE_CONNECTION = (
+    "django.db.backends.base.base.BaseDatabaseWrapper.ensure_connection"
+)
+
+
+@patch("core.management.commands.wait_for_db.time.sleep")
 class CommandTests(TestCase):
 
-    def test_wait_for_db_ready(self):
+    def test_wait_for_db_ready(self, sleep):
         """ Test waiting for DB when DB is available. """
-        with patch("django.db.utils.ConnectionHandler.__getitem__") as gi:
-            gi.return_value = True
-            call_command("wait_for_db")
-            self.assertEqual(gi.call_count, 1)
-
-    @patch("time.sleep", return_value=True)
-    def test_wait_for_db(self, ts):
-        """ Test waiting for DB. """
-        with patch("django.db.utils.ConnectionHandler.__getitem__") as gi:
-            gi.side_effect = [OperationalError] * 5 + [True]
-            call_command("wait_for_db")
-            self.assertEqual(gi.call_count, 6)
+        with patch(ENSURE_CONNECTION) as ensure_connection:
+            call_command("wait_for_db", stdout=StringIO())
+
+        self.assertEqual(ensure_connection.call_count, 1)
+        sleep.assert_not_called()
+
+    def test_wait_for_db(self, sleep):
+        """ Test waiting for DB backs off exponentially. """
+        with patch(ENSURE_CONNECTION) as ensure_connection:
+            ensure_connection.side_effect = [OperationalError] * 5 + [None]
+            call_command("wait_for_db", "--max-interval=4", stdout=StringIO())
+
+        self.assertEqual(ensure_connection.call_count, 6)
+        self.assertEqual(
+            [call[0][0] for call in sleep.call_args_list],
+            [0.5, 1, 2, 4, 4]
+        )
+
+    def test_wait_for_db_timeout(self, sleep):
+        """ Test waiting for DB gives up after the timeout. """
+        with patch(ENSURE_CONNECTION) as ensure_connection:
+            ensure_connection.side_effect = OperationalError("refused")
+            with self.assertRaisesMessage(CommandError, "refused"):
+                call_command("wait_for_db", "--timeout=0", stdout=StringIO())
+
+        sleep.assert_not_called()
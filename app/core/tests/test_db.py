@@ -0,0 +1,81 @@
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.db.backends.sqlite3 import base
+from django.test import SimpleTestCase
+
+from core.db.backends.mixins import HealthCheckMixin
+
+
+class DatabaseWrapper(HealthCheckMixin, base.DatabaseWrapper):
+    pass
+
+
+def make_wrapper(test, **settings):
+    """ Return a SQLite wrapper with health checks on a temporary file. """
+    # In-memory databases are never closed, so can't be reopened.
+    fd, name = tempfile.mkstemp(suffix=".sqlite3")
+    os.close(fd)
+    test.addCleanup(os.remove, name)
+    settings_dict = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": name,
+        "OPTIONS": {},
+        "AUTOCOMMIT": True,
+        "CONN_MAX_AGE": 60,
+        "CONN_HEALTH_CHECKS": True,
+        "TIME_ZONE": None,
+        **settings,
+    }
+
+    wrapper = DatabaseWrapper(settings_dict, alias="health")
+    test.addCleanup(wrapper.close)
+    wrapper.ensure_connection()
+    wrapper.close_if_unusable_or_obsolete()
+
+    return wrapper
+
+
+class HealthCheckMixinTests(SimpleTestCase):
+
+    def setUp(self):
+        self.wrapper = make_wrapper(self)
+
+    def test_dead_connection_replaced(self):
+        """ Test a connection failing its check is reopened. """
+        dead = self.wrapper.connection
+
+        with patch.object(self.wrapper, "is_usable", return_value=False):
+            self.wrapper.cursor().execute("SELECT 1")
+
+        self.assertIsNot(self.wrapper.connection, dead)
+
+    def test_checked_once_per_request(self):
+        """ Test the check runs on the first query of a request only. """
+        with patch.object(self.wrapper, "is_usable",
+                          return_value=True) as is_usable:
+            self.wrapper.cursor()
+            self.wrapper.cursor()
+            self.wrapper.close_if_unusable_or_obsolete()
+            self.wrapper.cursor()
+
+        self.assertEqual(is_usable.call_count, 2)
+
+    def test_fresh_connection_not_checked(self):
+        """ Test a newly opened connection isn't checked. """
+        self.wrapper.close()
+
+        with patch.object(self.wrapper, "is_usable") as is_usable:
+            self.wrapper.cursor()
+
+        is_usable.assert_not_called()
+
+    def test_disabled(self):
+        """ Test nothing is checked without CONN_HEALTH_CHECKS. """
+        wrapper = make_wrapper(self, CONN_HEALTH_CHECKS=False)
+
+        with patch.object(wrapper, "is_usable") as is_usable:
+            wrapper.cursor()
+
+        is_usable.assert_not_called()
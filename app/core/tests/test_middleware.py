@@ -0,0 +1,421 @@
+import gzip
+import io
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from unittest import skipUnless
+from unittest.mock import patch
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import instrumentation, middleware, profiling
+from core.instrumentation import MetricsRegistry
+from core.middleware import (
+    CompressionMiddleware, ProfilingMiddleware, accepted_encodings,
+    compression_exempt
+)
+from core.models import Recipe
+
+from recipe.views import RecipeViewSet
+
+
+BODY = b'{"title": "Sample recipe", "time_minutes": 10}' * 50
+RECIPES_URL = reverse("recipe:recipe-list")
+SERVER_TIMING_DB = re.compile(r'db;dur=[\d.]+;desc="(\d+) queries"')
+recorded = []
+
+
+def record(metrics):
+    """ Metrics hook collecting what it receives. """
+    recorded.append(metrics)
+
+
+def compress(response, accept_encoding="gzip", **meta):
+    """ Run a response through the middleware for a request. """
+    request = RequestFactory().get(
+        "/api/recipe/recipes/",
+        HTTP_ACCEPT_ENCODING=accept_encoding,
+        **meta
+    )
+
+    return CompressionMiddleware(lambda request: response)(request)
+
+
+def json_response(content=BODY, **kwargs):
+    """ Return a JSON response with content. """
+    return HttpResponse(content, content_type="application/json", **kwargs)
+
+
+@override_settings(COMPRESSION={
+    "MIN_SIZE": 200,
+    "METRICS_HOOK": "core.tests.test_middleware.record",
+})
+@patch.object(middleware, "brotli", None)
+class CompressionMiddlewareTests(TestCase):
+
+    def setUp(self):
+        recorded.clear()
+
+    def test_gzip_response(self):
+        """ Test large JSON responses are gzipped. """
+        res = compress(json_response())
+
+        self.assertEqual(res["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(res.content), BODY)
+        self.assertEqual(res["Content-Length"], str(len(res.content)))
+        self.assertIn("Accept-Encoding", res["Vary"])
+
+    def test_not_accepted(self):
+        """ Test clients that don't accept gzip get the plain body. """
+        for accept_encoding in ("", "identity", "gzip;q=0", "deflate"):
+            res = compress(json_response(), accept_encoding)
+
+            self.assertFalse(res.has_header("Content-Encoding"))
+            self.assertEqual(res.content, BODY)
+            self.assertIn("Accept-Encoding", res["Vary"])
+
+    def test_below_threshold(self):
+        """ Test small responses are left alone. """
+        res = compress(json_response(b"{}"))
+
+        self.assertFalse(res.has_header("Content-Encoding"))
+
+    def test_binary_and_partial_content(self):
+        """ Test images and ranges are never compressed. """
+        image = HttpResponse(BODY, content_type="image/jpeg")
+        partial = json_response(status=206)
+
+        self.assertFalse(compress(image).has_header("Content-Encoding"))
+        self.assertFalse(compress(partial).has_header("Content-Encoding"))
+
+    def test_exempt_view(self):
+        """ Test views marked exempt are never compressed. """
+        view = compression_exempt(lambda request: json_response())
+
+        res = compress(view(None))
+
+        self.assertFalse(res.has_header("Content-Encoding"))
+        self.assertEqual(res.content, BODY)
+
+    def test_etag_weakened(self):
+        """ Test a strong ETag becomes weak once the body is encoded. """
+        response = json_response()
+        response["ETag"] = '"abc"'
+
+        self.assertEqual(compress(response)["ETag"], 'W/"abc"')
+
+    def test_streaming_compressed_incrementally(self):
+        """ Test each streamed chunk is flushed as it is compressed. """
+        chunks = [BODY[:100], BODY[100:]]
+        res = compress(StreamingHttpResponse(
+            iter(chunks),
+            content_type="application/x-ndjson"
+        ))
+
+        decompressor = zlib.decompressobj(31)
+        first = decompressor.decompress(next(res.streaming_content))
+        self.assertEqual(first, chunks[0])
+        rest = b"".join(res.streaming_content)
+        self.assertEqual(first + decompressor.decompress(rest), BODY)
+        self.assertEqual(res["Content-Encoding"], "gzip")
+        self.assertFalse(res.has_header("Content-Length"))
+
+    def test_metrics_hook(self):
+        """ Test the hook receives sizes, ratio and CPU time. """
+        res = compress(json_response())
+
+        metrics = recorded[0]
+        self.assertEqual(metrics["encoding"], "gzip")
+        self.assertEqual(metrics["original_size"], len(BODY))
+        self.assertEqual(metrics["compressed_size"], len(res.content))
+        self.assertLess(metrics["ratio"], 1)
+        self.assertGreaterEqual(metrics["cpu_ms"], 0)
+
+    def test_accepted_encodings(self):
+        """ Test Accept-Encoding parsing honours q values. """
+        self.assertEqual(
+            accepted_encodings("gzip;q=0.5, br;q=0, deflate, *;q=0"),
+            {"gzip", "deflate"}
+        )
+
+
+@override_settings(COMPRESSION={"MIN_SIZE": 1})
+@patch.object(middleware, "brotli", None)
+class CompressionEndpointTests(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.client = APIClient(HTTP_ACCEPT_ENCODING="gzip")
+        self.user = get_user_model().objects.create_user(
+            "test@hackfeed.com",
+            "testpass"
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title="Sample recipe",
+            time_minutes=10,
+            price=5.00
+        )
+
+    def test_list_compressed(self):
+        """ Test API responses are compressed. """
+        res = self.client.get(reverse("recipe:recipe-list"))
+
+        self.assertEqual(res["Content-Encoding"], "gzip")
+        self.assertIn(b"Sample recipe", gzip.decompress(res.content))
+
+    def test_upload_image_exempt(self):
+        """ Test image upload responses are not compressed. """
+        url = reverse("recipe:recipe-upload-image", args=[self.recipe.id])
+        image = io.BytesIO()
+        Image.new("RGB", (10, 10)).save(image, format="JPEG")
+        image.name = "image.jpg"
+        image.seek(0)
+
+        res = self.client.post(url, {"image": image}, format="multipart")
+
+        self.assertEqual(res.status_code, 200)
+        self.assertFalse(res.has_header("Content-Encoding"))
+
+
+@skipUnless(middleware.brotli, "brotli is not installed")
+class BrotliCompressionTests(TestCase):
+
+    def test_brotli_preferred(self):
+        """ Test brotli is chosen over gzip when both are accepted. """
+        res = compress(json_response(), "gzip, br")
+
+        self.assertEqual(res["Content-Encoding"], "br")
+        self.assertEqual(middleware.brotli.decompress(res.content), BODY)
+
+
+class InstrumentationMiddlewareTests(TestCase):
+
+    def setUp(self):
+        instrumentation.registry.clear()
+        self.addCleanup(instrumentation.registry.clear)
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@hackfeed.com",
+            "testpass"
+        )
+        self.client.force_authenticate(self.user)
+        Recipe.objects.create(
+            user=self.user,
+            title="Sample recipe",
+            time_minutes=10,
+            price=5.00
+        )
+
+    @patch.dict(
+        instrumentation.INSTRUMENTATION_SETTINGS, {"SERVER_TIMING": True}
+    )
+    def test_server_timing(self):
+        """ Test the timings and query count are sent as Server-Timing. """
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(RECIPES_URL)
+
+        timing = res["Server-Timing"]
+        self.assertTrue(timing.startswith("total;dur="))
+        self.assertIn("serialize;dur=", timing)
+        self.assertIn("render;dur=", timing)
+        self.assertEqual(
+            int(SERVER_TIMING_DB.search(timing).group(1)),
+            len(queries)
+        )
+
+    def test_request_logged(self):
+        """ Test each request is logged as one JSON line. """
+        with self.assertLogs("core.instrumentation", "INFO") as logs:
+            res = self.client.get(RECIPES_URL)
+
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line["view"], "recipe:recipe-list")
+        self.assertEqual(line["status"], 200)
+        self.assertEqual(line["bytes"], len(res.content))
+        self.assertGreater(line["queries"], 0)
+        self.assertFalse(line["over_budget"])
+
+    @patch.object(RecipeViewSet, "query_budget", 0, create=True)
+    def test_query_budget(self):
+        """ Test requests over their view's query budget are flagged. """
+        with self.assertLogs("core.instrumentation", "WARNING") as logs:
+            self.client.get(RECIPES_URL)
+
+        line = json.loads(logs.records[0].getMessage())
+        self.assertTrue(line["over_budget"])
+        self.assertIn(
+            'http_query_budget_exceeded_total{view="recipe:recipe-list"} 1',
+            instrumentation.registry.render()
+        )
+
+    def test_metrics_endpoint(self):
+        """ Test the metrics are served in the Prometheus text format. """
+        self.client.get(RECIPES_URL)
+
+        res = self.client.get(reverse("metrics"))
+
+        content = res.content.decode()
+        self.assertTrue(res["Content-Type"].startswith("text/plain"))
+        self.assertIn(
+            'http_requests_total{method="GET",status="200",'
+            'view="recipe:recipe-list"} 1',
+            content
+        )
+        self.assertIn(
+            "# TYPE http_request_duration_seconds histogram",
+            content
+        )
+
+    @patch.dict(
+        instrumentation.INSTRUMENTATION_SETTINGS,
+        {"METRICS_ALLOWED_IPS": ["10.0.0.1"]}
+    )
+    def test_metrics_restricted(self):
+        """ Test metrics can be limited to known addresses. """
+        res = self.client.get(reverse("metrics"))
+
+        self.assertEqual(res.status_code, 403)
+
+    @patch.dict(
+        instrumentation.INSTRUMENTATION_SETTINGS, {"SERVER_TIMING": False}
+    )
+    def test_server_timing_off(self):
+        """ Test timings aren't sent to clients unless enabled. """
+        res = self.client.get(RECIPES_URL)
+
+        self.assertFalse(res.has_header("Server-Timing"))
+
+    def test_metrics_local_only_by_default(self):
+        """ Test metrics are refused to other hosts unless allowed. """
+        res = self.client.get(reverse("metrics"), REMOTE_ADDR="10.0.0.1")
+
+        self.assertEqual(res.status_code, 403)
+
+    def test_histogram_cumulative(self):
+        """ Test histogram buckets count every value at or below them. """
+        registry = MetricsRegistry()
+        for value in (0.003, 0.3):
+            registry.observe("http_request_duration_seconds",
+                             {"view": "v"}, value, (0.005, 0.5))
+
+        content = registry.render()
+
+        for line in (
+            'http_request_duration_seconds_bucket{view="v",le="0.005"} 1',
+            'http_request_duration_seconds_bucket{view="v",le="0.5"} 2',
+            'http_request_duration_seconds_bucket{view="v",le="+Inf"} 2',
+            'http_request_duration_seconds_count{view="v"} 2',
+        ):
+            self.assertIn(line, content)
+
+
+def spin(seconds):
+    """ Keep the CPU busy for a while. """
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+class StackSamplerTests(TestCase):
+
+    def test_collapse(self):
+        """ Test stacks are collapsed outermost frame first. """
+        def inner():
+            return profiling.collapse(sys._getframe())
+
+        stack = inner().split(";")
+
+        self.assertTrue(stack[-1].startswith("inner (core/tests/"))
+        self.assertTrue(stack[-2].startswith("test_collapse "))
+
+    def test_samples_busy_thread(self):
+        """ Test the sampler records what the sampled thread runs. """
+        sampler = profiling.StackSampler(threading.get_ident(), 0.001)
+
+        sampler.start()
+        spin(0.1)
+        sampler.stop()
+
+        self.assertTrue(any("spin (" in stack for stack in sampler.stacks))
+
+
+class ProfilingMiddlewareTests(TestCase):
+
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output_dir)
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@hackfeed.com",
+            "testpass"
+        )
+        self.client.force_authenticate(self.user)
+
+    def profile(self, **options):
+        """ Patch the profiling settings for the test. """
+        patcher = patch.dict(profiling.PROFILING_SETTINGS, {
+            "OUTPUT_DIR": self.output_dir,
+            "INTERVAL": 0.001,
+            **options,
+        })
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_disabled_not_loaded(self):
+        """ Test the middleware drops out when profiling is off. """
+        self.profile(ENABLED=False, HEADER_TOKEN=None)
+
+        with self.assertRaises(MiddlewareNotUsed):
+            ProfilingMiddleware(lambda request: None)
+
+    def test_sampled_view(self):
+        """ Test chosen views are profiled into collapsed stack files. """
+        self.profile(ENABLED=True, RATE=100, VIEWS=["recipe:recipe-list"])
+
+        res = self.client.get(RECIPES_URL)
+        other = self.client.get(reverse("recipe:tag-list"))
+
+        name = res["X-Profile-Output"]
+        self.assertEqual(os.listdir(self.output_dir), [name])
+        self.assertIn("recipe.recipe-list", name)
+        self.assertFalse(other.has_header("X-Profile-Output"))
+
+    def test_rate(self):
+        """ Test only the configured share of requests is profiled. """
+        self.profile(ENABLED=True, RATE=0)
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertFalse(res.has_header("X-Profile-Output"))
+
+    def test_header_token(self):
+        """ Test a request sending the token is profiled on demand. """
+        self.profile(ENABLED=False, HEADER_TOKEN="secret")
+
+        res = self.client.get(RECIPES_URL, HTTP_X_PROFILE="secret")
+        wrong = self.client.get(RECIPES_URL, HTTP_X_PROFILE="guess")
+
+        self.assertTrue(res.has_header("X-Profile-Output"))
+        self.assertFalse(wrong.has_header("X-Profile-Output"))
@@ -0,0 +1,194 @@
+import io
+import json
+import uuid
+from collections import OrderedDict
+from datetime import date, datetime, time, timezone
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils.translation import gettext_lazy
+
+from rest_framework.exceptions import ErrorDetail, ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+from core.parsers import FastJSONParser
+from core.renderers import FastJSONRenderer
+from core.throttling import login_buckets
+
+
+SAMPLE = OrderedDict([
+    ("price", Decimal("5.10")),
+    ("created", datetime(2020, 1, 2, 3, 4, 5, 678901, timezone.utc)),
+    ("day", date(2020, 1, 2)),
+    ("at", time(3, 4, 5)),
+    ("uuid", uuid.UUID("12345678123456781234567812345678")),
+    ("title", "Crème brûlée \u2028 \u2029 \"quoted\""),
+    ("error", ErrorDetail("Invalid.", code="invalid")),
+    ("lazy", gettext_lazy("This field is required.")),
+    ("nested", [{"id": 1, "tags": [1, 2]}, None, True, 1.5]),
+])
+
+
+def parse(parser, body, encoding="utf-8"):
+    """ Parse body with parser as a request body would be. """
+    return parser.parse(io.BytesIO(body), parser_context={
+        "encoding": encoding
+    })
+
+
+class FastJSONRendererTests(TestCase):
+
+    def assertSameRender(self, data, **kwargs):
+        """ Assert data renders to the same bytes as with JSONRenderer. """
+        self.assertEqual(
+            FastJSONRenderer().render(data, **kwargs),
+            JSONRenderer().render(data, **kwargs)
+        )
+
+    def test_matches_json_renderer(self):
+        """ Test the output is byte for byte JSONRenderer's. """
+        self.assertSameRender(SAMPLE)
+        self.assertSameRender([SAMPLE, SAMPLE])
+
+    def test_none_renders_empty(self):
+        """ Test no data renders an empty body. """
+        self.assertEqual(FastJSONRenderer().render(None), b"")
+
+    def test_indent_matches(self):
+        """ Test indented output is left to JSONRenderer. """
+        self.assertSameRender(
+            SAMPLE,
+            accepted_media_type="application/json; indent=4"
+        )
+
+    def test_unsupported_values_fall_back(self):
+        """ Test values orjson can't encode are still rendered. """
+        self.assertSameRender({"big": 2 ** 70, 1: "int key"})
+
+    def test_without_orjson(self):
+        """ Test the standard library is used when orjson is missing. """
+        with patch("core.renderers.orjson", None):
+            self.assertSameRender(SAMPLE)
+
+
+class FastJSONParserTests(TestCase):
+
+    def test_matches_json_parser(self):
+        """ Test bodies parse to the same data as with JSONParser. """
+        body = JSONRenderer().render(SAMPLE)
+
+        self.assertEqual(
+            parse(FastJSONParser(), body),
+            parse(JSONParser(), body)
+        )
+
+    def test_invalid_json(self):
+        """ Test invalid bodies raise the same error as JSONParser. """
+        for body in (b"{", b"[NaN]", b""):
+            with self.assertRaises(ParseError) as fast:
+                parse(FastJSONParser(), body)
+            with self.assertRaises(ParseError) as default:
+                parse(JSONParser(), body)
+            self.assertEqual(fast.exception.detail, default.exception.detail)
+
+    def test_other_encodings(self):
+        """ Test bodies in other encodings are decoded first. """
+        body = '{"title": "Crème"}'.encode("latin-1")
+
+        self.assertEqual(
+            parse(FastJSONParser(), body, encoding="latin-1"),
+            {"title": "Crème"}
+        )
+
+    def test_without_orjson(self):
+        """ Test the standard library is used when orjson is missing. """
+        with patch("core.parsers.orjson", None):
+            self.assertEqual(parse(FastJSONParser(), b'{"a": 1}'), {"a": 1})
+
+
+class EndpointRenderingTests(TestCase):
+    """ Test every endpoint renders what the default renderer would. """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@hackfeed.com",
+            "testpass",
+            name="Zoë \u2028"
+        )
+        self.client.force_authenticate(self.user)
+        recipe = Recipe.objects.create(
+            user=self.user,
+            title="Crème brûlée",
+            time_minutes=45,
+            price=Decimal("7.50")
+        )
+        recipe.tags.add(Tag.objects.create(user=self.user, name="Dessert"))
+        recipe.ingredients.add(
+            Ingredient.objects.create(user=self.user, name="Crème")
+        )
+        self.recipe = recipe
+
+    def assertDefaultRendering(self, res):
+        """ Assert the body equals JSONRenderer's rendering of the data. """
+        self.assertEqual(res["Content-Type"], "application/json")
+        self.assertEqual(res.content, JSONRenderer().render(res.data))
+
+    def test_read_endpoints(self):
+        """ Test list, detail and profile responses. """
+        urls = [
+            reverse("recipe:tag-list"),
+            reverse("recipe:ingredient-list"),
+            reverse("recipe:recipe-list"),
+            reverse("recipe:recipe-detail", args=[self.recipe.id]),
+            reverse("user:me"),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertDefaultRendering(self.client.get(url))
+
+    def test_write_endpoints(self):
+        """ Test JSON request bodies and the responses to them. """
+        res = self.client.post(
+            reverse("recipe:recipe-list"),
+            {"title": "Crêpes", "time_minutes": 10, "price": "2.10",
+             "tags": [], "ingredients": []},
+            format="json"
+        )
+        self.assertEqual(res.data["title"], "Crêpes")
+        self.assertDefaultRendering(res)
+
+        res = self.client.post(
+            reverse("recipe:recipe-bulk"),
+            [{"title": "Bad"}],
+            format="json"
+        )
+        self.assertDefaultRendering(res)
+
+    def test_token_endpoint(self):
+        """ Test token creation from an unauthenticated client. """
+        login_buckets.clear()
+        res = APIClient().post(
+            reverse("user:token"),
+            {"email": "test@hackfeed.com", "password": "testpass"},
+            format="json"
+        )
+
+        self.assertIn("token", res.data)
+        self.assertDefaultRendering(res)
+
+    def test_export(self):
+        """ Test exported rows parse to the listed recipes. """
+        listed = self.client.get(reverse("recipe:recipe-list"))
+        res = self.client.get(reverse("recipe:recipe-export"))
+
+        self.assertEqual(
+            json.loads(b"".join(res.streaming_content)),
+            json.loads(JSONRenderer().render(listed.data["results"]))
+        )
@@ -0,0 +1,147 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.models import Recipe, StoredFile
+from core.storage import ContentAddressedStorage
+
+
+class ContentAddressedStorageTests(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.user = get_user_model().objects.create_user(
+            "test@hackfeed.com",
+            "testpass"
+        )
+
+    def sample_recipe(self, content=b"image"):
+        """ Create a recipe whose image holds content. """
+        recipe = Recipe.objects.create(
+            user=self.user,
+            title="Sample recipe",
+            time_minutes=10,
+            price=5.00
+        )
+        recipe.image.save("photo.jpg", ContentFile(content))
+
+        return recipe
+
+    def test_default_storage_content_addressed(self):
+        """ Test uploads go through the content addressed storage. """
+        self.assertIsInstance(
+            default_storage._wrapped,
+            ContentAddressedStorage
+        )
+
+    def test_identical_uploads_stored_once(self):
+        """ Test saving the same bytes twice keeps one file. """
+        first_recipe = self.sample_recipe()
+        second_recipe = self.sample_recipe()
+
+        self.assertEqual(first_recipe.image.name, second_recipe.image.name)
+        self.assertTrue(first_recipe.image.name.startswith("uploads/recipe/"))
+        self.assertTrue(first_recipe.image.name.endswith(".jpg"))
+        stored = StoredFile.objects.get()
+        self.assertEqual(stored.refs, 2)
+        self.assertEqual(stored.size, len(b"image"))
+        self.assertIn(stored.digest, stored.name)
+
+    def test_different_uploads_stored_apart(self):
+        """ Test different bytes are stored under different names. """
+        first_recipe = self.sample_recipe(b"first")
+        second_recipe = self.sample_recipe(b"second")
+
+        self.assertNotEqual(first_recipe.image.name, second_recipe.image.name)
+        self.assertEqual(StoredFile.objects.count(), 2)
+
+    def test_replacing_image_releases_reference(self):
+        """ Test replacing an image drops the old file's reference. """
+        recipe = self.sample_recipe(b"first")
+        old_name = recipe.image.name
+
+        recipe.image.save("photo.jpg", ContentFile(b"second"))
+
+        self.assertEqual(StoredFile.objects.get(name=old_name).refs, 0)
+        self.assertEqual(
+            StoredFile.objects.get(name=recipe.image.name).refs,
+            1
+        )
+
+    def test_deleting_recipe_releases_reference(self):
+        """ Test deleting a recipe drops its image's reference. """
+        self.sample_recipe()
+        recipe = self.sample_recipe()
+
+        recipe.delete()
+
+        self.assertEqual(StoredFile.objects.get().refs, 1)
+
+    def test_gc_media_removes_orphans(self):
+        """ Test unreferenced files are removed after the grace time. """
+        kept = self.sample_recipe(b"kept")
+        orphan = self.sample_recipe(b"orphan")
+        orphan_path = orphan.image.path
+        orphan.delete()
+        StoredFile.objects.update(
+            created_at=timezone.now() - timedelta(hours=2)
+        )
+
+        call_command("gc_media", stdout=StringIO())
+
+        self.assertFalse(os.path.exists(orphan_path))
+        self.assertTrue(os.path.exists(kept.image.path))
+        self.assertEqual(
+            list(StoredFile.objects.values_list("name", flat=True)),
+            [kept.image.name]
+        )
+
+    def test_gc_media_keeps_recent_files(self):
+        """ Test unreferenced files within the grace time are kept. """
+        orphan = self.sample_recipe()
+        orphan_path = orphan.image.path
+        orphan.delete()
+
+        call_command("gc_media", stdout=StringIO())
+
+        self.assertTrue(os.path.exists(orphan_path))
+
+    def test_gc_media_fixes_drift(self):
+        """ Test reference counts are reset to the real references. """
+        recipe = self.sample_recipe()
+        StoredFile.objects.update(
+            refs=0,
+            created_at=timezone.now() - timedelta(hours=2)
+        )
+
+        call_command("gc_media", stdout=StringIO())
+
+        self.assertTrue(os.path.exists(recipe.image.path))
+        self.assertEqual(StoredFile.objects.get().refs, 1)
+
+    def test_gc_media_dry_run(self):
+        """ Test a dry run reports orphans without removing them. """
+        orphan = self.sample_recipe()
+        orphan_path = orphan.image.path
+        orphan.delete()
+        StoredFile.objects.update(
+            created_at=timezone.now() - timedelta(hours=2)
+        )
+
+        call_command("gc_media", "--dry-run", stdout=StringIO())
+
+        self.assertTrue(os.path.exists(orphan_path))
+        self.assertTrue(StoredFile.objects.exists())
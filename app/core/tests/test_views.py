@@ -0,0 +1,171 @@
+import os
+import shutil
+import tempfile
+
+from django.test import TestCase, override_settings
+
+
+CONTENT = b"0123456789abcdefghij"
+DIGEST = "a" * 64
+
+
+def media_url(name):
+    """ Return the URL serving a media file. """
+    return f"/media/{name}"
+
+
+def read(res):
+    """ Return the body of a plain or streaming response. """
+    if res.streaming:
+        return b"".join(res.streaming_content)
+
+    return res.content
+
+
+class ServeMediaTests(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media = override_settings(
+            MEDIA_ROOT=self.media_root,
+            SENDFILE_BACKEND=None
+        )
+        media.enable()
+        self.addCleanup(media.disable)
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.write("plain.txt")
+        self.write(f"uploads/{DIGEST}.jpg")
+
+    def write(self, name, content=CONTENT):
+        """ Write a file under the temporary media root. """
+        path = os.path.join(self.media_root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(content)
+
+    def test_serve_file(self):
+        """ Test a file is served whole with validators. """
+        res = self.client.get(media_url("plain.txt"))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(read(res), CONTENT)
+        self.assertEqual(res["Accept-Ranges"], "bytes")
+        self.assertEqual(res["Cache-Control"], "public, max-age=3600")
+        self.assertTrue(res["ETag"].startswith('"'))
+        self.assertIn("Last-Modified", res)
+
+    def test_hashed_name_immutable(self):
+        """ Test hashed names are cached for good under their digest. """
+        res = self.client.get(media_url(f"uploads/{DIGEST}.jpg"))
+        res.close()
+
+        self.assertEqual(res["ETag"], f'"{DIGEST}"')
+        self.assertIn("immutable", res["Cache-Control"])
+        self.assertEqual(res["Content-Type"], "image/jpeg")
+
+    def test_not_modified(self):
+        """ Test a matching If-None-Match gets an empty 304. """
+        etag = self.client.get(media_url("plain.txt"))["ETag"]
+
+        res = self.client.get(media_url("plain.txt"), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.content, b"")
+
+    def test_not_modified_since(self):
+        """ Test If-Modified-Since alone gets a 304 for fractional mtimes. """
+        path = os.path.join(self.media_root, "plain.txt")
+        os.utime(path, (1500000000.5, 1500000000.5))
+        last_modified = self.client.get(media_url("plain.txt"))
+
+        res = self.client.get(
+            media_url("plain.txt"),
+            HTTP_IF_MODIFIED_SINCE=last_modified["Last-Modified"]
+        )
+
+        self.assertEqual(res.status_code, 304)
+
+    def test_range(self):
+        """ Test a byte range is served as partial content. """
+        res = self.client.get(media_url("plain.txt"), HTTP_RANGE="bytes=2-5")
+
+        self.assertEqual(res.status_code, 206)
+        self.assertEqual(read(res), CONTENT[2:6])
+        self.assertEqual(res["Content-Range"], f"bytes 2-5/{len(CONTENT)}")
+        self.assertEqual(res["Content-Length"], "4")
+
+    def test_suffix_range(self):
+        """ Test a suffix range returns the end of the file. """
+        res = self.client.get(media_url("plain.txt"), HTTP_RANGE="bytes=-3")
+
+        self.assertEqual(res.status_code, 206)
+        self.assertEqual(read(res), CONTENT[-3:])
+
+    def test_unsatisfiable_range(self):
+        """ Test a range past the end of the file is rejected. """
+        res = self.client.get(media_url("plain.txt"), HTTP_RANGE="bytes=99-")
+
+        self.assertEqual(res.status_code, 416)
+        self.assertEqual(res["Content-Range"], f"bytes */{len(CONTENT)}")
+
+    def test_stale_if_range_serves_whole_file(self):
+        """ Test a range is ignored when If-Range no longer matches. """
+        res = self.client.get(
+            media_url("plain.txt"),
+            HTTP_RANGE="bytes=2-5",
+            HTTP_IF_RANGE='"stale"'
+        )
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(read(res), CONTENT)
+
+    def test_head(self):
+        """ Test HEAD returns the headers without a body. """
+        res = self.client.head(media_url("plain.txt"))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.content, b"")
+        self.assertEqual(res["Content-Length"], str(len(CONTENT)))
+
+    def test_post_not_allowed(self):
+        """ Test files can't be written through the view. """
+        res = self.client.post(media_url("plain.txt"))
+
+        self.assertEqual(res.status_code, 405)
+
+    def test_missing_file(self):
+        """ Test missing files and directories are not found. """
+        self.assertEqual(self.client.get(media_url("nope.txt")).status_code,
+                         404)
+        self.assertEqual(self.client.get(media_url("uploads")).status_code,
+                         404)
+
+    def test_path_traversal(self):
+        """ Test paths outside the media root are not served. """
+        res = self.client.get(media_url("../../etc/passwd"))
+
+        self.assertEqual(res.status_code, 404)
+
+    @override_settings(
+        SENDFILE_BACKEND="x-accel-redirect",
+        SENDFILE_ACCEL_PREFIX="/internal/"
+    )
+    def test_x_accel_redirect(self):
+        """ Test nginx offload points at the internal location. """
+        res = self.client.get(media_url("plain.txt"))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res["X-Accel-Redirect"], "/internal/media/plain.txt")
+        self.assertEqual(res.content, b"")
+        self.assertIn("ETag", res)
+
+    @override_settings(SENDFILE_BACKEND="x-sendfile")
+    def test_x_sendfile(self):
+        """ Test X-Sendfile offload points at the file on disk. """
+        res = self.client.get(media_url("plain.txt"))
+
+        self.assertEqual(
+            res["X-Sendfile"],
+            os.path.join(self.media_root, "plain.txt")
+        )
+        self.assertEqual(res.content, b"")
@@ -0,0 +1,110 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from rest_framework.throttling import BaseThrottle
+
+
+THROTTLE_SETTINGS = {
+    "MAX_KEYS": 100000,
+    "IP_BURST": 20,
+    "IP_PER_MINUTE": 10,
+    "EMAIL_BURST": 5,
+    "EMAIL_PER_MINUTE": 2,
+}
+
+
+class TokenBucketStore:
+    """ Thread safe in-process token buckets, least recently used evicted.
+
+    A bucket starts with ``capacity`` tokens and regains ``rate`` tokens
+    per second up to its capacity; every attempt takes one token.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def consume(self, key, capacity, rate):
+        """ Take a token from key's bucket.
+
+        Returns 0 when a token was available, otherwise the seconds until
+        the next one is.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_size:
+                self._buckets.popitem(last=False)
+
+        return wait
+
+    def clear(self):
+        """ Refill every bucket by forgetting them. """
+        with self._lock:
+            self._buckets.clear()
+
+
+login_buckets = TokenBucketStore(THROTTLE_SETTINGS["MAX_KEYS"])
+
+
+def throttle_settings():
+    """ Return the login throttle settings merged over the defaults. """
+    merged = dict(THROTTLE_SETTINGS)
+    merged.update(getattr(settings, "LOGIN_THROTTLE", {}))
+
+    return merged
+
+
+class LoginRateThrottle(BaseThrottle):
+    """ Throttle login attempts per client IP and per submitted email.
+
+    Both buckets are charged on every attempt, so a client that keeps
+    retrying while throttled stays throttled.
+    """
+    store = login_buckets
+
+    def allow_request(self, request, view):
+        config = throttle_settings()
+        buckets = [(
+            ("ip", self.get_ident(request)),
+            config["IP_BURST"],
+            config["IP_PER_MINUTE"] / 60
+        )]
+        email = self.get_email(request)
+        if email:
+            buckets.append((
+                ("email", email),
+                config["EMAIL_BURST"],
+                config["EMAIL_PER_MINUTE"] / 60
+            ))
+        self.wait_seconds = max(
+            self.store.consume(key, capacity, rate)
+            for key, capacity, rate in buckets
+        )
+
+        return self.wait_seconds == 0
+
+    def get_email(self, request):
+        """ Return the normalised email the request tries to log in as. """
+        email = getattr(request.data, "get", lambda key: None)("email")
+        if isinstance(email, str):
+            return email.strip().lower()
+
+        return None
+
+    def wait(self):
+        return self.wait_seconds
@@ -0,0 +1,196 @@
+import mimetypes
+import os
+import posixpath
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (
+    FileResponse, Http404, HttpResponse, HttpResponseForbidden,
+    StreamingHttpResponse
+)
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+from core import instrumentation
+
+
+HASHED_NAME = re.compile(r"(^|\.)([0-9a-f]{12}|[0-9a-f]{64})\.\w+$")
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+CHUNK_SIZE = 64 * 1024
+
+
+def _resolve(document_root, path):
+    """ Return the absolute path of an existing file under the root. """
+    path = posixpath.normpath(path).lstrip("/")
+    try:
+        full_path = safe_join(document_root, path)
+    except SuspiciousFileOperation:
+        raise Http404("File not found.")
+    if not os.path.isfile(full_path):
+        raise Http404("File not found.")
+
+    return path, full_path
+
+
+def _etag(path, stat):
+    """ Return a strong ETag, the digest itself for hashed names. """
+    match = HASHED_NAME.search(os.path.basename(path))
+    if match:
+        return f'"{match.group(2)}"'
+
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def _parse_range(request, etag, size):
+    """ Return the (start, end) byte range asked for, if one applies.
+
+    Only single ranges are honoured; anything else is served whole.
+    Returns False for a range that can't be satisfied.
+    """
+    header = request.META.get("HTTP_RANGE", "")
+    match = RANGE.match(header.replace(" ", ""))
+    if not match:
+        return None
+    if_range = request.META.get("HTTP_IF_RANGE")
+    if if_range and if_range != etag:
+        return None
+
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        start, end = int(start), min(int(end or size - 1), size - 1)
+    if start > end or start >= size:
+        return False
+
+    return start, end
+
+
+def _read_range(full_path, start, end):
+    """ Yield the bytes between start and end inclusive. """
+    with open(full_path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _offload(url_path, full_path):
+    """ Return a response handing the body to the front end server. """
+    backend = getattr(settings, "SENDFILE_BACKEND", None)
+    if backend == "x-accel-redirect":
+        response = HttpResponse()
+        prefix = getattr(settings, "SENDFILE_ACCEL_PREFIX", "/internal")
+        response["X-Accel-Redirect"] = prefix.rstrip("/") + url_path
+    elif backend == "x-sendfile":
+        response = HttpResponse()
+        response["X-Sendfile"] = full_path
+    else:
+        return None
+    # Let the front end server fill in the body headers itself.
+    del response["Content-Type"]
+
+    return response
+
+
+def _serve(request, path, document_root, url_prefix):
+    """ Serve a file with validators, cache headers and byte ranges. """
+    path, full_path = _resolve(document_root, path)
+    stat = os.stat(full_path)
+    etag = _etag(path, stat)
+    # HTTP dates are whole seconds, so compare If-Modified-Since with them.
+    mtime = int(stat.st_mtime)
+    last_modified = http_date(mtime)
+
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=mtime
+    )
+    if response is None:
+        response = _offload(url_prefix + path, full_path)
+    if response is None:
+        response = _file_response(request, full_path, etag, stat.st_size)
+
+    response["ETag"] = etag
+    response["Last-Modified"] = last_modified
+    if HASHED_NAME.search(os.path.basename(path)):
+        response["Cache-Control"] = (
+            f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+        )
+    else:
+        max_age = getattr(settings, "MEDIA_CACHE_MAX_AGE", 3600)
+        response["Cache-Control"] = f"public, max-age={max_age}"
+
+    return response
+
+
+def _file_response(request, full_path, etag, size):
+    """ Return the file, or the requested part of it, from Python. """
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or "application/octet-stream"
+    byte_range = _parse_range(request, etag, size)
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+    elif request.method == "HEAD":
+        response = HttpResponse(content_type=content_type)
+        response["Content-Length"] = size
+    elif byte_range:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            _read_range(full_path, start, end),
+            status=206,
+            content_type=content_type
+        )
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response["Content-Length"] = end - start + 1
+    else:
+        # FileResponse hands the file to wsgi.file_wrapper, letting the
+        # server use sendfile() for the body.
+        response = FileResponse(
+            open(full_path, "rb"),
+            content_type=content_type
+        )
+    if encoding:
+        response["Content-Encoding"] = encoding
+    response["Accept-Ranges"] = "bytes"
+
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    """ Serve an uploaded file from MEDIA_ROOT. """
+    return _serve(request, path, settings.MEDIA_ROOT, settings.MEDIA_URL)
+
+
+@require_safe
+def serve_static(request, path):
+    """ Serve a collected static file from STATIC_ROOT. """
+    return _serve(request, path, settings.STATIC_ROOT, settings.STATIC_URL)
+
+
+@require_safe
+def metrics(request):
+    """ Serve request metrics in the Prometheus text format. """
+    allowed = instrumentation.INSTRUMENTATION_SETTINGS["METRICS_ALLOWED_IPS"]
+    if allowed is not None and request.META.get("REMOTE_ADDR") not in allowed:
+        return HttpResponseForbidden()
+
+    return HttpResponse(
+        instrumentation.registry.render(),
+        content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
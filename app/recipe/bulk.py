@@ -0,0 +1,242 @@
+from collections import Counter
+
+from django.db import connection, transaction
+from django.db.models import prefetch_related_objects
+
+from rest_framework.exceptions import ValidationError
+
+from core.models import Tag, Ingredient, Recipe
+
+from recipe import cache, search, stats
+from recipe.serializers import RecipeBulkSerializer
+
+
+MAX_ITEMS = 1000
+RELATIONS = (("tags", Tag), ("ingredients", Ingredient))
+
+
+def get_or_create_named(model, user, names):
+    """ Return user's attributes for names, creating the missing ones.
+
+    Existing names are resolved in one query and the rest inserted in one
+    statement. Rows a concurrent batch inserted first are skipped by the
+    (user, name) constraint and picked up by the final lookup.
+    """
+    names = list(dict.fromkeys(names))
+    found = {
+        name: (pk, recipe_count) for name, pk, recipe_count
+        in model.objects.filter(user=user, name__in=names)
+        .values_list("name", "id", "recipe_count")
+    }
+    missing = [name for name in names if name not in found]
+    if missing:
+        model.objects.bulk_create(
+            [model(user=user, name=name) for name in missing],
+            ignore_conflicts=True
+        )
+        found.update(
+            (name, (pk, recipe_count)) for name, pk, recipe_count
+            in model.objects.filter(user=user, name__in=missing)
+            .values_list("name", "id", "recipe_count")
+        )
+        cache.invalidate(user.pk)
+
+    return [
+        model(id=found[name][0], user=user, name=name,
+              recipe_count=found[name][1])
+        for name in names
+    ]
+
+
+def _check_batch(data, item_type):
+    """ Reject payloads that aren't a list of at most MAX_ITEMS items. """
+    if not isinstance(data, list):
+        raise ValidationError({
+            "non_field_errors": [f"Expected a list of {item_type}."]
+        })
+    if len(data) > MAX_ITEMS:
+        raise ValidationError({
+            "non_field_errors": [f"Ensure there are at most {MAX_ITEMS} "
+                                 f"{item_type}."]
+        })
+
+
+def _lookup(queryset, ids, errors):
+    """ Fetch objects by id in one query, reporting unknown ids. """
+    found = queryset.in_bulk([pk for pk in ids if pk is not None])
+    seen = set()
+    for pk, error in zip(ids, errors):
+        if pk is None:
+            if not error:
+                error["id"] = ["This field is required."]
+        elif pk in seen:
+            error.setdefault("id", []).append("Duplicate id.")
+        elif pk not in found:
+            error.setdefault("id", []).append("Not found.")
+        seen.add(pk)
+
+    return [found.get(pk) for pk in ids]
+
+
+def _check_relations(items, errors):
+    """ Validate the related ids of every item with one query per model. """
+    for field, model in RELATIONS:
+        ids = {pk for item in items for pk in item.get(field, ())}
+        existing = set(
+            model.objects.filter(id__in=ids).values_list("id", flat=True)
+        ) if ids else set()
+        for item, error in zip(items, errors):
+            missing = [pk for pk in item.get(field, ()) if pk not in existing]
+            if missing:
+                error[field] = [
+                    f'Invalid pk "{pk}" - object does not exist.'
+                    for pk in missing
+                ]
+
+
+def validate_recipes(data, partial=False):
+    """ Validate a batch of recipe payloads.
+
+    Returns the validated items and one error dict per item, empty for
+    valid items.
+    """
+    _check_batch(data, "recipes")
+    serializers = [
+        RecipeBulkSerializer(data=item, partial=partial) for item in data
+    ]
+    errors = [
+        {} if serializer.is_valid() else dict(serializer.errors)
+        for serializer in serializers
+    ]
+    items = [
+        {} if error else dict(serializer.validated_data)
+        for serializer, error in zip(serializers, errors)
+    ]
+    _check_relations(items, errors)
+
+    return items, errors
+
+
+def _raise_errors(errors):
+    """ Raise the per item errors if any item failed. """
+    if any(errors):
+        raise ValidationError(errors)
+
+
+def _column_values(item):
+    """ Return the item's values for Recipe columns. """
+    return {
+        key: value for key, value in item.items()
+        if key != "id" and key not in dict(RELATIONS)
+    }
+
+
+def _insert(recipes):
+    """ Insert recipes, making sure their primary keys are set. """
+    if connection.features.can_return_ids_from_bulk_insert:
+        Recipe.objects.bulk_create(recipes)
+    else:
+        # Without RETURNING the new ids are unknown, so insert one by one.
+        for recipe in recipes:
+            recipe.save()
+
+
+def _write_relations(recipes, items, replace):
+    """ Write the through rows of every item that sets a relation. """
+    for field, _ in RELATIONS:
+        m2m = Recipe._meta.get_field(field)
+        through = m2m.remote_field.through
+        target = f"{m2m.m2m_reverse_field_name()}_id"
+        changed = [
+            (recipe, dict.fromkeys(item[field]))
+            for recipe, item in zip(recipes, items) if field in item
+        ]
+        deltas = Counter(pk for _, ids in changed for pk in ids)
+        if replace and changed:
+            replaced = [recipe.pk for recipe, _ in changed]
+            deltas.subtract(stats.linked_ids(field, replaced))
+            through.objects.filter(recipe_id__in=replaced).delete()
+        through.objects.bulk_create(
+            through(recipe_id=recipe.pk, **{target: pk})
+            for recipe, ids in changed for pk in ids
+        )
+        stats.links_changed(field, deltas)
+
+
+def _loaded(recipes):
+    """ Return recipes with their relations prefetched for serializing. """
+    prefetch_related_objects(recipes, *dict(RELATIONS))
+
+    return recipes
+
+
+def create_recipes(user, data):
+    """ Create a batch of recipes for user in one transaction. """
+    items, errors = validate_recipes(data)
+    _raise_errors(errors)
+
+    with transaction.atomic(), stats.handled_explicitly():
+        recipes = [
+            Recipe(user=user, **_column_values(item)) for item in items
+        ]
+        _insert(recipes)
+        stats.recipes_changed(added=map(stats.row, recipes))
+        _write_relations(recipes, items, replace=False)
+        search.refresh(recipe.pk for recipe in recipes)
+    cache.invalidate(user.pk)
+
+    return _loaded(recipes)
+
+
+def update_recipes(user, data):
+    """ Partially update a batch of user's recipes in one transaction. """
+    items, errors = validate_recipes(data, partial=True)
+    ids = [item.get("id") for item in items]
+    recipes = _lookup(Recipe.objects.filter(user=user), ids, errors)
+    _raise_errors(errors)
+
+    with transaction.atomic(), stats.handled_explicitly():
+        old_rows = [stats.row(recipe) for recipe in recipes]
+        fields = set()
+        for recipe, item in zip(recipes, items):
+            for key, value in _column_values(item).items():
+                setattr(recipe, key, value)
+                fields.add(key)
+        if fields:
+            Recipe.objects.bulk_update(recipes, fields)
+            stats.recipes_changed(
+                removed=old_rows,
+                added=map(stats.row, recipes)
+            )
+        _write_relations(recipes, items, replace=True)
+        search.refresh(recipe.pk for recipe in recipes)
+    cache.invalidate(user.pk)
+
+    return _loaded(recipes)
+
+
+def delete_recipes(user, data):
+    """ Delete a batch of user's recipes by id in one transaction. """
+    _check_batch(data, "ids")
+    errors = [{} for _ in data]
+    ids = []
+    for pk, error in zip(data, errors):
+        if isinstance(pk, int) and not isinstance(pk, bool):
+            ids.append(pk)
+        else:
+            ids.append(None)
+            error["id"] = ["A valid integer is required."]
+    _lookup(Recipe.objects.filter(user=user), ids, errors)
+    _raise_errors(errors)
+
+    with transaction.atomic(), stats.handled_explicitly():
+        recipes = Recipe.objects.filter(user=user, id__in=ids)
+        stats.recipes_changed(
+            removed=recipes.values_list("user_id", "time_minutes", "price")
+        )
+        for field, _ in RELATIONS:
+            stats.links_changed(field, {
+                pk: -count
+                for pk, count in stats.linked_ids(field, ids).items()
+            })
+        recipes.delete()
@@ -0,0 +1,116 @@
+import hashlib
+import uuid
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+from recipe.export import dumps
+
+
+CACHE_SETTINGS = {
+    "BACKEND": None,
+    "TIMEOUT": 300,
+}
+
+
+def cache_settings():
+    """ Return the cache settings, read per call so tests can override. """
+    return {**CACHE_SETTINGS, **getattr(settings, "RECIPE_ATTRS_CACHE", {})}
+
+
+def backend():
+    """ Return the shared cache holding list responses, if any.
+
+    Process local caches are ignored: a write handled by one worker would
+    only expire the generation of that worker, and the others would keep
+    serving stale lists and 304s until their entries time out.
+    """
+    alias = cache_settings()["BACKEND"]
+    if alias is None:
+        return None
+    cache = caches[alias]
+    if isinstance(cache, LocMemCache):
+        return None
+
+    return cache
+
+
+def generation_key(user_id):
+    """ Return the cache key holding a user's cache generation. """
+    return f"recipe-attrs:generation:{user_id}"
+
+
+def get_generation(cache, user_id):
+    """ Return the current cache generation for a user. """
+    return cache.get_or_set(
+        generation_key(user_id),
+        lambda: uuid.uuid4().hex,
+        None
+    )
+
+
+def invalidate(user_id):
+    """ Expire every cached list response of a user.
+
+    The generation is dropped right away and again once the surrounding
+    transaction commits, so a list read between the two can't keep data
+    the commit is about to change.
+    """
+    cache = backend()
+    if cache is None:
+        return
+    cache.delete(generation_key(user_id))
+    transaction.on_commit(lambda: cache.delete(generation_key(user_id)))
+
+
+def response_key(request, basename):
+    """ Return the cache key for a list request, None when not caching. """
+    cache = backend()
+    if cache is None:
+        return None
+    params = urlencode(sorted(request.query_params.lists()), doseq=True)
+    digest = hashlib.md5(
+        f"{request.get_host()}?{params}".encode()
+    ).hexdigest()
+    user_id = request.user.pk
+
+    return (
+        f"recipe-attrs:{basename}:{user_id}:"
+        f"{get_generation(cache, user_id)}:{digest}"
+    )
+
+
+def get_entry(key):
+    """ Return the cached entry for key, if any. """
+    if key is None:
+        return None
+
+    return backend().get(key)
+
+
+def set_entry(key, data):
+    """ Cache response data under key and return the new entry. """
+    entry = {"etag": make_etag(data), "data": data}
+    if key is not None:
+        backend().set(key, entry, cache_settings()["TIMEOUT"])
+
+    return entry
+
+
+def make_etag(data):
+    """ Return a strong ETag for response data. """
+    return '"%s"' % hashlib.md5(dumps(data).encode()).hexdigest()
+
+
+def etag_matches(request, etag):
+    """ Return whether the request's If-None-Match covers the ETag. """
+    header = request.META.get("HTTP_IF_NONE_MATCH", "")
+    candidates = [
+        candidate.strip().replace("W/", "", 1)
+        for candidate in header.split(",")
+    ]
+
+    return etag in candidates or "*" in candidates
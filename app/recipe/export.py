@@ -0,0 +1,63 @@
+from django.db.models import prefetch_related_objects
+
+from core.renderers import FastJSONRenderer
+
+
+JSON = "json"
+NDJSON = "ndjson"
+CONTENT_TYPES = {
+    JSON: "application/json",
+    NDJSON: "application/x-ndjson",
+}
+
+_renderer = FastJSONRenderer()
+
+
+def dumps(data):
+    """ Encode data the way the default JSON renderer does. """
+    return _renderer.render(data).decode()
+
+
+def iter_chunks(queryset, chunk_size):
+    """ Yield lists of objects read from a server side cursor. """
+    chunk = []
+    for obj in queryset.iterator(chunk_size=chunk_size):
+        chunk.append(obj)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_encoded(queryset, serializer_class, chunk_size, prefetches=()):
+    """ Yield lists of encoded rows, prefetching relations per chunk.
+
+    ``iterator()`` ignores ``prefetch_related``, so the lookups are applied
+    to each chunk instead to keep a constant number of queries per chunk.
+    """
+    for chunk in iter_chunks(queryset, chunk_size):
+        prefetch_related_objects(chunk, *prefetches)
+        yield [dumps(serializer_class(obj).data) for obj in chunk]
+
+
+def stream_json(chunks):
+    """ Yield the encoded rows as a single JSON array. """
+    yield "["
+    separator = ""
+    for rows in chunks:
+        yield separator + ",".join(rows)
+        separator = ","
+    yield "]"
+
+
+def stream_ndjson(chunks):
+    """ Yield the encoded rows as newline delimited JSON. """
+    for rows in chunks:
+        yield "".join(f"{row}\n" for row in rows)
+
+
+STREAMS = {
+    JSON: stream_json,
+    NDJSON: stream_ndjson,
+}
@@ -0,0 +1,174 @@
+from django.db.models import Count, Exists, OuterRef
+
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+from core.models import Recipe
+
+
+MATCH_ANY = "any"
+MATCH_ALL = "all"
+MATCH_MODES = (MATCH_ANY, MATCH_ALL)
+
+# Bounds match the integer time_minutes and id columns, so out of range
+# values are rejected here instead of overflowing in the database.
+MAX_INTEGER = 2147483647
+ID_FIELD = serializers.IntegerField(min_value=1, max_value=MAX_INTEGER)
+
+RANGE_FILTERS = {
+    "time_min": (
+        "time_minutes__gte",
+        serializers.IntegerField(min_value=0, max_value=MAX_INTEGER)
+    ),
+    "time_max": (
+        "time_minutes__lte",
+        serializers.IntegerField(min_value=0, max_value=MAX_INTEGER)
+    ),
+    "price_min": (
+        "price__gte",
+        serializers.DecimalField(max_digits=5, decimal_places=2)
+    ),
+    "price_max": (
+        "price__lte",
+        serializers.DecimalField(max_digits=5, decimal_places=2)
+    ),
+}
+
+# Every ordering is backed by a (user, field, id) index on Recipe and
+# breaks ties on id in the same direction, so pages are read in index
+# order.
+ORDERINGS = {
+    "id": ("id",),
+    "-id": ("-id",),
+    "time_minutes": ("time_minutes", "id"),
+    "-time_minutes": ("-time_minutes", "-id"),
+    "price": ("price", "id"),
+    "-price": ("-price", "-id"),
+}
+# Tags and ingredients by name, or most used first from the
+# (user, recipe_count, id) index.
+ATTR_ORDERINGS = {
+    "-name": ("-name", "id"),
+    "popularity": ("-recipe_count", "-id"),
+}
+
+
+class RelatedIdsFilter:
+    """ Filter recipes by the ids of one of their many-to-many relations.
+
+    ``any`` compiles to an EXISTS subquery on the through table and
+    ``all`` to a grouped ``HAVING COUNT`` subquery, so a recipe matching
+    several ids is returned once and no join fans out the result.
+    """
+
+    def __init__(self, field_name):
+        field = Recipe._meta.get_field(field_name)
+        self.field_name = field_name
+        self.through = field.remote_field.through
+        self.recipe_field = field.m2m_field_name()
+        self.target_field = field.m2m_reverse_field_name()
+
+    def filter(self, queryset, ids, mode=MATCH_ANY):
+        """ Return the queryset narrowed to recipes matching the ids. """
+        ids = set(ids)
+        if mode == MATCH_ANY:
+            return self._filter_any(queryset, ids)
+        elif mode == MATCH_ALL:
+            return self._filter_all(queryset, ids)
+
+        raise ValueError(f"Unknown match mode: {mode}")
+
+    def _filter_any(self, queryset, ids):
+        """ Keep recipes linked to at least one of the ids. """
+        annotation = f"_{self.field_name}_match"
+        matches = self.through.objects.filter(**{
+            self.recipe_field: OuterRef("pk"),
+            f"{self.target_field}__in": ids,
+        })
+
+        return queryset.annotate(
+            **{annotation: Exists(matches)}
+        ).filter(**{annotation: True})
+
+    def _filter_all(self, queryset, ids):
+        """ Keep recipes linked to every one of the ids. """
+        matches = self.through.objects.filter(
+            **{f"{self.target_field}__in": ids}
+        ).values(self.recipe_field).annotate(
+            matched=Count(self.target_field, distinct=True)
+        ).filter(matched=len(ids)).values(self.recipe_field)
+
+        return queryset.filter(pk__in=matches)
+
+
+def get_match_mode(query_params, name):
+    """ Return the match mode requested for a filter parameter. """
+    mode = query_params.get(f"{name}_match", MATCH_ANY)
+    if mode not in MATCH_MODES:
+        raise ValidationError({
+            f"{name}_match": f"Must be one of: {', '.join(MATCH_MODES)}."
+        })
+
+    return mode
+
+
+def get_ids(query_params, name):
+    """ Return the ids in a comma separated filter parameter. """
+    try:
+        return [
+            ID_FIELD.run_validation(value)
+            for value in query_params[name].split(",")
+        ]
+    except ValidationError as exc:
+        raise ValidationError({name: exc.detail})
+
+
+def get_range_lookups(query_params):
+    """ Return the lookups for the range filters in the query params. """
+    lookups = {}
+    errors = {}
+    for param, (lookup, field) in RANGE_FILTERS.items():
+        value = query_params.get(param)
+        if value is None:
+            continue
+        try:
+            lookups[lookup] = field.run_validation(value)
+        except ValidationError as exc:
+            errors[param] = exc.detail
+    if errors:
+        raise ValidationError(errors)
+
+    return lookups
+
+
+def get_ordering(query_params, orderings=ORDERINGS):
+    """ Return the whitelisted ordering requested, if any. """
+    ordering = query_params.get("ordering")
+    if ordering is None:
+        return None
+    if ordering not in orderings:
+        raise ValidationError({
+            "ordering": f"Must be one of: {', '.join(orderings)}."
+        })
+
+    return orderings[ordering]
+
+
+def get_field_list(query_params, name, allowed):
+    """ Return the comma separated names in a parameter, if it was given. """
+    value = query_params.get(name)
+    if value is None:
+        return None
+    names = [item.strip() for item in value.split(",") if item.strip()]
+    unknown = [item for item in names if item not in allowed]
+    if unknown:
+        raise ValidationError({
+            name: f"Unknown fields: {', '.join(unknown)}. "
+                  f"Must be among: {', '.join(allowed)}."
+        })
+
+    return names
+
+
+tag_filter = RelatedIdsFilter("tags")
+ingredient_filter = RelatedIdsFilter("ingredients")
@@ -0,0 +1,146 @@
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageOps
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+
+from core.models import Recipe, RecipeImageVariant
+
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    "jpeg": ("JPEG", "jpg"),
+    "webp": ("WEBP", "webp"),
+}
+
+_executor = None
+
+
+def variant_sizes():
+    """ Return the configured variant widths, smallest first. """
+    return sorted(getattr(settings, "RECIPE_IMAGE_VARIANT_SIZES", (256, 1024)))
+
+
+def get_executor():
+    """ Return the shared worker pool, or None to process inline. """
+    global _executor
+    workers = getattr(settings, "RECIPE_IMAGE_WORKERS", 2)
+    if not workers:
+        return None
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=workers,
+            thread_name_prefix="recipe-image"
+        )
+
+    return _executor
+
+
+def schedule(recipe_id):
+    """ Process a recipe's image once the current transaction commits. """
+    def submit():
+        executor = get_executor()
+        if executor is None:
+            process_logged(recipe_id)
+        else:
+            executor.submit(run_in_worker, recipe_id)
+
+    transaction.on_commit(submit)
+
+
+def process_logged(recipe_id):
+    """ Process a recipe's image, logging instead of raising failures. """
+    try:
+        process_recipe_image(recipe_id)
+    except Exception:
+        logger.exception("Processing image of recipe %s failed", recipe_id)
+
+
+def run_in_worker(recipe_id):
+    """ Process an image on a pool thread with its own DB connection. """
+    try:
+        process_logged(recipe_id)
+    finally:
+        close_old_connections()
+
+
+def _encode(image, format_name):
+    """ Encode image without any metadata and return the bytes. """
+    buffer = io.BytesIO()
+    image.save(buffer, format=format_name, quality=85)
+
+    return buffer.getvalue()
+
+
+def _load(field_file):
+    """ Open, verify and normalise an uploaded image. """
+    with field_file.open("rb") as f:
+        data = f.read()
+    Image.open(io.BytesIO(data)).verify()
+    image = ImageOps.exif_transpose(Image.open(io.BytesIO(data)))
+
+    return image.convert("RGB")
+
+
+def process_recipe_image(recipe_id):
+    """ Strip the recipe image's metadata and render its variants. """
+    recipe = Recipe.objects.filter(id=recipe_id).first()
+    if recipe is None or not recipe.image:
+        return
+    uploaded = recipe.image.name
+
+    try:
+        image = _load(recipe.image)
+    except Exception:
+        Recipe.objects.filter(id=recipe_id, image=uploaded).update(
+            image_status="failed"
+        )
+        raise
+
+    original = ContentFile(_encode(image, "JPEG"))
+    variants = []
+    for size in variant_sizes():
+        resized = image.copy()
+        resized.thumbnail((size, size), Image.LANCZOS)
+        for key, (format_name, ext) in FORMATS.items():
+            variant = RecipeImageVariant(recipe=recipe, size=size, format=key)
+            variant.image.save(
+                f"variant.{ext}",
+                ContentFile(_encode(resized, format_name)),
+                save=False
+            )
+            variants.append(variant)
+
+    with transaction.atomic():
+        locked = Recipe.objects.select_for_update().filter(
+            id=recipe_id,
+            image=uploaded
+        ).first()
+        if locked is None:
+            # A newer upload replaced the image while this one was running,
+            # the unreferenced variant files are left to gc_media.
+            return
+        locked.image_variants.all().delete()
+        for variant in variants:
+            variant.save()
+        locked.image.save("original.jpg", original, save=False)
+        locked.image_status = "ready"
+        locked.save(update_fields=["image", "image_status"])
+
+
+def pick_variant(recipe, size, format_key):
+    """ Return the smallest variant at least size wide, else the largest. """
+    variants = sorted(
+        (v for v in recipe.image_variants.all() if v.format == format_key),
+        key=lambda v: v.size
+    )
+    for variant in variants:
+        if variant.size >= size:
+            return variant
+
+    return variants[-1] if variants else None
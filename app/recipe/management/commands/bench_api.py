@@ -0,0 +1,290 @@
+import io
+import json
+import platform
+import random
+import subprocess
+import time
+from contextlib import ExitStack
+from datetime import datetime, timezone
+
+from PIL import Image
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.benchmark import rolled_back, summarize
+from core.db.routers import REPLICA_SETTINGS
+from core.models import Ingredient, Recipe, Tag
+
+from recipe.management.commands.seed_data import WORDS
+
+
+# Relative frequency of each call in the replayed traffic.
+MIX = {
+    "recipe_list": 30,
+    "recipe_detail": 20,
+    "recipe_filter": 20,
+    "tag_list": 5,
+    "ingredient_list": 5,
+    "user_me": 10,
+    "recipe_create": 8,
+    "recipe_upload": 2,
+}
+
+
+def jpeg():
+    """ Return a small JPEG upload. """
+    image = io.BytesIO()
+    Image.new("RGB", (64, 64), (200, 120, 40)).save(image, format="JPEG")
+    image.name = "bench.jpg"
+    image.seek(0)
+
+    return image
+
+
+def git_commit():
+    """ Return the checked out commit, if the tree is a git repository. """
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"],
+            cwd=settings.BASE_DIR,
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Session:
+    """ An authenticated client with ids of its user's data. """
+
+    def __init__(self, user):
+        self.client = APIClient()
+        token, _ = Token.objects.get_or_create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        self.recipe_ids = list(
+            Recipe.objects.filter(user=user).values_list("id", flat=True)
+        )
+        self.tag_ids = list(
+            Tag.objects.filter(user=user).values_list("id", flat=True)
+        )
+        self.ingredient_ids = list(
+            Ingredient.objects.filter(user=user).values_list("id", flat=True)
+        )
+
+
+def call(name, session, rng):
+    """ Make one call of the mix; return the response. """
+    client = session.client
+    recipes_url = reverse("recipe:recipe-list")
+    if name == "recipe_list":
+        return client.get(recipes_url)
+    if name == "recipe_detail":
+        pk = rng.choice(session.recipe_ids)
+        return client.get(reverse("recipe:recipe-detail", args=[pk]))
+    if name == "recipe_filter":
+        params = rng.choice((
+            {"tags": ",".join(
+                map(str, rng.sample(session.tag_ids,
+                                    min(2, len(session.tag_ids))))
+            )},
+            {"search": rng.choice(WORDS)},
+            {"time_max": rng.randint(10, 120), "ordering": "time_minutes"},
+            {"ordering": "price", "fields": "id,title,price"},
+        ))
+        return client.get(recipes_url, params)
+    if name == "tag_list":
+        return client.get(reverse("recipe:tag-list"))
+    if name == "ingredient_list":
+        return client.get(reverse("recipe:ingredient-list"))
+    if name == "user_me":
+        return client.get(reverse("user:me"))
+    if name == "recipe_create":
+        res = client.post(recipes_url, {
+            "title": f"{rng.choice(WORDS).title()} bench",
+            "time_minutes": rng.randint(5, 60),
+            "price": "4.50",
+            "tags": rng.sample(session.tag_ids, min(2, len(session.tag_ids))),
+        })
+        if res.status_code == 201:
+            session.recipe_ids.append(res.data["id"])
+        return res
+    if name == "recipe_upload":
+        pk = rng.choice(session.recipe_ids)
+        return client.post(
+            reverse("recipe:recipe-upload-image", args=[pk]),
+            {"image": jpeg()},
+            format="multipart"
+        )
+
+    raise ValueError(name)
+
+
+class Command(BaseCommand):
+    """ Django command to replay a mix of API calls and report latency. """
+    help = ("Replay list, detail, filter, create and upload calls against "
+            "seeded users and report latency, throughput and queries.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=1000)
+        parser.add_argument("--warmup", type=int, default=50)
+        parser.add_argument("--prefix", default="seed")
+        parser.add_argument("--users", type=int, default=None)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--json",
+            help="Write the report as JSON to this path, '-' for stdout."
+        )
+        parser.add_argument(
+            "--compare",
+            help="Print p95 changes against a previous JSON report."
+        )
+        parser.add_argument(
+            "--commit",
+            action="store_true",
+            help="Keep the writes instead of rolling them back."
+        )
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.filter(
+            email__startswith=f"{options['prefix']}-"
+        ).order_by("id")[:options["users"]]
+        if not users:
+            raise CommandError(
+                f"No users with prefix {options['prefix']}, "
+                f"run seed_data first."
+            )
+        rng = random.Random(options["seed"])
+
+        with ExitStack() as stack:
+            # The test client's requests are addressed to testserver.
+            stack.enter_context(override_settings(
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]
+            ))
+            if not options["commit"]:
+                # Uploaded images are processed on commit, so not at all.
+                stack.enter_context(rolled_back())
+            sessions = [Session(user) for user in users]
+            for _ in range(options["warmup"]):
+                self._replay(rng, sessions)
+            report = self._run(rng, sessions, options)
+
+        self._print(report)
+        if options["compare"]:
+            with open(options["compare"]) as baseline:
+                self._compare(json.load(baseline), report)
+        if options["json"] == "-":
+            self.stdout.write(json.dumps(report, indent=2))
+        elif options["json"]:
+            with open(options["json"], "w") as output:
+                json.dump(report, output, indent=2)
+
+    def _replay(self, rng, sessions):
+        """ Make one weighted random call; return its name and response. """
+        name = rng.choices(list(MIX), weights=list(MIX.values()))[0]
+
+        return name, call(name, rng.choice(sessions), rng)
+
+    def _run(self, rng, sessions, options):
+        """ Replay the measured calls and build the report. """
+        aliases = [DEFAULT_DB_ALIAS] + list(REPLICA_SETTINGS["ALIASES"])
+        timings = {name: [] for name in MIX}
+        queries = {name: [] for name in MIX}
+        errors = {name: 0 for name in MIX}
+        started = time.perf_counter()
+        for _ in range(options["requests"]):
+            with ExitStack() as stack:
+                captured = [
+                    stack.enter_context(
+                        CaptureQueriesContext(connections[alias])
+                    )
+                    for alias in aliases
+                ]
+                call_started = time.perf_counter()
+                name, res = self._replay(rng, sessions)
+                elapsed = time.perf_counter() - call_started
+            timings[name].append(elapsed * 1000)
+            queries[name].append(sum(len(context) for context in captured))
+            if res.status_code >= 400:
+                errors[name] += 1
+        duration = time.perf_counter() - started
+
+        calls = {}
+        for name in MIX:
+            if not timings[name]:
+                continue
+            stats = summarize(timings[name])
+            calls[name] = {
+                "count": stats["count"],
+                "errors": errors[name],
+                "p50_ms": stats["p50"],
+                "p95_ms": stats["p95"],
+                "p99_ms": stats["p99"],
+                "mean_ms": stats["mean"],
+                "queries_mean": sum(queries[name]) / len(queries[name]),
+                "queries_max": max(queries[name]),
+            }
+        every = [timing for name in MIX for timing in timings[name]]
+        total = summarize(every)
+
+        return {
+            "meta": {
+                "commit": git_commit(),
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "database": connection.vendor,
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "users": len(sessions),
+                "seed": options["seed"],
+                "committed": options["commit"],
+            },
+            "total": {
+                "count": total["count"],
+                "errors": sum(errors.values()),
+                "duration_s": duration,
+                "throughput_rps": total["count"] / duration,
+                "p50_ms": total["p50"],
+                "p95_ms": total["p95"],
+                "p99_ms": total["p99"],
+                "queries_mean": (
+                    sum(sum(values) for values in queries.values()) /
+                    total["count"]
+                ),
+            },
+            "calls": calls,
+        }
+
+    def _print(self, report):
+        self.stdout.write(
+            f"{'call':<16} {'count':>6} {'p50 ms':>8} {'p95 ms':>8} "
+            f"{'p99 ms':>8} {'queries':>8} {'errors':>6}"
+        )
+        rows = list(report["calls"].items()) + [("total", report["total"])]
+        for name, row in rows:
+            self.stdout.write(
+                f"{name:<16} {row['count']:>6} {row['p50_ms']:>8.2f} "
+                f"{row['p95_ms']:>8.2f} {row['p99_ms']:>8.2f} "
+                f"{row['queries_mean']:>8.1f} {row['errors']:>6}"
+            )
+        self.stdout.write(
+            f"{report['total']['throughput_rps']:.0f} requests/s"
+        )
+
+    def _compare(self, baseline, report):
+        """ Print each call's p95 change relative to baseline. """
+        self.stdout.write(f"p95 against {baseline['meta'].get('commit')}:")
+        rows = list(report["calls"].items()) + [("total", report["total"])]
+        baseline_rows = dict(baseline["calls"], total=baseline["total"])
+        for name, row in rows:
+            before = baseline_rows.get(name)
+            if before is None:
+                continue
+            change = (row["p95_ms"] / before["p95_ms"] - 1) * 100
+            self.stdout.write(f"{name:<16} {change:>+7.1f}%")
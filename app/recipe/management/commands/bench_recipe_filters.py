@@ -0,0 +1,89 @@
+import random
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from core.benchmark import measure, rolled_back, summarize
+from core.models import Recipe, Tag
+
+from recipe.filters import MATCH_ALL, MATCH_ANY, tag_filter
+
+
+def int_list(value):
+    """ Parse a comma separated list of integers. """
+    return [int(item) for item in value.split(",")]
+
+
+class Command(BaseCommand):
+    """ Django command to benchmark recipe tag filtering. """
+    help = "Measure tag filter latency as tag and recipe counts grow."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recipes", type=int_list, default="100,1000")
+        parser.add_argument("--tags", type=int_list, default="1,2,4,8")
+        parser.add_argument("--tags-per-recipe", type=int, default=3)
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'recipes':>8} {'tags':>5} {'plan':>6} "
+            f"{'rows':>6} {'p50 ms':>8} {'p95 ms':>8}"
+        )
+        for recipe_count in options["recipes"]:
+            with rolled_back():
+                self._bench(recipe_count, options)
+
+    def _bench(self, recipe_count, options):
+        """ Seed recipe_count recipes and time each filter plan. """
+        user = get_user_model().objects.create_user(
+            "bench-filters@hackfeed.com",
+            "benchpass"
+        )
+        tag_ids = self._seed(user, recipe_count, max(options["tags"]),
+                             options["tags_per_recipe"])
+        recipes = Recipe.objects.filter(user=user)
+        plans = {
+            "join": lambda ids: recipes.filter(tags__id__in=ids),
+            MATCH_ANY: lambda ids: tag_filter.filter(recipes, ids, MATCH_ANY),
+            MATCH_ALL: lambda ids: tag_filter.filter(recipes, ids, MATCH_ALL),
+        }
+        for tag_count in options["tags"]:
+            ids = tag_ids[:tag_count]
+            for plan, build in plans.items():
+                rows = len(build(ids).values_list("id", flat=True))
+                stats = summarize(measure(
+                    lambda: list(build(ids).values_list("id", flat=True)),
+                    options["repeat"]
+                ))
+                self.stdout.write(
+                    f"{recipe_count:>8} {tag_count:>5} {plan:>6} {rows:>6} "
+                    f"{stats['p50']:>8.2f} {stats['p95']:>8.2f}"
+                )
+
+    def _seed(self, user, recipe_count, tag_count, tags_per_recipe):
+        """ Bulk insert recipes with randomly assigned tags. """
+        Tag.objects.bulk_create(
+            Tag(user=user, name=f"Tag {index}") for index in range(tag_count)
+        )
+        Recipe.objects.bulk_create(
+            Recipe(user=user, title=f"Recipe {index}", time_minutes=10,
+                   price=5)
+            for index in range(recipe_count)
+        )
+        tag_ids = list(
+            Tag.objects.filter(user=user).values_list("id", flat=True)
+        )
+        recipe_ids = Recipe.objects.filter(user=user).values_list(
+            "id", flat=True
+        )
+        through = Recipe.tags.through
+        rng = random.Random(recipe_count)
+        through.objects.bulk_create(
+            through(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id in recipe_ids
+            for tag_id in rng.sample(
+                tag_ids, min(tags_per_recipe, len(tag_ids))
+            )
+        )
+
+        return tag_ids
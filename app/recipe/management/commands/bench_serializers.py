@@ -0,0 +1,108 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Prefetch
+
+from core.benchmark import measure, rolled_back, summarize
+from core.models import Ingredient, Recipe, Tag
+
+from recipe.serializers import (
+    CompiledReadSerializer, IngredientSerializer, RecipeSerializer,
+    TagSerializer
+)
+
+
+class Command(BaseCommand):
+    """ Django command to benchmark the read path serializers. """
+    help = "Compare per row cost of model and compiled list serializers."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=500)
+        parser.add_argument("--tags-per-recipe", type=int, default=3)
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'serializer':>12} {'mode':>9} {'rows':>6} "
+            f"{'p50 ms':>8} {'p95 ms':>8} {'µs/row':>8}"
+        )
+        with rolled_back():
+            user = get_user_model().objects.create_user(
+                "bench-serializers@hackfeed.com",
+                "benchpass"
+            )
+            self._seed(user, options["rows"], options["tags_per_recipe"])
+            self._bench(
+                "recipe",
+                RecipeSerializer,
+                Recipe.objects.filter(user=user).order_by("-id")
+                .prefetch_related(
+                    Prefetch("tags", queryset=Tag.objects.order_by("id")),
+                    Prefetch(
+                        "ingredients",
+                        queryset=Ingredient.objects.order_by("id")
+                    ),
+                ),
+                options
+            )
+            for name, serializer_class in (
+                ("tag", TagSerializer),
+                ("ingredient", IngredientSerializer),
+            ):
+                model = serializer_class.Meta.model
+                self._bench(
+                    name,
+                    serializer_class,
+                    model.objects.filter(user=user).order_by("-name"),
+                    options
+                )
+
+    def _bench(self, name, serializer_class, queryset, options):
+        """ Time serializing queryset both ways, queries included. """
+        compiled = CompiledReadSerializer(serializer_class())
+        modes = {
+            "model": lambda: serializer_class(
+                list(queryset),
+                many=True
+            ).data,
+            "compiled": lambda: compiled.render(
+                queryset.prefetch_related(None).values(*compiled.columns)
+            ),
+        }
+        rows = queryset.count()
+        for mode, render in modes.items():
+            stats = summarize(measure(render, options["repeat"]))
+            self.stdout.write(
+                f"{name:>12} {mode:>9} {rows:>6} {stats['p50']:>8.2f} "
+                f"{stats['p95']:>8.2f} "
+                f"{stats['p50'] * 1000 / max(rows, 1):>8.1f}"
+            )
+
+    def _seed(self, user, rows, tags_per_recipe):
+        """ Bulk insert recipes, tags and ingredients and link them. """
+        for model in (Tag, Ingredient):
+            model.objects.bulk_create(
+                model(user=user, name=f"{model.__name__} {index}")
+                for index in range(rows)
+            )
+        Recipe.objects.bulk_create(
+            Recipe(user=user, title=f"Recipe {index}", time_minutes=10,
+                   price=5)
+            for index in range(rows)
+        )
+        recipe_ids = list(
+            Recipe.objects.filter(user=user).values_list("id", flat=True)
+        )
+        for field, model in (("tags", Tag), ("ingredients", Ingredient)):
+            m2m = Recipe._meta.get_field(field)
+            through = m2m.remote_field.through
+            target = f"{m2m.m2m_reverse_field_name()}_id"
+            ids = list(
+                model.objects.filter(user=user).values_list("id", flat=True)
+            )
+            through.objects.bulk_create(
+                through(recipe_id=recipe_id, **{target: ids[
+                    (position + offset) % len(ids)
+                ]})
+                for position, recipe_id in enumerate(recipe_ids)
+                for offset in range(tags_per_recipe)
+            )
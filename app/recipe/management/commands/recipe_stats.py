@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipe import stats
+
+
+class Command(BaseCommand):
+    """ Django command to rebuild or verify the recipe statistics. """
+    help = "Check the maintained recipe stats for drift or rebuild them."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Compare the stats with the recipe tables, fail on drift."
+        )
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="Recompute every stat from the recipe tables."
+        )
+
+    def handle(self, *args, **options):
+        if options["check"] == options["rebuild"]:
+            raise CommandError("Pass exactly one of --check or --rebuild.")
+
+        if options["rebuild"]:
+            users, usage = stats.rebuild()
+            self.stdout.write(self.style.SUCCESS(
+                f"Rebuilt stats of {users} users and {usage} attributes."
+            ))
+            return
+
+        differences = stats.drift()
+        for name, key, kept, computed in differences:
+            self.stdout.write(f"{name} {key}: stored {kept}, "
+                              f"computed {computed}")
+        if differences:
+            raise CommandError(
+                f"{len(differences)} stats drifted, run --rebuild."
+            )
+        self.stdout.write(self.style.SUCCESS("Stats match the recipes."))
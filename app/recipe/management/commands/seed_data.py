@@ -0,0 +1,152 @@
+import random
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.models import Ingredient, Recipe, Tag
+
+from recipe import search, stats
+
+
+# SQLite inserts at most 500 rows per statement.
+BATCH_SIZE = 500
+WORDS = (
+    "apple", "basil", "butter", "carrot", "chicken", "chilli", "cream",
+    "garlic", "ginger", "honey", "lemon", "lentil", "mushroom", "noodle",
+    "onion", "pepper", "potato", "rice", "salmon", "spinach", "tomato",
+    "vanilla", "walnut", "yoghurt",
+)
+DISHES = ("bake", "curry", "pie", "salad", "soup", "stew", "stir fry", "tart")
+
+
+def seed_email(prefix, index):
+    """ Return the email of the index'th seeded user. """
+    return f"{prefix}-{index}@hackfeed.com"
+
+
+def chunks(items, size=BATCH_SIZE):
+    """ Yield successive slices of items of at most size. """
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class Command(BaseCommand):
+    """ Django command to seed users with recipes for benchmarking. """
+    help = "Bulk insert users, each with recipes, tags and ingredients."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10)
+        parser.add_argument("--recipes", type=int, default=100)
+        parser.add_argument("--tags", type=int, default=20)
+        parser.add_argument("--ingredients", type=int, default=30)
+        parser.add_argument(
+            "--per-recipe",
+            type=int,
+            default=3,
+            help="Tags and ingredients linked to each recipe."
+        )
+        parser.add_argument("--prefix", default="seed")
+        parser.add_argument("--password", default="seedpass")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--flush",
+            action="store_true",
+            help="Delete users seeded with the same prefix first."
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        user_model = get_user_model()
+        emails = [
+            seed_email(options["prefix"], index)
+            for index in range(options["users"])
+        ]
+        seeded = user_model.objects.filter(
+            email__startswith=f"{options['prefix']}-"
+        )
+
+        # Bulk inserts skip the signals, so the stats are rebuilt at the end.
+        with transaction.atomic(), stats.handled_explicitly():
+            if options["flush"]:
+                seeded.delete()
+            elif seeded.exists():
+                raise CommandError(
+                    f"Users with prefix {options['prefix']} exist, "
+                    f"use --flush to replace them."
+                )
+            # One hash shared by every user; hashing each would dominate.
+            password = make_password(options["password"])
+            user_model.objects.bulk_create([
+                user_model(email=email, name=email.split("@")[0],
+                           password=password)
+                for email in emails
+            ], batch_size=BATCH_SIZE)
+            user_ids = list(
+                seeded.order_by("id").values_list("id", flat=True)
+            )
+            tags = self._create_attrs(Tag, user_ids, options["tags"])
+            ingredients = self._create_attrs(
+                Ingredient, user_ids, options["ingredients"]
+            )
+            recipe_ids = self._create_recipes(
+                rng, user_ids, tags, ingredients, options
+            )
+            for batch in chunks(recipe_ids):
+                search.refresh(batch)
+            stats.rebuild()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(user_ids)} users with {len(recipe_ids)} recipes, "
+            f"{sum(map(len, tags.values()))} tags and "
+            f"{sum(map(len, ingredients.values()))} ingredients."
+        ))
+
+    def _create_attrs(self, model, user_ids, count):
+        """ Insert count attributes per user; map user ids to their ids. """
+        model.objects.bulk_create([
+            model(user_id=user_id, name=f"{WORDS[index % len(WORDS)]} "
+                                        f"{index // len(WORDS) + 1}")
+            for user_id in user_ids for index in range(count)
+        ], batch_size=BATCH_SIZE)
+        ids = {user_id: [] for user_id in user_ids}
+        rows = model.objects.filter(user_id__in=user_ids).values_list(
+            "user_id", "id"
+        )
+        for user_id, pk in rows.iterator():
+            ids[user_id].append(pk)
+
+        return ids
+
+    def _create_recipes(self, rng, user_ids, tags, ingredients, options):
+        """ Insert recipes with linked attributes; return their ids. """
+        Recipe.objects.bulk_create([
+            Recipe(
+                user_id=user_id,
+                title=f"{rng.choice(WORDS).title()} {rng.choice(DISHES)}",
+                time_minutes=rng.randint(5, 180),
+                price=Decimal(rng.randint(100, 5000)) / 100
+            )
+            for user_id in user_ids for _ in range(options["recipes"])
+        ], batch_size=BATCH_SIZE)
+        recipes = list(
+            Recipe.objects.filter(user_id__in=user_ids).values_list(
+                "id", "user_id"
+            ).iterator()
+        )
+        for field, attrs in (("tags", tags), ("ingredients", ingredients)):
+            m2m = Recipe._meta.get_field(field)
+            through = m2m.remote_field.through
+            target = f"{m2m.m2m_reverse_field_name()}_id"
+            through.objects.bulk_create((
+                through(recipe_id=recipe_id, **{target: pk})
+                for recipe_id, user_id in recipes
+                for pk in rng.sample(
+                    attrs[user_id],
+                    min(options["per_recipe"], len(attrs[user_id]))
+                )
+            ), batch_size=BATCH_SIZE)
+
+        return [recipe_id for recipe_id, _ in recipes]
@@ -0,0 +1,24 @@
+from rest_framework.pagination import CursorPagination
+
+
+class ViewOrderingPagination(CursorPagination):
+    """ Keyset pagination following the view's requested ordering. """
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+    def get_ordering(self, request, queryset, view):
+        """ Follow the view's ordering, which depends on the request. """
+        if hasattr(view, "get_ordering"):
+            return view.get_ordering()
+
+        return super().get_ordering(request, queryset, view)
+
+
+class RecipeAttrsPagination(ViewOrderingPagination):
+    """ Keyset pagination for recipe attributes, by name by default. """
+    ordering = ("-name", "id")
+
+
+class RecipePagination(ViewOrderingPagination):
+    """ Keyset pagination for recipes, newest first by default. """
+    ordering = ("-id",)
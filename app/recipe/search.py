@@ -0,0 +1,110 @@
+from collections import defaultdict
+
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVector
+)
+from django.db import connection
+from django.db.models import Case, F, IntegerField, Q, Value, When
+
+from core.models import Recipe
+
+
+CONFIG = "english"
+TITLE_WEIGHT = 2
+TERMS_WEIGHT = 1
+MAX_TERMS = 10
+RELATIONS = ("tags", "ingredients")
+
+
+def uses_tsvector():
+    """ Return whether the database has full text search columns. """
+    return connection.vendor == "postgresql"
+
+
+def _related_names(recipe_ids):
+    """ Map recipe ids to the names of their tags and ingredients. """
+    names = defaultdict(list)
+    for field in RELATIONS:
+        m2m = Recipe._meta.get_field(field)
+        through = m2m.remote_field.through
+        target = m2m.m2m_reverse_field_name()
+        rows = through.objects.filter(recipe_id__in=recipe_ids).order_by(
+            f"{target}__name"
+        ).values_list("recipe_id", f"{target}__name")
+        for recipe_id, name in rows:
+            names[recipe_id].append(name)
+
+    return names
+
+
+def refresh(recipe_ids):
+    """ Rebuild the search columns of recipes.
+
+    ``search_terms`` holds the tag and ingredient names; on PostgreSQL
+    ``search_vector`` is rebuilt from it and the title, the title weighted
+    above the names.
+    """
+    recipe_ids = list(set(recipe_ids))
+    if not recipe_ids:
+        return
+    names = _related_names(recipe_ids)
+    recipes = list(
+        Recipe.objects.filter(id__in=recipe_ids).only("id", "search_terms")
+    )
+    stale = []
+    for recipe in recipes:
+        terms = " ".join(names[recipe.id])
+        if recipe.search_terms != terms:
+            recipe.search_terms = terms
+            stale.append(recipe)
+    if stale:
+        Recipe.objects.bulk_update(stale, ["search_terms"])
+
+    if uses_tsvector():
+        Recipe.objects.filter(id__in=recipe_ids).update(
+            search_vector=(
+                SearchVector("title", weight="A", config=CONFIG) +
+                SearchVector("search_terms", weight="B", config=CONFIG)
+            )
+        )
+
+
+def refresh_linked(field, attr_ids):
+    """ Rebuild the search columns of recipes linked to attributes. """
+    m2m = Recipe._meta.get_field(field)
+    through = m2m.remote_field.through
+    target = m2m.m2m_reverse_field_name()
+    refresh(
+        through.objects.filter(**{f"{target}_id__in": attr_ids})
+        .values_list("recipe_id", flat=True)
+    )
+
+
+def match(queryset, text):
+    """ Return recipes matching every search term, annotated with a rank.
+
+    PostgreSQL uses the GIN indexed ``search_vector``. Other databases
+    match each term as a substring of the title or names and rank by
+    where the terms were found.
+    """
+    if uses_tsvector():
+        query = SearchQuery(text, config=CONFIG)
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F("search_vector"), query)
+        )
+
+    terms = list(dict.fromkeys(text.lower().split()))[:MAX_TERMS]
+    if not terms:
+        return queryset.none()
+    rank = Value(0, output_field=IntegerField())
+    for term in terms:
+        queryset = queryset.filter(
+            Q(title__icontains=term) | Q(search_terms__icontains=term)
+        )
+        rank = rank + Case(
+            When(title__icontains=term, then=Value(TITLE_WEIGHT)),
+            default=Value(TERMS_WEIGHT),
+            output_field=IntegerField()
+        )
+
+    return queryset.annotate(search_rank=rank)
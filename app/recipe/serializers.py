@@ -1,27 +1,66 @@
+from collections import defaultdict
+
 from rest_framework import serializers
 
-from core.models import Tag, Ingredient, Recipe
+from core.instrumentation import TimedSerializerMixin, timed
+from core.models import Tag, Ingredient, Recipe, RecipeImageVariant
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """ Serializer for tag objects. """
 
     class Meta:
         model = Tag
-        fields = ("id", "name")
-        read_only_fields = ("id",)
+        fields = ("id", "name", "recipe_count")
+        read_only_fields = ("id", "recipe_count")
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """ Serializer for ingredient objects. """
 
     class Meta:
         model = Ingredient
-        fields = ("id", "name")
-        read_only_fields = ("id",)
+        fields = ("id", "name", "recipe_count")
+        read_only_fields = ("id", "recipe_count")
+
+
+class AttrNamesSerializer(serializers.Serializer):
+    """ Serializer for names of attributes fetched or created in bulk. """
+    names = serializers.ListField(
+        child=serializers.CharField(max_length=255),
+        allow_empty=False,
+        max_length=1000
+    )
+
+
+class SparseFieldsMixin:
+    """ Serializer mixin rendering a subset of fields.
+
+    ``fields`` keeps only the named fields. ``expand`` renders the named
+    relations of ``Meta.expandable`` as nested objects and the others as
+    lists of ids; without it the serializer's own relations are used.
+    """
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if expand is not None:
+            for name, serializer_class in self.Meta.expandable.items():
+                if name in expand:
+                    field = serializer_class(many=True, read_only=True)
+                else:
+                    field = serializers.PrimaryKeyRelatedField(
+                        many=True,
+                        read_only=True
+                    )
+                self.fields[name] = field
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(TimedSerializerMixin,
+                       SparseFieldsMixin,
+                       serializers.ModelSerializer):
     """ Serializer for recipe. """
     ingredients = serializers.PrimaryKeyRelatedField(
         many=True,
@@ -37,6 +76,31 @@ class RecipeSerializer(serializers.ModelSerializer):
         fields = ("id", "title", "ingredients", "tags", "time_minutes",
                   "price", "link")
         read_only_fields = ("id",)
+        expandable = {
+            "ingredients": IngredientSerializer,
+            "tags": TagSerializer,
+        }
+
+
+class RecipeBulkSerializer(serializers.ModelSerializer):
+    """ Serializer for recipes written in bulk.
+
+    Related ids are validated for the whole batch at once, see recipe.bulk.
+    """
+    id = serializers.IntegerField(required=False)
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False
+    )
+    tags = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False
+    )
+
+    class Meta:
+        model = Recipe
+        fields = ("id", "title", "ingredients", "tags", "time_minutes",
+                  "price", "link")
 
 
 class RecipeDetailSerializer(RecipeSerializer):
@@ -45,10 +109,125 @@ class RecipeDetailSerializer(RecipeSerializer):
     tags = TagSerializer(many=True, read_only=True)
 
 
-class RecipeImageSerializer(serializers.ModelSerializer):
+class RecipeImageSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """ Serializer for uploading imagesto recipes. """
 
     class Meta:
         model = Recipe
-        fields = ("id", "image")
-        read_only_fields = ("id",)
+        fields = ("id", "image", "image_status")
+        read_only_fields = ("id", "image_status")
+
+
+class RecipeImageVariantSerializer(TimedSerializerMixin,
+                                   serializers.ModelSerializer):
+    """ Serializer for resized recipe images. """
+
+    class Meta:
+        model = RecipeImageVariant
+        fields = ("size", "format", "image")
+        read_only_fields = ("size", "format", "image")
+
+
+class CompiledReadSerializer:
+    """ Render ``values()`` rows the way a model serializer renders models.
+
+    Plain fields keep their own ``to_representation``, so the output
+    matches the serializer, but rows are never turned into model
+    instances. Many-to-many primary key fields are read straight from the
+    through table, one query per relation for all rows, ordered by id.
+    """
+    unsupported = (
+        serializers.BaseSerializer,
+        serializers.RelatedField,
+        serializers.SerializerMethodField,
+        serializers.FileField,
+    )
+
+    def __init__(self, serializer):
+        model = serializer.Meta.model
+        self.fields = []
+        self.columns = ["id"]
+        for field in serializer.fields.values():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.ManyRelatedField):
+                m2m = model._meta.get_field(field.source)
+                self.fields.append((field.field_name, None, m2m))
+            else:
+                self.fields.append(
+                    (field.field_name, field.source, field.to_representation)
+                )
+                if field.source not in self.columns:
+                    self.columns.append(field.source)
+
+    @classmethod
+    def supports(cls, serializer):
+        """ Return whether every readable field can be compiled. """
+        model = getattr(getattr(serializer, "Meta", None), "model", None)
+        if model is None:
+            return False
+        columns = {
+            field.name for field in model._meta.concrete_fields
+            if not field.is_relation
+        }
+        many_to_many = {field.name for field in model._meta.many_to_many}
+        for field in serializer.fields.values():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.ManyRelatedField):
+                child = field.child_relation
+                supported = (
+                    type(child) is serializers.PrimaryKeyRelatedField and
+                    child.pk_field is None and
+                    field.source in many_to_many
+                )
+            else:
+                supported = (
+                    not isinstance(field, cls.unsupported) and
+                    field.source in columns
+                )
+            if not supported:
+                return False
+
+        return True
+
+    def _related_ids(self, m2m, ids):
+        """ Map each row id to its related ids, ordered by id. """
+        through = m2m.remote_field.through
+        source = m2m.m2m_field_name()
+        target = m2m.m2m_reverse_field_name()
+        related = defaultdict(list)
+        rows = through.objects.filter(**{f"{source}__in": ids}).order_by(
+            target
+        ).values_list(source, target)
+        for pk, related_pk in rows:
+            related[pk].append(related_pk)
+
+        return related
+
+    def render(self, rows):
+        """ Return the representation of each row. """
+        rows = list(rows)
+        ids = [row["id"] for row in rows]
+        related = {
+            name: self._related_ids(m2m, ids)
+            for name, source, m2m in self.fields if source is None
+        }
+        with timed("serialize"):
+            return self._render(rows, related)
+
+    def _render(self, rows, related):
+        data = []
+        for row in rows:
+            item = {}
+            for name, source, to_representation in self.fields:
+                if source is None:
+                    item[name] = related[name][row["id"]]
+                else:
+                    value = row[source]
+                    item[name] = (
+                        None if value is None else to_representation(value)
+                    )
+            data.append(item)
+
+        return data
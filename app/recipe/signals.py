@@ -0,0 +1,168 @@
+from collections import Counter
+
+from django.conf import settings
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+
+from core.models import Tag, Ingredient, Recipe
+
+from recipe import cache, search, stats
+
+
+ATTR_FIELDS = {Tag: "tags", Ingredient: "ingredients"}
+THROUGH_FIELDS = {
+    Recipe.tags.through: "tags",
+    Recipe.ingredients.through: "ingredients",
+}
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_attrs_changed(sender, instance, **kwargs):
+    """ Expire cached attribute lists of the owning user. """
+    cache.invalidate(instance.user_id)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def user_created(sender, instance, created, **kwargs):
+    """ Start new users without any cached responses. """
+    if created:
+        cache.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, update_fields, **kwargs):
+    """ Reindex a recipe whose title may have changed. """
+    if update_fields is None or "title" in update_fields:
+        search.refresh([instance.pk])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_links_changed(sender, instance, action, reverse, pk_set,
+                         **kwargs):
+    """ Reindex recipes whose tags or ingredients changed. """
+    if action == "pre_clear" and reverse:
+        instance._cleared_recipe_ids = list(
+            instance.recipe_set.values_list("id", flat=True)
+        )
+    elif action in ("post_add", "post_remove", "post_clear"):
+        if not reverse:
+            search.refresh([instance.pk])
+        elif action == "post_clear":
+            search.refresh(getattr(instance, "_cleared_recipe_ids", []))
+        else:
+            search.refresh(pk_set)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def recipe_attr_saved(sender, instance, created, **kwargs):
+    """ Reindex recipes linked to a possibly renamed attribute. """
+    if not created:
+        search.refresh_linked(ATTR_FIELDS[sender], [instance.pk])
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def recipe_attr_deleting(sender, instance, **kwargs):
+    """ Remember the recipes linked to an attribute being deleted. """
+    instance._linked_recipe_ids = list(
+        instance.recipe_set.values_list("id", flat=True)
+    )
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def recipe_attr_deleted(sender, instance, **kwargs):
+    """ Reindex recipes that lost a deleted attribute. """
+    search.refresh(getattr(instance, "_linked_recipe_ids", []))
+
+
+@receiver(pre_save, sender=Recipe)
+def recipe_saving(sender, instance, update_fields, **kwargs):
+    """ Remember the totals an edited recipe contributed so far. """
+    counted = {"user", "time_minutes", "price"}
+    if stats.muted() or instance.pk is None or (
+            update_fields is not None and not counted & set(update_fields)):
+        return
+    instance._stats_row = Recipe.objects.filter(pk=instance.pk).values_list(
+        "user_id", "time_minutes", "price"
+    ).first()
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_stats_saved(sender, instance, created, **kwargs):
+    """ Move a created or edited recipe's values into the totals. """
+    if stats.muted():
+        return
+    old = getattr(instance, "_stats_row", None)
+    instance._stats_row = None
+    new = stats.row(instance)
+    if created:
+        stats.recipes_changed(added=[new])
+    elif old is not None and old != new:
+        stats.recipes_changed(removed=[old], added=[new])
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleting(sender, instance, **kwargs):
+    """ Remember the values and links of a recipe being deleted. """
+    if not stats.muted():
+        instance._stats_row = stats.row(instance)
+        instance._stats_links = {
+            field: stats.linked_ids(field, [instance.pk])
+            for field in THROUGH_FIELDS.values()
+        }
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_stats_deleted(sender, instance, **kwargs):
+    """ Take a deleted recipe and its links out of the totals. """
+    if stats.muted():
+        return
+    stats.recipes_changed(removed=[instance._stats_row])
+    for field, counts in getattr(instance, "_stats_links", {}).items():
+        stats.links_changed(field, {pk: -n for pk, n in counts.items()})
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_links_counted(sender, instance, action, reverse, pk_set,
+                         **kwargs):
+    """ Keep the usage counts in step with added and removed links. """
+    if stats.muted():
+        return
+    field = THROUGH_FIELDS[sender]
+    target = f"{Recipe._meta.get_field(field).m2m_reverse_field_name()}_id"
+    if action in ("pre_remove", "pre_clear"):
+        # A removal's pk_set may name unlinked objects; count real links.
+        if reverse:
+            links = sender.objects.filter(**{target: instance.pk})
+            other = "recipe_id"
+        else:
+            links = sender.objects.filter(recipe_id=instance.pk)
+            other = target
+        if action == "pre_remove":
+            links = links.filter(**{f"{other}__in": pk_set})
+        if reverse:
+            instance._stats_unlinked = {instance.pk: links.count()}
+        else:
+            instance._stats_unlinked = Counter(
+                links.values_list(target, flat=True)
+            )
+    elif action in ("post_remove", "post_clear"):
+        unlinked = getattr(instance, "_stats_unlinked", {})
+        stats.links_changed(field, {pk: -n for pk, n in unlinked.items()})
+    elif action == "post_add" and pk_set:
+        if reverse:
+            stats.links_changed(field, {instance.pk: len(pk_set)})
+        else:
+            stats.links_changed(field, dict.fromkeys(pk_set, 1))
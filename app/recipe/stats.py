@@ -0,0 +1,260 @@
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+
+from core.models import Tag, Ingredient, Recipe, RecipeStats
+
+
+RELATIONS = (("tags", Tag), ("ingredients", Ingredient))
+TOTAL_FIELDS = ("recipe_count", "total_time_minutes", "total_price") + tuple(
+    field for field, _ in RecipeStats.PRICE_BUCKETS
+)
+CENT = Decimal("0.01")
+
+_local = threading.local()
+
+
+@contextmanager
+def handled_explicitly():
+    """ Ignore recipe signals while the caller applies the deltas itself.
+
+    Batch writes compute their deltas with a few set based queries
+    instead of the per row signal handlers.
+    """
+    previous = getattr(_local, "muted", False)
+    _local.muted = True
+    try:
+        yield
+    finally:
+        _local.muted = previous
+
+
+def muted():
+    """ Return whether signal handlers should leave the totals alone. """
+    return getattr(_local, "muted", False)
+
+
+def price_bucket(price):
+    """ Return the RecipeStats field counting recipes of a price. """
+    for field, bound in RecipeStats.PRICE_BUCKETS:
+        if bound is None or price <= bound:
+            return field
+
+
+def row(recipe):
+    """ Return the (user_id, time_minutes, price) a recipe adds. """
+    return (recipe.user_id, recipe.time_minutes, recipe.price)
+
+
+def _apply(model, lookups, deltas, create):
+    """ Add deltas to the row matching lookups.
+
+    The increments are done by the database, so concurrent writers don't
+    lose each other's changes. A missing row is only created when create
+    is set; removals never create one, since the owner may be being
+    deleted along with the row.
+    """
+    changes = {
+        field: F(field) + value for field, value in deltas.items() if value
+    }
+    if not changes:
+        return
+    updated = model.objects.filter(**lookups).update(**changes)
+    if not updated and create:
+        model.objects.bulk_create(
+            [model(**lookups)],
+            ignore_conflicts=True
+        )
+        model.objects.filter(**lookups).update(**changes)
+
+
+def recipes_changed(removed=(), added=()):
+    """ Update the user totals for recipe rows removed and added.
+
+    Both arguments are iterables of ``row()`` tuples; an edited recipe is
+    removed with its old values and added with its new ones.
+    """
+    deltas = defaultdict(Counter)
+    adding = set()
+    for sign, rows in ((-1, removed), (1, added)):
+        for user_id, time_minutes, price in rows:
+            price = Decimal(price).quantize(CENT)
+            user_deltas = deltas[user_id]
+            user_deltas["recipe_count"] += sign
+            user_deltas["total_time_minutes"] += sign * time_minutes
+            user_deltas["total_price"] += sign * price
+            user_deltas[price_bucket(price)] += sign
+            if sign > 0:
+                adding.add(user_id)
+    for user_id, user_deltas in deltas.items():
+        _apply(
+            RecipeStats,
+            {"user_id": user_id},
+            user_deltas,
+            create=user_id in adding
+        )
+
+
+def links_changed(field, deltas):
+    """ Add deltas, a mapping of attribute id to count, to recipe counts. """
+    model = dict(RELATIONS)[field]
+    by_delta = defaultdict(list)
+    for pk, delta in deltas.items():
+        if delta:
+            by_delta[delta].append(pk)
+    for delta, ids in by_delta.items():
+        model.objects.filter(id__in=ids).update(
+            recipe_count=F("recipe_count") + delta
+        )
+
+
+def linked_ids(field, recipe_ids):
+    """ Count the links of recipes to each attribute of a relation. """
+    m2m = Recipe._meta.get_field(field)
+    target = f"{m2m.m2m_reverse_field_name()}_id"
+
+    return Counter(
+        m2m.remote_field.through.objects.filter(recipe_id__in=recipe_ids)
+        .values_list(target, flat=True)
+    )
+
+
+def compute():
+    """ Aggregate the totals and usage counts from the recipe tables.
+
+    Returns a mapping of user id to RecipeStats field values and one of
+    (field, attribute id) to recipe count.
+    """
+    buckets = {}
+    lower = None
+    for field, bound in RecipeStats.PRICE_BUCKETS:
+        condition = Q()
+        if lower is not None:
+            condition &= Q(price__gt=lower)
+        if bound is not None:
+            condition &= Q(price__lte=bound)
+        buckets[field] = Count("id", filter=condition)
+        lower = bound
+    totals = {
+        values.pop("user_id"): values
+        for values in Recipe.objects.order_by().values("user_id").annotate(
+            recipe_count=Count("id"),
+            total_time_minutes=Sum("time_minutes"),
+            total_price=Sum("price"),
+            **buckets
+        )
+    }
+    usage = {}
+    for field, _ in RELATIONS:
+        m2m = Recipe._meta.get_field(field)
+        target = f"{m2m.m2m_reverse_field_name()}_id"
+        rows = m2m.remote_field.through.objects.order_by().values(
+            target
+        ).annotate(recipe_count=Count("recipe_id")).values_list(
+            target, "recipe_count"
+        )
+        for pk, recipe_count in rows:
+            usage[field, pk] = recipe_count
+
+    return totals, usage
+
+
+def stored():
+    """ Return the maintained figures in the shape of ``compute()``. """
+    totals = {
+        values.pop("user_id"): values
+        for values in RecipeStats.objects.exclude(recipe_count=0)
+        .values("user_id", *TOTAL_FIELDS)
+    }
+    usage = {
+        (field, pk): recipe_count
+        for field, model in RELATIONS
+        for pk, recipe_count in model.objects.exclude(recipe_count=0)
+        .values_list("id", "recipe_count")
+    }
+
+    return totals, usage
+
+
+def drift():
+    """ Return the keys whose stored figures differ from the tables. """
+    computed_totals, computed_usage = compute()
+    stored_totals, stored_usage = stored()
+    differences = []
+    for name, computed, kept in (
+        ("user", computed_totals, stored_totals),
+        ("usage", computed_usage, stored_usage),
+    ):
+        for key in sorted(set(computed) | set(kept), key=str):
+            if computed.get(key) != kept.get(key):
+                differences.append((name, key, kept.get(key),
+                                    computed.get(key)))
+
+    return differences
+
+
+def rebuild():
+    """ Replace the maintained figures with freshly computed ones. """
+    totals, usage = compute()
+    _, kept_usage = stored()
+    with transaction.atomic():
+        RecipeStats.objects.all().delete()
+        RecipeStats.objects.bulk_create(
+            [
+                RecipeStats(user_id=user_id, **values)
+                for user_id, values in totals.items()
+            ]
+        )
+        # Only counts that differ are written, grouped by their new value.
+        for field, model in RELATIONS:
+            by_count = defaultdict(list)
+            for key in set(usage) | set(kept_usage):
+                count = usage.get(key, 0)
+                if key[0] == field and count != kept_usage.get(key, 0):
+                    by_count[count].append(key[1])
+            for count, ids in by_count.items():
+                model.objects.filter(id__in=ids).update(recipe_count=count)
+
+    return len(totals), len(usage)
+
+
+def _top(user, model, limit):
+    """ Return the user's most used attributes of a relation. """
+    rows = model.objects.filter(
+        user=user,
+        recipe_count__gt=0
+    ).order_by("-recipe_count", "-id").values("id", "name", "recipe_count")
+
+    return list(rows[:limit])
+
+
+def summary(user, top=5):
+    """ Return the statistics shown to a user. """
+    stats = RecipeStats.objects.filter(user=user).first()
+    if stats is None:
+        stats = RecipeStats(user=user)
+    count = stats.recipe_count
+    average_time = average_price = None
+    if count:
+        average_time = round(stats.total_time_minutes / count, 1)
+        average_price = str((Decimal(stats.total_price) / count).quantize(
+            CENT
+        ))
+
+    return {
+        "recipe_count": count,
+        "average_time_minutes": average_time,
+        "average_price": average_price,
+        "price_distribution": {
+            field[len("price_"):]: getattr(stats, field)
+            for field, _ in RecipeStats.PRICE_BUCKETS
+        },
+        **{
+            f"top_{field}": _top(user, model, top)
+            for field, model in RELATIONS
+        },
+    }
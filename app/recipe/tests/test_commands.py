@@ -0,0 +1,86 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+
+from core.models import Ingredient, Recipe, Tag
+
+
+def seed(**options):
+    """ Run seed_data quietly with small defaults. """
+    options = {"users": 2, "recipes": 5, "tags": 4, "ingredients": 6,
+               **options}
+    call_command("seed_data", stdout=StringIO(), **options)
+
+
+class SeedDataTests(TestCase):
+
+    def test_seed(self):
+        """ Test users are seeded with linked recipes and attributes. """
+        seed(per_recipe=2)
+
+        users = get_user_model().objects.filter(email__startswith="seed-")
+        self.assertEqual(users.count(), 2)
+        self.assertTrue(users[0].check_password("seedpass"))
+        self.assertEqual(Recipe.objects.count(), 10)
+        self.assertEqual(Tag.objects.count(), 8)
+        self.assertEqual(Ingredient.objects.count(), 12)
+        for recipe in Recipe.objects.all():
+            self.assertEqual(recipe.tags.count(), 2)
+            self.assertEqual(
+                set(recipe.tags.values_list("user", flat=True)),
+                {recipe.user_id}
+            )
+            self.assertTrue(recipe.search_terms)
+
+    def test_existing_seed_rejected(self):
+        """ Test seeding twice needs --flush. """
+        seed()
+
+        with self.assertRaises(CommandError):
+            seed()
+
+        seed(flush=True, recipes=1)
+        self.assertEqual(Recipe.objects.count(), 2)
+
+
+class BenchAPITests(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.addCleanup(shutil.rmtree, self.media_root)
+        seed()
+
+    def test_report(self):
+        """ Test the JSON report covers every call and rolls back. """
+        report_path = os.path.join(self.media_root, "report.json")
+
+        call_command(
+            "bench_api",
+            requests=100,
+            warmup=0,
+            json=report_path,
+            stdout=StringIO()
+        )
+
+        with open(report_path) as report_file:
+            report = json.load(report_file)
+        self.assertEqual(report["total"]["count"], 100)
+        self.assertEqual(report["total"]["errors"], 0)
+        self.assertIn("recipe_list", report["calls"])
+        self.assertGreater(report["calls"]["recipe_list"]["queries_mean"], 0)
+        self.assertEqual(Recipe.objects.count(), 10)
+
+    def test_requires_seed(self):
+        """ Test the driver refuses to run without seeded users. """
+        with self.assertRaises(CommandError):
+            call_command("bench_api", prefix="missing", stdout=StringIO())
@@ -1,4 +1,5 @@
 from django.contrib.auth import get_user_model
+from django.core.cache import caches
 from django.urls import reverse
 from django.test import TestCase
 
@@ -8,9 +9,11 @@ from rest_framework.test import APIClient
 from core.models import Ingredient, Recipe
 
 from recipe.serializers import IngredientSerializer
+from recipe.tests.test_tags_api import shared_cache
 
 
 INGREDIENTS_URL = reverse("recipe:ingredient-list")
+INGREDIENTS_BULK_URL = reverse("recipe:ingredient-bulk")
 
 
 class PubliceIngredientsAPITests(TestCase):
@@ -26,10 +29,12 @@ class PubliceIngredientsAPITests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
+@shared_cache
 class PrivateIngredientsAPITests(TestCase):
     """ Test the private ingredients API. """
 
     def setUp(self):
+        caches["shared"].clear()
         self.client = APIClient()
         self.user = get_user_model().objects.create_user(
             "test@hackfeed.com",
@@ -48,7 +53,7 @@ class PrivateIngredientsAPITests(TestCase):
         serializer = IngredientSerializer(ingredients, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data["results"], serializer.data)
 
     def test_ingredients_limited_to_user(self):
         """ Test that ingredients for the authenticated user are returned. """
@@ -62,8 +67,8 @@ class PrivateIngredientsAPITests(TestCase):
         res = self.client.get(INGREDIENTS_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]["name"], ingredient.name)
+        self.assertEqual(len(res.data["results"]), 1)
+        self.assertEqual(res.data["results"][0]["name"], ingredient.name)
 
     def test_create_ingredient_succesful(self):
         """ Test create a new ingredient. """
@@ -77,6 +82,27 @@ class PrivateIngredientsAPITests(TestCase):
 
         self.assertTrue(exists)
 
+    def test_bulk_get_or_create_ingredients(self):
+        """ Test resolving ingredient names, creating the missing ones. """
+        existing = Ingredient.objects.create(user=self.user, name="Salt")
+
+        res = self.client.post(
+            INGREDIENTS_BULK_URL,
+            {"names": ["Salt", "Pepper"]},
+            format="json"
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.data[0],
+            {"id": existing.id, "name": "Salt", "recipe_count": 0}
+        )
+        self.assertTrue(Ingredient.objects.filter(
+            user=self.user,
+            name="Pepper",
+            id=res.data[1]["id"]
+        ).exists())
+
     def test_create_ingredient_invalid(self):
         """ Test creating invalid ingredient fails. """
         payload = {"name": ""}
@@ -101,11 +127,22 @@ class PrivateIngredientsAPITests(TestCase):
             user=self.user
         )
         recipe.ingredients.add(first_ingredient)
+        first_ingredient.refresh_from_db()
 
         res = self.client.get(INGREDIENTS_URL, {"assigned_only": 1})
 
         first_serializer = IngredientSerializer(first_ingredient)
         second_serializer = IngredientSerializer(second_ingredient)
 
-        self.assertIn(first_serializer.data, res.data)
-        self.assertNotIn(second_serializer.data, res.data)
+        self.assertIn(first_serializer.data, res.data["results"])
+        self.assertNotIn(second_serializer.data, res.data["results"])
+
+    def test_cached_ingredients_invalidated_on_delete(self):
+        """ Test deleting an ingredient expires the cached list. """
+        ingredient = Ingredient.objects.create(user=self.user, name="Kale")
+        self.client.get(INGREDIENTS_URL)
+        ingredient.delete()
+
+        res = self.client.get(INGREDIENTS_URL)
+
+        self.assertEqual(res.data["results"], [])
@@ -1,21 +1,33 @@
 import tempfile
+import shutil
+import json
 import os
 
 from PIL import Image
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.db import connection
+from django.db.models import Prefetch
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import Recipe, Tag, Ingredient
+from core.models import Recipe, Tag, Ingredient, StoredFile
 
-from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
+from recipe.images import process_recipe_image
+from recipe.serializers import (
+    CompiledReadSerializer, RecipeSerializer, RecipeDetailSerializer,
+    TagSerializer
+)
 
 
 RECIPES_URL = reverse("recipe:recipe-list")
+EXPORT_URL = reverse("recipe:recipe-export")
+BULK_URL = reverse("recipe:recipe-bulk")
 
 
 def image_upload_url(recipe_id):
@@ -23,6 +35,11 @@ def image_upload_url(recipe_id):
     return reverse("recipe:recipe-upload-image", args=[recipe_id])
 
 
+def image_url(recipe_id):
+    """ Return URL for recipe image variants. """
+    return reverse("recipe:recipe-image", args=[recipe_id])
+
+
 def detail_url(recipe_id):
     """ Return recipe detail URL. """
     return reverse("recipe:recipe-detail", args=[recipe_id])
@@ -50,6 +67,25 @@ def sample_recipe(user, **params):
     return Recipe.objects.create(user=user, **defaults)
 
 
+def count_queries(client, url, params=None):
+    """ Return the number of queries issued while fetching the URL. """
+    with CaptureQueriesContext(connection) as context:
+        client.get(url, params)
+
+    return len(context.captured_queries)
+
+
+def sample_tagged_recipe(user, index):
+    """ Create and return a recipe with its own tag and ingredient. """
+    recipe = sample_recipe(user=user, title=f"Recipe {index}")
+    recipe.tags.add(sample_tag(user=user, name=f"Tag {index}"))
+    recipe.ingredients.add(
+        sample_ingredient(user=user, name=f"Ingredient {index}")
+    )
+
+    return recipe
+
+
 class PublicRecipeAPITests(TestCase):
     """ Test unauthenticated recipe API access. """
 
@@ -85,7 +121,23 @@ class PrivateRecipeAPITests(TestCase):
         serializer = RecipeSerializer(recipes, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data["results"], serializer.data)
+
+    def test_recipes_paginated_by_cursor(self):
+        """ Test walking the recipe list with cursor pages. """
+        recipes = [sample_recipe(user=self.user) for _ in range(5)]
+
+        ids = []
+        res = self.client.get(RECIPES_URL, {"page_size": 2})
+        while True:
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(res.data["results"]), 2)
+            ids.extend(item["id"] for item in res.data["results"])
+            if not res.data["next"]:
+                break
+            res = self.client.get(res.data["next"])
+
+        self.assertEqual(ids, [recipe.id for recipe in reversed(recipes)])
 
     def test_recipes_limited_to_user(self):
         """ Test retrieving recipes for user. """
@@ -102,8 +154,8 @@ class PrivateRecipeAPITests(TestCase):
         serializer = RecipeSerializer(recipes, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(len(res.data["results"]), 1)
+        self.assertEqual(res.data["results"], serializer.data)
 
     def test_view_recipe_detail(self):
         """ Test viewing a recipe detail. """
@@ -210,6 +262,713 @@ class PrivateRecipeAPITests(TestCase):
         tags = recipe.tags.all()
         self.assertEqual(len(tags), 0)
 
+    def test_filter_recipes_by_tags_no_duplicates(self):
+        """ Test recipes matching several tags are returned once. """
+        recipe = sample_recipe(user=self.user)
+        first_tag = sample_tag(user=self.user, name="Vegan")
+        second_tag = sample_tag(user=self.user, name="Dessert")
+        recipe.tags.add(first_tag, second_tag)
+
+        res = self.client.get(
+            RECIPES_URL,
+            {"tags": f"{first_tag.id},{second_tag.id}"}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data["results"]), 1)
+
+    def test_filter_recipes_by_all_tags(self):
+        """ Test filtering recipes having every requested tag. """
+        first_tag = sample_tag(user=self.user, name="Vegan")
+        second_tag = sample_tag(user=self.user, name="Dessert")
+        both = sample_recipe(user=self.user, title="Vegan brownies")
+        both.tags.add(first_tag, second_tag)
+        one = sample_recipe(user=self.user, title="Vegan curry")
+        one.tags.add(first_tag)
+
+        res = self.client.get(RECIPES_URL, {
+            "tags": f"{first_tag.id},{second_tag.id}",
+            "tags_match": "all",
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        ids = [item["id"] for item in res.data["results"]]
+        self.assertEqual(ids, [both.id])
+
+    def test_filter_recipes_by_all_ingredients(self):
+        """ Test filtering recipes having every requested ingredient. """
+        first_ingredient = sample_ingredient(user=self.user, name="Eggs")
+        second_ingredient = sample_ingredient(user=self.user, name="Flour")
+        both = sample_recipe(user=self.user, title="Pancakes")
+        both.ingredients.add(first_ingredient, second_ingredient)
+        one = sample_recipe(user=self.user, title="Omelette")
+        one.ingredients.add(first_ingredient)
+
+        res = self.client.get(RECIPES_URL, {
+            "ingredients": f"{first_ingredient.id},{second_ingredient.id}",
+            "ingredients_match": "all",
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        ids = [item["id"] for item in res.data["results"]]
+        self.assertEqual(ids, [both.id])
+
+    def test_filter_recipes_invalid_match_mode(self):
+        """ Test an unknown match mode is rejected. """
+        tag = sample_tag(user=self.user)
+
+        res = self.client.get(
+            RECIPES_URL,
+            {"tags": str(tag.id), "tags_match": "some"}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_recipes_json(self):
+        """ Test exporting recipes as a streamed JSON array. """
+        for index in range(3):
+            sample_tagged_recipe(self.user, index)
+        sample_recipe(user=get_user_model().objects.create_user(
+            "other@hackfeed.com",
+            "testpass"
+        ))
+
+        res = self.client.get(EXPORT_URL)
+
+        recipes = Recipe.objects.filter(user=self.user).order_by("-id")
+        serializer = RecipeSerializer(recipes, many=True)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        self.assertEqual(res["Content-Type"], "application/json")
+        content = json.loads(b"".join(res.streaming_content))
+        self.assertEqual(content, serializer.data)
+
+    def test_export_recipes_ndjson(self):
+        """ Test exporting recipes as newline delimited JSON. """
+        for index in range(3):
+            sample_tagged_recipe(self.user, index)
+
+        res = self.client.get(EXPORT_URL, {"output": "ndjson"})
+
+        recipes = Recipe.objects.order_by("-id")
+        serializer = RecipeSerializer(recipes, many=True)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res["Content-Type"], "application/x-ndjson")
+        lines = b"".join(res.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line) for line in lines], serializer.data)
+
+    def test_export_recipes_invalid_output(self):
+        """ Test an unknown export output is rejected. """
+        res = self.client.get(EXPORT_URL, {"output": "xml"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def assertConstantQueries(self, url, create_recipe, params=None):
+        """ Assert that the query count doesn't grow with recipe count. """
+        create_recipe(0)
+        expected = count_queries(self.client, url, params)
+        for index in range(1, 6):
+            create_recipe(index)
+
+        self.assertEqual(count_queries(self.client, url, params), expected)
+
+    def test_list_recipes_constant_queries(self):
+        """ Test listing recipes doesn't query relations per recipe. """
+        self.assertConstantQueries(
+            RECIPES_URL,
+            lambda index: sample_tagged_recipe(self.user, index)
+        )
+
+    def test_filter_recipes_constant_queries(self):
+        """ Test filtering recipes doesn't query relations per recipe. """
+        tag = sample_tag(user=self.user, name="Shared")
+
+        def create_recipe(index):
+            sample_tagged_recipe(self.user, index).tags.add(tag)
+
+        self.assertConstantQueries(
+            RECIPES_URL,
+            create_recipe,
+            {"tags": str(tag.id)}
+        )
+
+    def test_view_recipe_detail_queries(self):
+        """ Test recipe detail loads its relations with prefetches. """
+        recipe = sample_recipe(user=self.user)
+        for index in range(5):
+            recipe.tags.add(sample_tag(user=self.user, name=f"Tag {index}"))
+            recipe.ingredients.add(
+                sample_ingredient(user=self.user, name=f"Ingredient {index}")
+            )
+
+        self.assertEqual(count_queries(self.client, detail_url(recipe.id)), 3)
+
+
+class SparseFieldsetTests(TestCase):
+    """ Test narrowing recipe output with fields and expand. """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@hackfeed.com",
+            "testpass"
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = sample_tagged_recipe(self.user, 1)
+
+    def test_list_fields(self):
+        """ Test only the requested fields are rendered and loaded. """
+        with CaptureQueriesContext(connection) as context:
+            res = self.client.get(RECIPES_URL, {"fields": "id,title"})
+
+        self.assertEqual(
+            res.data["results"],
+            [{"id": self.recipe.id, "title": self.recipe.title}]
+        )
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertNotIn("price", context.captured_queries[0]["sql"])
+
+    def test_list_fields_keep_ordering_column(self):
+        """ Test the ordering column is loaded even when not rendered. """
+        sample_tagged_recipe(self.user, 2)
+
+        num_queries = count_queries(
+            self.client,
+            RECIPES_URL,
+            {"fields": "id", "ordering": "price", "page_size": 1}
+        )
+
+        self.assertEqual(num_queries, 1)
+
+    def test_list_expand(self):
+        """ Test expanded relations are nested, the others stay ids. """
+        res = self.client.get(RECIPES_URL, {"expand": "tags"})
+
+        recipe = res.data["results"][0]
+        tag = self.recipe.tags.get()
+        ingredient = self.recipe.ingredients.get()
+        self.assertEqual(
+            recipe["tags"],
+            [{"id": tag.id, "name": tag.name, "recipe_count": 1}]
+        )
+        self.assertEqual(recipe["ingredients"], [ingredient.id])
+
+    def test_detail_fields_skip_relations(self):
+        """ Test relations that aren't requested aren't prefetched. """
+        url = detail_url(self.recipe.id)
+        with CaptureQueriesContext(connection) as context:
+            res = self.client.get(url, {"fields": "id,title,tags"})
+
+        self.assertEqual(set(res.data), {"id", "title", "tags"})
+        self.assertEqual(res.data["tags"][0]["name"], "Tag 1")
+        self.assertEqual(len(context.captured_queries), 2)
+
+    def test_detail_empty_expand(self):
+        """ Test an empty expand renders detail relations as ids. """
+        res = self.client.get(detail_url(self.recipe.id), {"expand": ""})
+
+        self.assertEqual(res.data["tags"], [self.recipe.tags.get().id])
+
+    def test_export_fields(self):
+        """ Test exports honour the requested fields. """
+        res = self.client.get(EXPORT_URL, {"fields": "id,tags",
+                                           "output": "ndjson"})
+        rows = [
+            json.loads(line)
+            for line in b"".join(res.streaming_content).splitlines()
+        ]
+
+        self.assertEqual(
+            rows,
+            [{"id": self.recipe.id, "tags": [self.recipe.tags.get().id]}]
+        )
+
+    def test_unknown_fields_rejected(self):
+        """ Test unknown field and relation names are rejected. """
+        res = self.client.get(RECIPES_URL, {"fields": "id,secret"})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("fields", res.data)
+
+        res = self.client.get(RECIPES_URL, {"expand": "title"})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("expand", res.data)
+
+    def test_fields_ignored_when_writing(self):
+        """ Test writes always render the full recipe. """
+        res = self.client.patch(
+            detail_url(self.recipe.id) + "?fields=id",
+            {"title": "Renamed"}
+        )
+
+        self.assertEqual(res.data["title"], "Renamed")
+        self.assertIn("tags", res.data)
+
+
+class CompiledReadSerializerTests(TestCase):
+    """ Test rendering values() rows matches the model serializers. """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            "test@hackfeed.com",
+            "testpass"
+        )
+
+    def test_matches_recipe_serializer(self):
+        """ Test recipes render exactly like RecipeSerializer. """
+        recipe = sample_recipe(user=self.user, price="7.25", link="x.com")
+        recipe.tags.add(
+            sample_tag(user=self.user, name="Second"),
+            sample_tag(user=self.user, name="First")
+        )
+        sample_recipe(user=self.user)
+        recipes = Recipe.objects.order_by("id").prefetch_related(
+            Prefetch("tags", queryset=Tag.objects.order_by("id")),
+            Prefetch("ingredients", queryset=Ingredient.objects.order_by("id"))
+        )
+        compiled = CompiledReadSerializer(RecipeSerializer())
+
+        rendered = compiled.render(
+            Recipe.objects.order_by("id").values(*compiled.columns)
+        )
+
+        self.assertEqual(
+            json.dumps(rendered),
+            json.dumps(RecipeSerializer(recipes, many=True).data)
+        )
+
+    def test_matches_narrowed_fields(self):
+        """ Test sparse fieldsets compile to the same output. """
+        sample_tagged_recipe(self.user, 1)
+        serializer = RecipeSerializer(fields=["title", "tags"])
+        compiled = CompiledReadSerializer(serializer)
+
+        rendered = compiled.render(Recipe.objects.values(*compiled.columns))
+
+        self.assertEqual(
+            rendered,
+            RecipeSerializer(Recipe.objects.all(), many=True,
+                             fields=["title", "tags"]).data
+        )
+
+    def test_matches_tag_serializer(self):
+        """ Test tags render exactly like TagSerializer. """
+        sample_tag(user=self.user)
+        compiled = CompiledReadSerializer(TagSerializer())
+
+        rendered = compiled.render(Tag.objects.values(*compiled.columns))
+
+        self.assertEqual(
+            rendered,
+            TagSerializer(Tag.objects.all(), many=True).data
+        )
+
+    def test_nested_fields_unsupported(self):
+        """ Test serializers with nested objects are not compiled. """
+        self.assertTrue(CompiledReadSerializer.supports(RecipeSerializer()))
+        self.assertFalse(
+            CompiledReadSerializer.supports(RecipeDetailSerializer())
+        )
+        self.assertFalse(CompiledReadSerializer.supports(
+            RecipeSerializer(expand=["tags"])
+        ))
+
+
+class BulkRecipeAPITests(TestCase):
+    """ Test writing recipes in bulk. """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@hackfeed.com",
+            "testpass"
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_bulk_create_recipes(self):
+        """ Test creating a batch of recipes with relations. """
+        tag = sample_tag(user=self.user)
+        ingredient = sample_ingredient(user=self.user)
+        payload = [
+            {
+                "title": f"Recipe {index}",
+                "time_minutes": 10,
+                "price": "5.00",
+                "tags": [tag.id],
+                "ingredients": [ingredient.id],
+            }
+            for index in range(3)
+        ]
+
+        res = self.client.post(BULK_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data), 3)
+        recipes = Recipe.objects.filter(user=self.user)
+        self.assertEqual(recipes.count(), 3)
+        for recipe in recipes:
+            self.assertEqual(list(recipe.tags.all()), [tag])
+            self.assertEqual(list(recipe.ingredients.all()), [ingredient])
+        self.assertEqual(res.data[0]["tags"], [tag.id])
+
+    def test_bulk_create_validates_relations_once(self):
+        """ Test related ids are checked with one query per model. """
+        tags = [sample_tag(user=self.user, name=f"Tag {i}") for i in range(5)]
+
+        def payload(count):
+            return [
+                {
+                    "title": f"Recipe {index}",
+                    "time_minutes": 10,
+                    "price": "5.00",
+                    "tags": [tag.id for tag in tags],
+                    "ingredients": [0],
+                }
+                for index in range(count)
+            ]
+
+        with self.assertNumQueries(2):
+            self.client.post(BULK_URL, payload(1), format="json")
+        with self.assertNumQueries(2):
+            res = self.client.post(BULK_URL, payload(20), format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_create_reports_item_errors(self):
+        """ Test an invalid item rejects the whole batch. """
+        payload = [
+            {"title": "Valid", "time_minutes": 10, "price": "5.00"},
+            {"title": "No time", "price": "5.00"},
+            {"title": "Bad tag", "time_minutes": 10, "price": "5.00",
+             "tags": [0]},
+        ]
+
+        res = self.client.post(BULK_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn("time_minutes", res.data[1])
+        self.assertIn("tags", res.data[2])
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bulk_create_requires_list(self):
+        """ Test the bulk payload must be a list. """
+        res = self.client.post(BULK_URL, {"title": "Single"}, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_update_recipes(self):
+        """ Test partially updating a batch of recipes. """
+        first_recipe = sample_recipe(user=self.user)
+        first_recipe.tags.add(sample_tag(user=self.user))
+        second_recipe = sample_recipe(user=self.user)
+        new_tag = sample_tag(user=self.user, name="Curry")
+        payload = [
+            {"id": first_recipe.id, "tags": [new_tag.id]},
+            {"id": second_recipe.id, "title": "Renamed", "price": "7.50"},
+        ]
+
+        res = self.client.patch(BULK_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        first_recipe.refresh_from_db()
+        second_recipe.refresh_from_db()
+        self.assertEqual(list(first_recipe.tags.all()), [new_tag])
+        self.assertEqual(first_recipe.title, "Sample recipe")
+        self.assertEqual(second_recipe.title, "Renamed")
+        self.assertEqual(str(second_recipe.price), "7.50")
+
+    def test_bulk_update_other_user_recipe(self):
+        """ Test recipes of other users can't be updated. """
+        other_user = get_user_model().objects.create_user(
+            "other@hackfeed.com",
+            "testpass"
+        )
+        recipe = sample_recipe(user=other_user)
+
+        res = self.client.patch(
+            BULK_URL,
+            [{"id": recipe.id, "title": "Stolen"}, {"title": "No id"}],
+            format="json"
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {"id": ["Not found."]})
+        self.assertEqual(res.data[1], {"id": ["This field is required."]})
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, "Sample recipe")
+
+    def test_bulk_delete_recipes(self):
+        """ Test deleting a batch of recipes. """
+        recipes = [sample_recipe(user=self.user) for _ in range(3)]
+
+        res = self.client.delete(
+            BULK_URL,
+            [recipe.id for recipe in recipes[:2]],
+            format="json"
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(
+            list(Recipe.objects.values_list("id", flat=True)),
+            [recipes[2].id]
+        )
+
+    def test_bulk_delete_unknown_recipe(self):
+        """ Test deleting an unknown recipe deletes nothing. """
+        recipe = sample_recipe(user=self.user)
+
+        res = self.client.delete(BULK_URL, [recipe.id, 0], format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data, [{}, {"id": ["Not found."]}])
+        self.assertTrue(Recipe.objects.filter(id=recipe.id).exists())
+
+
+class RecipeSearchTests(TestCase):
+    """ Test searching recipes by title, tag and ingredient names. """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@hackfeed.com",
+            "testpass"
+        )
+        self.client.force_authenticate(self.user)
+
+    def search(self, text, **params):
+        """ Return the ids of the recipes found for a search. """
+        res = self.client.get(RECIPES_URL, {"search": text, **params})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        return [recipe["id"] for recipe in res.data["results"]]
+
+    def test_search_title_and_names(self):
+        """ Test titles, tag and ingredient names are all searched. """
+        curry = sample_recipe(user=self.user, title="Thai green curry")
+        soup = sample_recipe(user=self.user, title="Soup")
+        soup.tags.add(sample_tag(user=self.user, name="Vegan"))
+        cake = sample_recipe(user=self.user, title="Cake")
+        cake.ingredients.add(sample_ingredient(user=self.user, name="Lemon"))
+
+        self.assertEqual(self.search("curry"), [curry.id])
+        self.assertEqual(self.search("vegan"), [soup.id])
+        self.assertEqual(self.search("lemon"), [cake.id])
+        self.assertEqual(self.search("pizza"), [])
+
+    def test_search_requires_every_term(self):
+        """ Test all search terms must match. """
+        green_curry = sample_recipe(user=self.user, title="Green curry")
+        sample_recipe(user=self.user, title="Red curry")
+
+        self.assertEqual(self.search("green curry"), [green_curry.id])
+
+    def test_search_ranks_title_matches_first(self):
+        """ Test title matches rank above tag matches. """
+        tagged = sample_recipe(user=self.user, title="Stew")
+        tagged.tags.add(sample_tag(user=self.user, name="Spicy"))
+        titled = sample_recipe(user=self.user, title="Spicy noodles")
+        newer = sample_recipe(user=self.user, title="Rice")
+        newer.tags.add(sample_tag(user=self.user, name="Spicy rice"))
+
+        self.assertEqual(
+            self.search("spicy"),
+            [titled.id, newer.id, tagged.id]
+        )
+
+    def test_search_paginated(self):
+        """ Test ranked results page without gaps or repeats. """
+        recipes = [
+            sample_recipe(user=self.user, title=f"Pasta {i}")
+            for i in range(5)
+        ]
+        res = self.client.get(RECIPES_URL, {"search": "pasta", "page_size": 2})
+        ids = [recipe["id"] for recipe in res.data["results"]]
+        while res.data["next"]:
+            res = self.client.get(res.data["next"])
+            ids += [recipe["id"] for recipe in res.data["results"]]
+
+        self.assertEqual(ids, [recipe.id for recipe in reversed(recipes)])
+
+    def test_search_limited_to_user(self):
+        """ Test other users' recipes are not found. """
+        other = get_user_model().objects.create_user(
+            "other@hackfeed.com",
+            "testpass"
+        )
+        sample_recipe(user=other, title="Curry")
+
+        self.assertEqual(self.search("curry"), [])
+
+    def test_search_follows_changes(self):
+        """ Test the index follows title, link and name changes. """
+        recipe = sample_recipe(user=self.user, title="Soup")
+        tag = sample_tag(user=self.user, name="Winter")
+        recipe.tags.add(tag)
+
+        tag.name = "Summer"
+        tag.save()
+        self.assertEqual(self.search("summer"), [recipe.id])
+        self.assertEqual(self.search("winter"), [])
+
+        recipe.title = "Gazpacho"
+        recipe.save()
+        self.assertEqual(self.search("gazpacho"), [recipe.id])
+
+        recipe.tags.clear()
+        self.assertEqual(self.search("summer"), [])
+
+        tag.recipe_set.add(recipe)
+        self.assertEqual(self.search("summer"), [recipe.id])
+
+        tag.delete()
+        self.assertEqual(self.search("summer"), [])
+
+    def test_search_bulk_created_recipes(self):
+        """ Test recipes created in bulk are searchable. """
+        tag = sample_tag(user=self.user, name="Brunch")
+        res = self.client.post(BULK_URL, [
+            {"title": "Pancakes", "time_minutes": 10, "price": "2.00",
+             "tags": [tag.id]},
+        ], format="json")
+
+        self.assertEqual(self.search("brunch"), [res.data[0]["id"]])
+
+    def test_search_bulk_updated_recipes(self):
+        """ Test recipes updated in bulk are reindexed. """
+        recipe = sample_recipe(user=self.user, title="Toast")
+        tag = sample_tag(user=self.user, name="Breakfast")
+        self.client.patch(BULK_URL, [
+            {"id": recipe.id, "tags": [tag.id]},
+        ], format="json")
+
+        self.assertEqual(self.search("breakfast"), [recipe.id])
+
+
+class RecipeRangeOrderingTests(TestCase):
+    """ Test range filters and orderings on time and price. """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@hackfeed.com",
+            "testpass"
+        )
+        self.client.force_authenticate(self.user)
+
+    def list_ids(self, **params):
+        """ Return the ids of every recipe listed, following the cursor. """
+        res = self.client.get(RECIPES_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        ids = [recipe["id"] for recipe in res.data["results"]]
+        while res.data["next"]:
+            res = self.client.get(res.data["next"])
+            ids += [recipe["id"] for recipe in res.data["results"]]
+
+        return ids
+
+    def test_filter_time_range(self):
+        """ Test recipes are filtered by preparation time. """
+        quick = sample_recipe(user=self.user, time_minutes=10)
+        medium = sample_recipe(user=self.user, time_minutes=30)
+        sample_recipe(user=self.user, time_minutes=60)
+
+        self.assertEqual(self.list_ids(time_max=30), [medium.id, quick.id])
+        self.assertEqual(
+            self.list_ids(time_min=20, time_max=30),
+            [medium.id]
+        )
+
+    def test_filter_price_range(self):
+        """ Test recipes are filtered by price. """
+        cheap = sample_recipe(user=self.user, price="2.50")
+        dear = sample_recipe(user=self.user, price="12.00")
+
+        self.assertEqual(self.list_ids(price_max="2.50"), [cheap.id])
+        self.assertEqual(self.list_ids(price_min="3"), [dear.id])
+
+    def test_filter_invalid_range(self):
+        """ Test invalid range values are rejected. """
+        res = self.client.get(RECIPES_URL, {"time_max": "soon",
+                                            "price_min": "cheap"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("time_max", res.data)
+        self.assertIn("price_min", res.data)
+
+    def test_filter_out_of_range(self):
+        """ Test values the column can't hold are rejected, not queried. """
+        res = self.client.get(RECIPES_URL, {
+            "time_min": "99999999999999999999",
+            "time_max": "-1",
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("time_min", res.data)
+        self.assertIn("time_max", res.data)
+
+    def test_filter_invalid_ids(self):
+        """ Test ids that aren't integers are rejected. """
+        for params in ({"tags": "a"}, {"ingredients": "1,,2"}):
+            res = self.client.get(RECIPES_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn(next(iter(params)), res.data)
+
+    def test_order_by_price(self):
+        """ Test cheapest first ordering breaks ties on id. """
+        expensive = sample_recipe(user=self.user, price="9.00")
+        cheap = sample_recipe(user=self.user, price="1.00")
+        tied = sample_recipe(user=self.user, price="1.00")
+
+        self.assertEqual(
+            self.list_ids(ordering="price"),
+            [cheap.id, tied.id, expensive.id]
+        )
+        self.assertEqual(
+            self.list_ids(ordering="-price"),
+            [expensive.id, tied.id, cheap.id]
+        )
+
+    def test_ordering_paginates_through_ties(self):
+        """ Test every ordering pages without gaps or repeats. """
+        recipes = [
+            sample_recipe(user=self.user, time_minutes=i % 3,
+                          price=f"{i % 2}.00")
+            for i in range(7)
+        ]
+        for ordering, key in (
+            ("time_minutes", lambda r: (r.time_minutes, r.id)),
+            ("-time_minutes", lambda r: (-r.time_minutes, -r.id)),
+            ("price", lambda r: (float(r.price), r.id)),
+            ("-price", lambda r: (-float(r.price), -r.id)),
+            ("id", lambda r: r.id),
+        ):
+            expected = [recipe.id for recipe in sorted(recipes, key=key)]
+            self.assertEqual(
+                self.list_ids(ordering=ordering, page_size=2),
+                expected,
+                ordering
+            )
+
+    def test_invalid_ordering(self):
+        """ Test only whitelisted orderings are accepted. """
+        res = self.client.get(RECIPES_URL, {"ordering": "title"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_ordering_overrides_search_rank(self):
+        """ Test an explicit ordering applies to search results. """
+        slow = sample_recipe(user=self.user, title="Curry", time_minutes=90)
+        quick = sample_recipe(user=self.user, title="Curry rice",
+                              time_minutes=20)
+
+        self.assertEqual(
+            self.list_ids(search="curry", ordering="time_minutes"),
+            [quick.id, slow.id]
+        )
+
 
 class RecipeImageUploadTests(TestCase):
     """ Test recipe image uploading. """
@@ -240,6 +999,18 @@ class RecipeImageUploadTests(TestCase):
         self.assertIn("image", res.data)
         self.assertTrue(os.path.exists(self.recipe.image.path))
 
+    def test_upload_image_pending(self):
+        """ Test an uploaded image is queued for processing. """
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix=".jpg") as ntf:
+            Image.new("RGB", (10, 10)).save(ntf, format="JPEG")
+            ntf.seek(0)
+            res = self.client.post(url, {"image": ntf}, format="multipart")
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(res.data["image_status"], "pending")
+        self.assertEqual(self.recipe.image_status, "pending")
+
     def test_upload_image_bad_request(self):
         """ Test uploading an invalid image. """
         url = image_upload_url(self.recipe.id)
@@ -269,9 +1040,9 @@ class RecipeImageUploadTests(TestCase):
         second_serializer = RecipeSerializer(second_recipe)
         third_serializer = RecipeSerializer(third_recipe)
 
-        self.assertIn(first_serializer.data, res.data)
-        self.assertIn(second_serializer.data, res.data)
-        self.assertNotIn(third_serializer.data, res.data)
+        self.assertIn(first_serializer.data, res.data["results"])
+        self.assertIn(second_serializer.data, res.data["results"])
+        self.assertNotIn(third_serializer.data, res.data["results"])
 
     def test_filter_recipes_by_ingredients(self):
         """ Test returning recipes with specific ingredients. """
@@ -296,6 +1067,122 @@ class RecipeImageUploadTests(TestCase):
         second_serializer = RecipeSerializer(second_recipe)
         third_serializer = RecipeSerializer(third_recipe)
 
-        self.assertIn(first_serializer.data, res.data)
-        self.assertIn(second_serializer.data, res.data)
-        self.assertNotIn(third_serializer.data, res.data)
+        self.assertIn(first_serializer.data, res.data["results"])
+        self.assertIn(second_serializer.data, res.data["results"])
+        self.assertNotIn(third_serializer.data, res.data["results"])
+
+
+@override_settings(RECIPE_IMAGE_VARIANT_SIZES=(8, 32))
+class RecipeImageProcessingTests(TestCase):
+    """ Test processing uploaded recipe images. """
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@hackfeed.com",
+            "testpass"
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = sample_recipe(user=self.user)
+
+    def tearDown(self):
+        shutil.rmtree(self.media_root)
+
+    def attach_image(self, size=(64, 48)):
+        """ Attach a JPEG carrying EXIF metadata to the recipe. """
+        img = Image.new("RGB", size, "red")
+        exif = img.getexif()
+        exif[0x010F] = "Hackfeed camera"
+        with tempfile.SpooledTemporaryFile() as f:
+            img.save(f, format="JPEG", exif=exif.tobytes())
+            f.seek(0)
+            self.recipe.image.save("photo.jpg", ContentFile(f.read()))
+
+    def test_process_image_creates_variants(self):
+        """ Test processing renders every size and format. """
+        self.attach_image()
+        uploaded = self.recipe.image.name
+
+        process_recipe_image(self.recipe.id)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, "ready")
+        self.assertEqual(StoredFile.objects.get(name=uploaded).refs, 0)
+        variants = {
+            (variant.size, variant.format): variant
+            for variant in self.recipe.image_variants.all()
+        }
+        self.assertEqual(set(variants), {
+            (8, "jpeg"), (8, "webp"), (32, "jpeg"), (32, "webp"),
+        })
+        with Image.open(variants[(32, "webp")].image.path) as img:
+            self.assertEqual(img.format, "WEBP")
+            self.assertEqual(img.size, (32, 24))
+
+    def test_process_image_strips_metadata(self):
+        """ Test processed images carry no EXIF metadata. """
+        self.attach_image()
+
+        process_recipe_image(self.recipe.id)
+
+        self.recipe.refresh_from_db()
+        paths = [self.recipe.image.path] + [
+            variant.image.path for variant in self.recipe.image_variants.all()
+        ]
+        for path in paths:
+            with Image.open(path) as img:
+                self.assertFalse(dict(img.getexif()))
+
+    def test_process_invalid_image_fails(self):
+        """ Test an unreadable image is marked as failed. """
+        self.recipe.image.save("photo.jpg", ContentFile(b"notimage"))
+
+        with self.assertRaises(Exception):
+            process_recipe_image(self.recipe.id)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, "failed")
+
+    def test_retrieve_image_variant(self):
+        """ Test the smallest variant covering the size is returned. """
+        self.attach_image()
+        process_recipe_image(self.recipe.id)
+
+        res = self.client.get(
+            image_url(self.recipe.id),
+            {"size": 10, "image_format": "webp"}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["size"], 32)
+        self.assertEqual(res.data["format"], "webp")
+        self.assertTrue(res.data["image"].endswith(".webp"))
+
+    def test_retrieve_image_variant_pending(self):
+        """ Test asking for a variant before processing finishes. """
+        self.attach_image()
+        self.recipe.image_status = "pending"
+        self.recipe.save()
+
+        res = self.client.get(image_url(self.recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+
+    def test_retrieve_image_variant_missing(self):
+        """ Test asking for a variant of a recipe without an image. """
+        res = self.client.get(image_url(self.recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_retrieve_image_variant_invalid_format(self):
+        """ Test asking for an unknown variant format. """
+        res = self.client.get(
+            image_url(self.recipe.id),
+            {"image_format": "gif"}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
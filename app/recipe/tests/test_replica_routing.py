@@ -0,0 +1,145 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.db import routers
+from core.db.routers import ReplicaRouter
+from core.models import Recipe, Tag
+
+
+RECIPES_URL = reverse("recipe:recipe-list")
+TAGS_URL = reverse("recipe:tag-list")
+
+
+def titles(res):
+    """ Return the recipe titles of a list response. """
+    return sorted(recipe["title"] for recipe in res.data["results"])
+
+
+@patch.dict(routers.REPLICA_SETTINGS, {"ALIASES": ["replica"]})
+class ReplicaRoutingTests(TestCase):
+    """ Test safe requests read from the replica, a second database. """
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        cache.clear()
+        routers.pinned_users.clear()
+        self.addCleanup(routers.pinned_users.clear)
+        self.user = get_user_model().objects.create_user(
+            "test@hackfeed.com",
+            "testpass"
+        )
+        self.user.save(using="replica")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for alias in ("default", "replica"):
+            Recipe.objects.using(alias).create(
+                user=self.user,
+                title=f"Recipe on {alias}",
+                time_minutes=10,
+                price=5.00
+            )
+
+    def test_reads_from_replica(self):
+        """ Test lists and details are read from the replica. """
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(titles(res), ["Recipe on replica"])
+
+    def test_attrs_read_from_replica(self):
+        """ Test tag lists are read from the replica. """
+        Tag.objects.using("replica").create(user=self.user, name="Vegan")
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(
+            [tag["name"] for tag in res.data["results"]],
+            ["Vegan"]
+        )
+
+    def test_read_your_writes(self):
+        """ Test a client reads from the primary after writing. """
+        res = self.client.post(RECIPES_URL, {
+            "title": "New recipe",
+            "time_minutes": 5,
+            "price": 2.00,
+        })
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertIn(routers.REPLICA_SETTINGS["PIN_COOKIE"], res.cookies)
+        self.assertFalse(Recipe.objects.using("replica").filter(
+            title="New recipe"
+        ).exists())
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(titles(res), ["New recipe", "Recipe on default"])
+
+    def test_pinned_by_user(self):
+        """ Test the pin covers the user's other clients, e.g. tokens. """
+        self.client.post(RECIPES_URL, {
+            "title": "New recipe",
+            "time_minutes": 5,
+            "price": 2.00,
+        })
+        other = APIClient()
+        other.force_authenticate(self.user)
+
+        res = other.get(RECIPES_URL)
+
+        self.assertEqual(titles(res), ["New recipe", "Recipe on default"])
+
+    def test_pin_expires(self):
+        """ Test reads return to the replica once the pin expires. """
+        self.client.post(RECIPES_URL, {
+            "title": "New recipe",
+            "time_minutes": 5,
+            "price": 2.00,
+        })
+        self.client.cookies.clear()
+        routers.pinned_users.clear()
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(titles(res), ["Recipe on replica"])
+
+    def test_failed_write_not_pinned(self):
+        """ Test rejected writes don't pin the client. """
+        res = self.client.post(RECIPES_URL, {"title": ""})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertNotIn(routers.REPLICA_SETTINGS["PIN_COOKIE"], res.cookies)
+
+    def test_routing_reset_after_request(self):
+        """ Test reads outside the API go to the primary. """
+        self.client.get(RECIPES_URL)
+
+        self.assertIsNone(routers.read_alias())
+        self.assertEqual(
+            Recipe.objects.get(user=self.user).title,
+            "Recipe on default"
+        )
+
+
+class ReplicaRouterTests(TestCase):
+
+    def test_writes_go_to_primary(self):
+        """ Test objects read from a replica are saved on the primary. """
+        router = ReplicaRouter()
+        routers.route_reads("replica")
+        self.addCleanup(routers.route_reads, None)
+
+        self.assertEqual(router.db_for_read(Recipe), "replica")
+        self.assertEqual(router.db_for_write(Recipe), "default")
+
+    def test_no_replicas(self):
+        """ Test nothing is routed without configured replicas. """
+        request = type("Request", (), {"COOKIES": {}})()
+
+        with patch.dict(routers.REPLICA_SETTINGS, {"ALIASES": []}):
+            self.assertIsNone(routers.choose_replica(request))
@@ -0,0 +1,251 @@
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag, Ingredient, Recipe, RecipeStats
+
+from recipe import stats
+
+
+STATS_URL = reverse("recipe:stats")
+RECIPES_URL = reverse("recipe:recipe-list")
+BULK_URL = reverse("recipe:recipe-bulk")
+
+
+def sample_user(email="test@hackfeed.com"):
+    """ Create and return a sample user. """
+    return get_user_model().objects.create_user(email, "testpass")
+
+
+def sample_recipe(user, **params):
+    """ Create and return a sample recipe. """
+    defaults = {"title": "Sample recipe", "time_minutes": 10, "price": 5}
+    defaults.update(params)
+
+    return Recipe.objects.create(user=user, **defaults)
+
+
+def usage(attr):
+    """ Return the maintained recipe count of an attribute. """
+    attr.refresh_from_db(fields=["recipe_count"])
+
+    return attr.recipe_count
+
+
+class RecipeStatsMaintenanceTests(TestCase):
+
+    def setUp(self):
+        self.user = sample_user()
+        self.tag = Tag.objects.create(user=self.user, name="Vegan")
+        self.ingredient = Ingredient.objects.create(
+            user=self.user,
+            name="Salt"
+        )
+
+    def assertNoDrift(self):
+        self.assertEqual(stats.drift(), [])
+
+    def test_recipe_save_and_delete(self):
+        """ Test totals follow recipes being created, edited and deleted. """
+        recipe = sample_recipe(self.user, time_minutes=10, price=4)
+        sample_recipe(self.user, time_minutes=30, price=Decimal("12.50"))
+
+        recipe.price = 60
+        recipe.save()
+
+        totals = RecipeStats.objects.get(user=self.user)
+        self.assertEqual(totals.recipe_count, 2)
+        self.assertEqual(totals.total_time_minutes, 40)
+        self.assertEqual(totals.total_price, Decimal("72.50"))
+        self.assertEqual(totals.price_up_to_5, 0)
+        self.assertEqual(totals.price_up_to_20, 1)
+        self.assertEqual(totals.price_over_50, 1)
+        self.assertNoDrift()
+
+        recipe.delete()
+
+        self.assertEqual(
+            RecipeStats.objects.get(user=self.user).recipe_count,
+            1
+        )
+        self.assertNoDrift()
+
+    def test_links_forward_and_reverse(self):
+        """ Test usage counts follow m2m changes from either side. """
+        first = sample_recipe(self.user)
+        second = sample_recipe(self.user)
+        first.tags.add(self.tag)
+        first.tags.add(self.tag)
+        self.tag.recipe_set.add(second)
+        first.ingredients.add(self.ingredient)
+        self.assertEqual(usage(self.tag), 2)
+
+        first.tags.remove(self.tag, Tag.objects.create(
+            user=self.user,
+            name="Unlinked"
+        ))
+        self.assertEqual(usage(self.tag), 1)
+        self.assertNoDrift()
+
+        self.tag.recipe_set.clear()
+        first.ingredients.clear()
+        self.assertEqual(usage(self.tag), 0)
+        self.assertEqual(usage(self.ingredient), 0)
+        self.assertNoDrift()
+
+    def test_recipe_delete_unlinks(self):
+        """ Test deleting a recipe lowers the usage of its attributes. """
+        recipe = sample_recipe(self.user)
+        recipe.tags.add(self.tag)
+
+        recipe.delete()
+
+        self.assertEqual(usage(self.tag), 0)
+        self.assertNoDrift()
+
+    def test_attr_save_keeps_count(self):
+        """ Test saving a stale attribute doesn't overwrite its count. """
+        stale = Tag.objects.get(id=self.tag.id)
+        sample_recipe(self.user).tags.add(self.tag)
+
+        stale.name = "Vegetarian"
+        stale.save()
+
+        self.assertEqual(usage(self.tag), 1)
+        self.assertNoDrift()
+
+    def test_rebuild_fixes_drift(self):
+        """ Test drift is reported and repaired by a rebuild. """
+        sample_recipe(self.user).tags.add(self.tag)
+        RecipeStats.objects.update(recipe_count=5)
+        Tag.objects.update(recipe_count=3)
+
+        self.assertEqual(len(stats.drift()), 2)
+        self.assertEqual(stats.rebuild(), (1, 1))
+        self.assertNoDrift()
+
+
+class RecipeStatsApiTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = sample_user()
+        self.client.force_authenticate(self.user)
+
+    def test_login_required(self):
+        """ Test the stats require authentication. """
+        res = APIClient().get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_empty(self):
+        """ Test users without recipes get zero totals. """
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["recipe_count"], 0)
+        self.assertIsNone(res.data["average_price"])
+        self.assertEqual(res.data["top_tags"], [])
+
+    def test_stats_after_api_writes(self):
+        """ Test recipes written through the API show in the stats. """
+        tag = Tag.objects.create(user=self.user, name="Vegan")
+        other = Tag.objects.create(user=self.user, name="Quick")
+        self.client.post(RECIPES_URL, {
+            "title": "Soup", "time_minutes": 20, "price": "4.00",
+            "tags": [tag.id, other.id],
+        })
+        self.client.post(BULK_URL, [
+            {"title": "Stew", "time_minutes": 40, "price": "15.00",
+             "tags": [tag.id]},
+        ], format="json")
+        sample_recipe(get_user_model().objects.create_user(
+            "other@hackfeed.com", "testpass"
+        ))
+
+        res = self.client.get(STATS_URL, {"top": 1})
+
+        self.assertEqual(res.data["recipe_count"], 2)
+        self.assertEqual(res.data["average_time_minutes"], 30)
+        self.assertEqual(res.data["average_price"], "9.50")
+        self.assertEqual(res.data["price_distribution"]["up_to_5"], 1)
+        self.assertEqual(res.data["price_distribution"]["up_to_20"], 1)
+        self.assertEqual(res.data["top_tags"], [
+            {"id": tag.id, "name": "Vegan", "recipe_count": 2},
+        ])
+        self.assertEqual(stats.drift(), [])
+
+    def test_bulk_update_and_delete(self):
+        """ Test batch writes keep the stats consistent. """
+        tag = Tag.objects.create(user=self.user, name="Vegan")
+        res = self.client.post(BULK_URL, [
+            {"title": f"Recipe {index}", "time_minutes": 10,
+             "price": "3.00", "tags": [tag.id]}
+            for index in range(3)
+        ], format="json")
+        ids = [item["id"] for item in res.data]
+
+        self.client.patch(BULK_URL, [
+            {"id": ids[0], "price": "30.00", "tags": []},
+        ], format="json")
+        self.assertEqual(stats.drift(), [])
+
+        self.client.delete(BULK_URL, ids[1:], format="json")
+
+        self.assertEqual(stats.drift(), [])
+        self.assertEqual(
+            self.client.get(STATS_URL).data["price_distribution"]["up_to_50"],
+            1
+        )
+
+    def test_invalid_top(self):
+        """ Test top must be a small non negative integer. """
+        for value in ("many", "-1", "1000"):
+            res = self.client.get(STATS_URL, {"top": value})
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RecipeStatsCommandTests(TestCase):
+
+    def test_check_and_rebuild(self):
+        """ Test the command fails on drift until the stats are rebuilt. """
+        sample_recipe(sample_user())
+        RecipeStats.objects.all().delete()
+
+        with self.assertRaises(CommandError):
+            call_command("recipe_stats", "--check", stdout=StringIO())
+        call_command("recipe_stats", "--rebuild", stdout=StringIO())
+        call_command("recipe_stats", "--check", stdout=StringIO())
+
+    def test_requires_one_mode(self):
+        """ Test the command needs exactly one of its modes. """
+        with self.assertRaises(CommandError):
+            call_command("recipe_stats")
+
+
+class UserDeletionTests(TestCase):
+
+    def test_delete_user_with_recipes(self):
+        """ Test deleting a user removes their recipes and stats. """
+        user = sample_user()
+        tag = Tag.objects.create(user=user, name="Vegan")
+        ingredient = Ingredient.objects.create(user=user, name="Salt")
+        for index in range(3):
+            recipe = sample_recipe(user, title=f"Recipe {index}")
+            recipe.tags.add(tag)
+            recipe.ingredients.add(ingredient)
+
+        user.delete()
+
+        self.assertFalse(Recipe.objects.exists())
+        self.assertFalse(RecipeStats.objects.exists())
+        self.assertEqual(stats.drift(), [])
@@ -1,16 +1,41 @@
+import os
+import tempfile
+from unittest.mock import patch
+
 from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
 from django.urls import reverse
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
 from core.models import Tag, Recipe
 
+from recipe import cache
 from recipe.serializers import TagSerializer
 
 
 TAGS_URL = reverse("recipe:tag-list")
+TAGS_BULK_URL = reverse("recipe:tag-bulk")
+SHARED_CACHE_DIR = os.path.join(tempfile.gettempdir(), "recipe-attrs-tests")
+
+# A file based cache stands in for memcached: instances on one directory
+# share their entries the way separate worker processes share memcached.
+shared_cache = override_settings(
+    CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        },
+        "shared": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": SHARED_CACHE_DIR,
+        },
+    },
+    RECIPE_ATTRS_CACHE={"BACKEND": "shared"}
+)
 
 
 class PublicTagsAPITests(TestCase):
@@ -26,10 +51,12 @@ class PublicTagsAPITests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
+@shared_cache
 class PrivateTagsAPITests(TestCase):
     """ Test the authorized user tags API. """
 
     def setUp(self):
+        caches["shared"].clear()
         self.user = get_user_model().objects.create_user(
             "test@hackfeed.com",
             "password123"
@@ -48,7 +75,26 @@ class PrivateTagsAPITests(TestCase):
         serializer = TagSerializer(tags, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data["results"], serializer.data)
+
+    def test_tags_paginated_by_cursor(self):
+        """ Test walking the tag list with cursor pages. """
+        for name in ("Apple", "Banana", "Cherry", "Date", "Elderberry"):
+            Tag.objects.create(user=self.user, name=name)
+
+        names = []
+        res = self.client.get(TAGS_URL, {"page_size": 2})
+        while True:
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            names.extend(item["name"] for item in res.data["results"])
+            if not res.data["next"]:
+                break
+            res = self.client.get(res.data["next"])
+
+        self.assertEqual(
+            names,
+            ["Elderberry", "Date", "Cherry", "Banana", "Apple"]
+        )
 
     def test_tags_limited_to_user(self):
         """ Test that tags returned are for the authenticated user. """
@@ -62,8 +108,8 @@ class PrivateTagsAPITests(TestCase):
         res = self.client.get(TAGS_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]["name"], tag.name)
+        self.assertEqual(len(res.data["results"]), 1)
+        self.assertEqual(res.data["results"][0]["name"], tag.name)
 
     def test_create_tag_succesfull(self):
         """ Test creating a new tag. """
@@ -77,6 +123,68 @@ class PrivateTagsAPITests(TestCase):
 
         self.assertTrue(exists)
 
+    def test_create_tag_duplicate(self):
+        """ Test creating a tag with an existing name fails. """
+        Tag.objects.create(user=self.user, name="Vegan")
+
+        res = self.client.post(TAGS_URL, {"name": "Vegan"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+
+    def test_create_tag_name_used_by_other_user(self):
+        """ Test tag names only need to be unique per user. """
+        another_user = get_user_model().objects.create_user(
+            "other@hackfeed.com",
+            "testpass"
+        )
+        Tag.objects.create(user=another_user, name="Vegan")
+
+        res = self.client.post(TAGS_URL, {"name": "Vegan"})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    def test_bulk_get_or_create_tags(self):
+        """ Test resolving tag names, creating the missing ones. """
+        existing = Tag.objects.create(user=self.user, name="Vegan")
+
+        with self.assertNumQueries(3):
+            res = self.client.post(
+                TAGS_BULK_URL,
+                {"names": ["Vegan", "Dessert", "Lunch", "Dessert"]},
+                format="json"
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [tag["name"] for tag in res.data],
+            ["Vegan", "Dessert", "Lunch"]
+        )
+        self.assertEqual(res.data[0]["id"], existing.id)
+        tags = Tag.objects.filter(user=self.user)
+        self.assertEqual(tags.count(), 3)
+        for item in res.data:
+            self.assertEqual(tags.get(id=item["id"]).name, item["name"])
+
+    def test_bulk_get_existing_tags(self):
+        """ Test resolving only existing names issues one query. """
+        Tag.objects.create(user=self.user, name="Vegan")
+
+        with self.assertNumQueries(1):
+            res = self.client.post(
+                TAGS_BULK_URL,
+                {"names": ["Vegan"]},
+                format="json"
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_bulk_tags_invalid(self):
+        """ Test bulk tag names must be a non empty list. """
+        res = self.client.post(TAGS_BULK_URL, {"names": []}, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_create_tag_invalid(self):
         """ Test creating new tag with invalid payload. """
         payload = {"name": ""}
@@ -95,11 +203,173 @@ class PrivateTagsAPITests(TestCase):
             user=self.user
         )
         recipe.tags.add(first_tag)
+        first_tag.refresh_from_db()
 
         res = self.client.get(TAGS_URL, {"assigned_only": 1})
 
         first_serializer = TagSerializer(first_tag)
         second_serializer = TagSerializer(second_tag)
 
-        self.assertIn(first_serializer.data, res.data)
-        self.assertNotIn(second_serializer.data, res.data)
+        self.assertIn(first_serializer.data, res.data["results"])
+        self.assertNotIn(second_serializer.data, res.data["results"])
+
+    def test_retrieve_tags_assigned_unique(self):
+        """ Test filtering tags by assigned returns unique items. """
+        tag = Tag.objects.create(user=self.user, name="Breakfast")
+        Tag.objects.create(user=self.user, name="Lunch")
+        first_recipe = Recipe.objects.create(
+            title="Pancakes",
+            time_minutes=5,
+            price=3.00,
+            user=self.user
+        )
+        first_recipe.tags.add(tag)
+        second_recipe = Recipe.objects.create(
+            title="Porridge",
+            time_minutes=3,
+            price=2.00,
+            user=self.user
+        )
+        second_recipe.tags.add(tag)
+
+        res = self.client.get(TAGS_URL, {"assigned_only": 1})
+
+        self.assertEqual(len(res.data["results"]), 1)
+
+    def test_retrieve_tags_by_popularity(self):
+        """ Test tags can be listed most used first with their counts. """
+        rare = Tag.objects.create(user=self.user, name="Rare")
+        common = Tag.objects.create(user=self.user, name="Common")
+        Tag.objects.create(user=self.user, name="Unused")
+        for index in range(2):
+            recipe = Recipe.objects.create(
+                title=f"Recipe {index}",
+                time_minutes=5,
+                price=3.00,
+                user=self.user
+            )
+            recipe.tags.add(common)
+        recipe.tags.add(rare)
+
+        res = self.client.get(
+            TAGS_URL,
+            {"ordering": "popularity", "assigned_only": 1}
+        )
+
+        results = res.data["results"]
+        self.assertEqual(
+            [(tag["name"], tag["recipe_count"]) for tag in results],
+            [("Common", 2), ("Rare", 1)]
+        )
+
+    def test_retrieve_tags_invalid_ordering(self):
+        """ Test unknown orderings are rejected. """
+        res = self.client.get(TAGS_URL, {"ordering": "name"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_retrieve_tags_cached(self):
+        """ Test repeated tag lists are served from the cache. """
+        Tag.objects.create(user=self.user, name="Vegan")
+        first_res = self.client.get(TAGS_URL)
+
+        with self.assertNumQueries(0):
+            second_res = self.client.get(TAGS_URL)
+
+        self.assertEqual(second_res.status_code, status.HTTP_200_OK)
+        self.assertEqual(second_res.data, first_res.data)
+
+    def test_cached_tags_invalidated_on_create(self):
+        """ Test creating a tag expires the cached list. """
+        self.client.get(TAGS_URL)
+        self.client.post(TAGS_URL, {"name": "Dessert"})
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(len(res.data["results"]), 1)
+
+    def test_cached_assigned_tags_invalidated_on_recipe_change(self):
+        """ Test assigning a tag to a recipe expires the cached list. """
+        tag = Tag.objects.create(user=self.user, name="Breakfast")
+        recipe = Recipe.objects.create(
+            title="Pancakes",
+            time_minutes=5,
+            price=3.00,
+            user=self.user
+        )
+        self.client.get(TAGS_URL, {"assigned_only": 1})
+        recipe.tags.add(tag)
+
+        res = self.client.get(TAGS_URL, {"assigned_only": 1})
+
+        self.assertEqual(len(res.data["results"]), 1)
+
+    def test_retrieve_tags_not_modified(self):
+        """ Test a matching If-None-Match returns 304 without a body. """
+        Tag.objects.create(user=self.user, name="Vegan")
+        res = self.client.get(TAGS_URL)
+
+        res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=res["ETag"])
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertFalse(res.content)
+
+    def test_retrieve_tags_etag_changes(self):
+        """ Test the ETag changes when the list changes. """
+        res = self.client.get(TAGS_URL)
+        Tag.objects.create(user=self.user, name="Vegan")
+
+        res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=res["ETag"])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data["results"]), 1)
+
+
+@shared_cache
+class WorkerCacheTests(TestCase):
+    """ Test cached tag lists across worker processes. """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            "test@hackfeed.com",
+            "password123"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        Tag.objects.create(user=self.user, name="Vegan")
+
+    def worker(self, backend):
+        """ Handle requests as a worker with its own cache instance. """
+        return patch("recipe.cache.caches", {"shared": backend})
+
+    def list_after_other_worker_writes(self, first, second):
+        """ Cache a list in first, add a tag in second, list in first. """
+        with self.worker(first):
+            etag = self.client.get(TAGS_URL)["ETag"]
+        with self.worker(second):
+            self.client.post(TAGS_URL, {"name": "Dessert"})
+        with self.worker(first):
+            return self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+
+    def test_shared_cache_invalidated_by_other_worker(self):
+        """ Test a write in one worker expires the lists of the others. """
+        first = FileBasedCache(SHARED_CACHE_DIR, {})
+        second = FileBasedCache(SHARED_CACHE_DIR, {})
+        first.clear()
+
+        res = self.list_after_other_worker_writes(first, second)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data["results"]), 2)
+
+    def test_process_local_cache_skipped(self):
+        """ Test lists aren't cached in a cache local to one worker. """
+        first = LocMemCache("first-worker", {})
+        second = LocMemCache("second-worker", {})
+
+        with self.worker(first):
+            self.assertIsNone(cache.backend())
+        res = self.list_after_other_worker_writes(first, second)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data["results"]), 2)
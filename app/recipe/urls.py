@@ -12,5 +12,6 @@ router.register("recipes", views.RecipeViewSet)
 app_name = "recipe"
 
 urlpatterns = [
+    path("stats/", views.RecipeStatsView.as_view(), name="stats"),
     path("", include(router.urls))
 ]
@@ -1,33 +1,163 @@
+from functools import partial
+
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework import viewsets, mixins, status
-from rest_framework.authentication import TokenAuthentication
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.permissions import IsAuthenticated, SAFE_METHODS
 
+from core.authentication import CachedTokenAuthentication
+from core.db import routers
+from core.middleware import compression_exempt
 from core.models import Tag, Ingredient, Recipe
 
-from recipe import serializers
+from recipe import (
+    serializers, export, cache, bulk, images, search, stats
+)
+from recipe.filters import (
+    ATTR_ORDERINGS, tag_filter, ingredient_filter, get_field_list,
+    get_ids, get_match_mode, get_ordering, get_range_lookups
+)
+from recipe.pagination import RecipeAttrsPagination, RecipePagination
+
+
+class ReplicaReadMixin:
+    """ Serve safe requests from a read replica.
+
+    Clients that made a successful write within the pin period read from
+    the primary, so they always see their own changes.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS:
+            routers.route_reads(routers.choose_replica(request))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        alias = routers.read_alias()
+        if alias is not None and response.streaming:
+            response.streaming_content = routers.iterate_reading_from(
+                alias,
+                response.streaming_content
+            )
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            routers.pin(request, response)
+
+        return response
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            routers.route_reads(None)
+
+
+class CompiledListMixin:
+    """ List from ``values()`` rows when the serializer can be compiled.
+
+    Falls back to the regular serializer for nested or computed fields.
+    """
+
+    def list(self, request, *args, **kwargs):
+        serializer = self.get_serializer()
+        if not serializers.CompiledReadSerializer.supports(serializer):
+            return super().list(request, *args, **kwargs)
+        compiled = serializers.CompiledReadSerializer(serializer)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        columns = list(compiled.columns)
+        if self.paginator is not None:
+            # The cursor position is read from the row's ordering keys.
+            ordering = self.paginator.get_ordering(request, queryset, self)
+            columns += [field.lstrip("-") for field in ordering]
+        queryset = queryset.prefetch_related(None).values(
+            *dict.fromkeys(columns)
+        )
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(compiled.render(queryset))
+
+        return self.get_paginated_response(compiled.render(page))
 
 
-class BaseRecipeAttrsViewSet(viewsets.GenericViewSet,
+class BaseRecipeAttrsViewSet(ReplicaReadMixin,
+                             CompiledListMixin,
+                             viewsets.GenericViewSet,
                              mixins.ListModelMixin,
                              mixins.CreateModelMixin):
     """ Base viewset for user owned recipe attributes. """
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = RecipeAttrsPagination
+
+    def get_ordering(self):
+        """ Return the requested ordering, by name by default. """
+        return (
+            get_ordering(self.request.query_params, ATTR_ORDERINGS) or
+            self.pagination_class.ordering
+        )
 
     def get_queryset(self):
         """ Return objects for the current authenticated user only. """
         assigned_only = bool(self.request.query_params.get("assigned_only"))
-        queryset = self.queryset
+        queryset = self.queryset.filter(user=self.request.user)
         if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
+            # The maintained count avoids joining the through table.
+            queryset = queryset.filter(recipe_count__gt=0)
+
+        return queryset.order_by(*self.get_ordering())
+
+    def list(self, request, *args, **kwargs):
+        """ List attributes from the per-user response cache. """
+        key = cache.response_key(request, self.basename)
+        entry = cache.get_entry(key)
+        if entry is None:
+            data = super().list(request, *args, **kwargs).data
+            entry = cache.set_entry(key, data)
 
-        return queryset.filter(user=self.request.user).order_by("-name")
+        if cache.etag_matches(request, entry["etag"]):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(entry["data"])
+        response["ETag"] = entry["etag"]
+        patch_vary_headers(response, ("Authorization",))
+
+        return response
 
     def perform_create(self, serializer):
         """ Create a new attribute. """
-        serializer.save(user=self.request.user)
+        name = serializer.validated_data["name"]
+        model = serializer.Meta.model
+        exists = ValidationError({"name": [f"{name} already exists."]})
+        if model.objects.filter(user=self.request.user, name=name).exists():
+            raise exists
+        try:
+            with transaction.atomic():
+                serializer.save(user=self.request.user)
+        except IntegrityError:
+            raise exists
+
+    @action(methods=["POST"], detail=False)
+    def bulk(self, request):
+        """ Return attributes for a list of names, creating missing ones. """
+        serializer = serializers.AttrNamesSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        attrs = bulk.get_or_create_named(
+            self.queryset.model,
+            request.user,
+            serializer.validated_data["names"]
+        )
+
+        return Response(self.get_serializer(attrs, many=True).data)
 
 
 class TagViewSet(BaseRecipeAttrsViewSet):
@@ -42,30 +172,123 @@ class IngredientViewSet(BaseRecipeAttrsViewSet):
     serializer_class = serializers.IngredientSerializer
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ReplicaReadMixin,
+                    CompiledListMixin,
+                    viewsets.ModelViewSet):
     """ Manage recipes in the database. """
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
     queryset = Recipe.objects.all()
     serializer_class = serializers.RecipeSerializer
+    pagination_class = RecipePagination
+    read_fields = ("id", "title", "time_minutes", "price", "link")
+    export_chunk_size = 500
+    sparse_actions = ("list", "retrieve", "export")
 
-    def _params_to_ints(self, qs):
-        """ Convert a list of string IDs to a list of integers. """
-        return [int(str_id) for str_id in qs.split(",")]
+    def _search_text(self):
+        """ Return the stripped search query parameter. """
+        return self.request.query_params.get("search", "").strip()
+
+    def get_ordering(self):
+        """ Return the requested ordering.
+
+        Without one, best matches come first when searching and the newest
+        recipes otherwise.
+        """
+        ordering = get_ordering(self.request.query_params)
+        if ordering:
+            return ordering
+        elif self._search_text():
+            return ("-search_rank", "-id")
+
+        return ("-id",)
 
     def get_queryset(self):
         """ Retrieve the recipes for the authenticated user. """
         tags = self.request.query_params.get("tags")
         ingredients = self.request.query_params.get("ingredients")
-        queryset = self.queryset
+        text = self._search_text()
+        queryset = self.queryset.filter(
+            user=self.request.user,
+            **get_range_lookups(self.request.query_params)
+        )
+        if text:
+            queryset = search.match(queryset, text)
         if tags:
-            tag_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
+            tag_ids = get_ids(self.request.query_params, "tags")
+            mode = get_match_mode(self.request.query_params, "tags")
+            queryset = tag_filter.filter(queryset, tag_ids, mode)
         if ingredients:
-            ingredient_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredient_ids)
+            ingredient_ids = get_ids(self.request.query_params, "ingredients")
+            mode = get_match_mode(self.request.query_params, "ingredients")
+            queryset = ingredient_filter.filter(queryset, ingredient_ids, mode)
+        if self.action in ("list", "retrieve"):
+            queryset = self._shape_read_queryset(queryset)
+        elif self.action == "export":
+            queryset = queryset.only(*self._read_columns())
 
-        return queryset.filter(user=self.request.user)
+        return queryset.order_by(*self.get_ordering())
+
+    def _projection(self):
+        """ Return the fields and expand arguments of the request. """
+        if self.action not in self.sparse_actions:
+            return {}
+        meta = serializers.RecipeSerializer.Meta
+        projection = {}
+        fields = get_field_list(self.request.query_params, "fields",
+                                meta.fields)
+        expand = get_field_list(self.request.query_params, "expand",
+                                tuple(meta.expandable))
+        if fields is not None:
+            projection["fields"] = fields
+        if expand is not None:
+            projection["expand"] = expand
+
+        return projection
+
+    def _rendered_fields(self):
+        """ Return the names of the fields the serializer will render. """
+        return self._projection().get(
+            "fields",
+            serializers.RecipeSerializer.Meta.fields
+        )
+
+    def _read_columns(self):
+        """ Return the columns rendered or needed to order the results. """
+        needed = set(self._rendered_fields())
+        needed.update(field.lstrip("-") for field in self.get_ordering())
+
+        return [
+            field for field in self.read_fields
+            if field == "id" or field in needed
+        ]
+
+    def _read_prefetches(self):
+        """ Return prefetches loading only the relations rendered. """
+        rendered = self._rendered_fields()
+
+        return [
+            Prefetch(
+                field,
+                queryset=model.objects.only(
+                    "id", "name", "recipe_count"
+                ).order_by("id")
+            )
+            for field, model in (("tags", Tag), ("ingredients", Ingredient))
+            if field in rendered
+        ]
+
+    def _shape_read_queryset(self, queryset):
+        """ Load only the columns and relations the read serializers use. """
+        return queryset.only(*self._read_columns()).prefetch_related(
+            *self._read_prefetches()
+        )
+
+    def get_serializer(self, *args, **kwargs):
+        """ Return the serializer narrowed to the requested fields. """
+        kwargs.update(self._projection())
+
+        return super().get_serializer(*args, **kwargs)
 
     def get_serializer_class(self):
         """ Return appropriate serializer class. """
@@ -78,9 +301,60 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         """ Create a new recipe. """
-        serializer.save(user=self.request.user)
+        # The row, its links and the stats signals commit together.
+        with transaction.atomic():
+            serializer.save(user=self.request.user)
+
+    def perform_update(self, serializer):
+        """ Update a recipe. """
+        with transaction.atomic():
+            serializer.save()
+
+    def perform_destroy(self, instance):
+        """ Delete a recipe. """
+        with transaction.atomic():
+            instance.delete()
+
+    @action(methods=["POST", "PATCH", "DELETE"], detail=False)
+    def bulk(self, request):
+        """ Create, update or delete a batch of recipes atomically. """
+        if request.method == "DELETE":
+            bulk.delete_recipes(request.user, request.data)
+
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        elif request.method == "PATCH":
+            recipes = bulk.update_recipes(request.user, request.data)
+            response_status = status.HTTP_200_OK
+        else:
+            recipes = bulk.create_recipes(request.user, request.data)
+            response_status = status.HTTP_201_CREATED
+
+        serializer = self.get_serializer(recipes, many=True)
+
+        return Response(serializer.data, status=response_status)
+
+    @action(methods=["GET"], detail=False)
+    def export(self, request):
+        """ Stream all matching recipes as a JSON array or NDJSON. """
+        output = request.query_params.get("output", export.JSON)
+        if output not in export.STREAMS:
+            raise ValidationError({
+                "output": f"Must be one of: {', '.join(export.STREAMS)}."
+            })
+        chunks = export.iter_encoded(
+            self.get_queryset(),
+            partial(self.get_serializer_class(), **self._projection()),
+            self.export_chunk_size,
+            self._read_prefetches()
+        )
+
+        return StreamingHttpResponse(
+            export.STREAMS[output](chunks),
+            content_type=export.CONTENT_TYPES[output]
+        )
 
     @action(methods=["POST"], detail=True, url_path="upload-image")
+    @compression_exempt
     def upload_image(self, request, pk=None):
         """ Upload an image to a recipe. """
         recipe = self.get_object()
@@ -90,7 +364,8 @@ class RecipeViewSet(viewsets.ModelViewSet):
         )
 
         if serializer.is_valid():
-            serializer.save()
+            serializer.save(image_status="pending")
+            images.schedule(recipe.id)
 
             return Response(
                 serializer.data,
@@ -101,3 +376,51 @@ class RecipeViewSet(viewsets.ModelViewSet):
             serializer.errors,
             status=status.HTTP_400_BAD_REQUEST
         )
+
+    @action(methods=["GET"], detail=True)
+    def image(self, request, pk=None):
+        """ Return the processed image variant closest to a size. """
+        recipe = self.get_object()
+        format_key = request.query_params.get("image_format", "jpeg")
+        if format_key not in images.FORMATS:
+            raise ValidationError({
+                "image_format": f"Must be one of: {', '.join(images.FORMATS)}."
+            })
+        try:
+            size = int(request.query_params.get("size", 0))
+        except ValueError:
+            raise ValidationError({"size": "A valid integer is required."})
+
+        if recipe.image_status == "pending":
+            return Response(
+                {"image_status": recipe.image_status},
+                status=status.HTTP_202_ACCEPTED
+            )
+        variant = images.pick_variant(recipe, size, format_key)
+        if variant is None:
+            raise NotFound("No processed image for this recipe.")
+        serializer = serializers.RecipeImageVariantSerializer(
+            variant,
+            context=self.get_serializer_context()
+        )
+
+        return Response(serializer.data)
+
+
+class RecipeStatsView(ReplicaReadMixin, APIView):
+    """ Show the authenticated user's recipe statistics. """
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+    max_top = 50
+
+    def get(self, request):
+        try:
+            top = int(request.query_params.get("top", 5))
+        except ValueError:
+            raise ValidationError({"top": "A valid integer is required."})
+        if not 0 <= top <= self.max_top:
+            raise ValidationError({
+                "top": f"Must be between 0 and {self.max_top}."
+            })
+
+        return Response(stats.summary(request.user, top))
@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class UserConfig(AppConfig):
     name = 'user'
+
+    def ready(self):
+        from core import instrumentation
+        from user import login, signals  # noqa: F401
+
+        instrumentation.registry.add_collector(login.pool_metrics)
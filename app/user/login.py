@@ -0,0 +1,200 @@
+import hashlib
+import hmac
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import (
+    check_password, get_hasher, identify_hasher, make_password
+)
+from django.contrib.auth.signals import user_login_failed
+
+from rest_framework.exceptions import Throttled
+
+from core.cache import TTLCache
+
+
+logger = logging.getLogger(__name__)
+
+LOGIN_SETTINGS = {
+    "FAILURE_CACHE_SIZE": 10000,
+    "FAILURE_CACHE_TIMEOUT": 300,
+    "HASH_WORKERS": 2,
+    "HASH_MAX_PENDING": 16,
+    "HASH_TIMEOUT": 10,
+}
+LOGIN_SETTINGS.update(getattr(settings, "LOGIN", {}))
+
+
+class HashingPool:
+    """ Bounded thread pool for password hashing.
+
+    At most ``workers`` hashes run at once and ``max_pending`` more may
+    wait; further attempts are refused rather than queued, so a burst of
+    logins can't pile up unbounded CPU work.
+    """
+
+    def __init__(self, workers, max_pending):
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers,
+            thread_name_prefix="login-hash"
+        )
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        self._lock = threading.Lock()
+        self._counts = {
+            "in_flight": 0,
+            "max_in_flight": 0,
+            "completed": 0,
+            "rejected": 0,
+            "timed_out": 0,
+        }
+
+    def stats(self):
+        """ Return the pool's queue depth and counters. """
+        with self._lock:
+            stats = dict(self._counts)
+        stats["queued"] = max(stats["in_flight"] - self.workers, 0)
+
+        return stats
+
+    def _count(self, name, delta=1):
+        with self._lock:
+            self._counts[name] += delta
+            self._counts["max_in_flight"] = max(
+                self._counts["max_in_flight"],
+                self._counts["in_flight"]
+            )
+
+    def _finished(self, future):
+        self._count("in_flight", -1)
+        self._count("completed")
+        self._slots.release()
+
+    def run(self, func, *args, timeout=None):
+        """ Run func on the pool and return its result.
+
+        Raises Throttled when the pool and its queue are full or func
+        doesn't finish within timeout seconds. A timed out hash keeps its
+        slot until it finishes, so abandoned work still counts against
+        the bound.
+        """
+        if not self._slots.acquire(blocking=False):
+            self._count("rejected")
+            logger.warning("Login hashing pool full: %s", self.stats())
+            raise Throttled(detail="Too many logins in progress.")
+        self._count("in_flight")
+        try:
+            future = self._executor.submit(func, *args)
+        except BaseException:
+            self._count("in_flight", -1)
+            self._slots.release()
+            raise
+        future.add_done_callback(self._finished)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            self._count("timed_out")
+            raise Throttled(detail="Login timed out.")
+
+
+failed_logins = TTLCache(
+    LOGIN_SETTINGS["FAILURE_CACHE_SIZE"],
+    LOGIN_SETTINGS["FAILURE_CACHE_TIMEOUT"]
+)
+hashing_pool = HashingPool(
+    LOGIN_SETTINGS["HASH_WORKERS"],
+    LOGIN_SETTINGS["HASH_MAX_PENDING"]
+)
+
+
+def pool_metrics():
+    """ Return the hashing pool's samples for the metrics endpoint. """
+    stats = hashing_pool.stats()
+
+    return [
+        ("login_hash_in_flight", {}, stats["in_flight"]),
+        ("login_hash_queued", {}, stats["queued"]),
+        ("login_hash_max_in_flight", {}, stats["max_in_flight"]),
+        ("login_hash_completed_total", {}, stats["completed"]),
+        ("login_hash_rejected_total", {}, stats["rejected"]),
+        ("login_hash_timed_out_total", {}, stats["timed_out"]),
+    ]
+
+
+def normalise_email(email):
+    """ Return email in the form failures are remembered under. """
+    return email.strip().lower()
+
+
+def failure_key(email, password):
+    """ Return the failure cache key of credentials, hiding the password. """
+    digest = hmac.new(
+        settings.SECRET_KEY.encode(),
+        f"{email}\0{password}".encode(),
+        hashlib.sha256
+    ).hexdigest()
+
+    return (normalise_email(email), digest)
+
+
+def forget_failures(email):
+    """ Drop cached failures for an email, e.g. after a password change. """
+    email = normalise_email(email)
+    failed_logins.delete_matching(lambda value: value == email)
+
+
+def _verify(password, encoded):
+    """ Check a password against a hash off the request thread. """
+    if encoded is None:
+        # Hash anyway so unknown emails take as long as wrong passwords.
+        make_password(password)
+        return False
+
+    return check_password(password, encoded)
+
+
+def _needs_rehash(encoded):
+    """ Return whether a hash should be upgraded to the preferred hasher. """
+    preferred = get_hasher("default")
+    hasher = identify_hasher(encoded)
+
+    return (hasher.algorithm != preferred.algorithm or
+            preferred.must_update(encoded))
+
+
+def authenticate_login(request, email, password):
+    """ Return the active user with these credentials, or None.
+
+    Credentials that failed recently are rejected without hashing. The
+    hash is checked on the bounded hashing pool and upgraded when
+    PASSWORD_HASHERS prefers a different hasher or stronger parameters.
+    """
+    key = failure_key(email, password)
+    if failed_logins.get(key) is None:
+        user_model = get_user_model()
+        try:
+            user = user_model._default_manager.get_by_natural_key(email)
+        except user_model.DoesNotExist:
+            user = None
+        encoded = user.password if user is not None else None
+        valid = hashing_pool.run(
+            _verify, password, encoded,
+            timeout=LOGIN_SETTINGS["HASH_TIMEOUT"]
+        )
+        if valid and user.is_active:
+            if _needs_rehash(encoded):
+                user.set_password(password)
+                user.save(update_fields=["password"])
+            return user
+        failed_logins.set(key, key[0])
+
+    user_login_failed.send(
+        sender=__name__,
+        credentials={"username": email},
+        request=request
+    )
+
+    return None
@@ -1,10 +1,14 @@
-from django.contrib.auth import get_user_model, authenticate
+from django.contrib.auth import get_user_model
 from django.utils.translation import ugettext_lazy as _
 
 from rest_framework import serializers
 
+from core.instrumentation import TimedSerializerMixin
 
-class UserSerializer(serializers.ModelSerializer):
+from user.login import authenticate_login
+
+
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """ Serializer for the users object. """
 
     class Meta:
@@ -41,10 +45,10 @@ class AuthTokenSerializer(serializers.Serializer):
         email = attrs.get("email")
         password = attrs.get("password")
 
-        user = authenticate(
-            request=self.context.get("request"),
-            username=email,
-            password=password
+        user = authenticate_login(
+            self.context.get("request"),
+            email,
+            password
         )
         if not user:
             msg = _("Unable to authenticate with provided credentials")
@@ -0,0 +1,226 @@
+import threading
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.exceptions import Throttled
+from rest_framework.test import APIClient
+
+from core.throttling import TokenBucketStore, login_buckets
+from user import login
+
+
+TOKEN_URL = reverse("user:token")
+PAYLOAD = {"email": "test@hackfeed.com", "password": "testpass"}
+
+
+def reset_login_state(test):
+    """ Start a test with full buckets and no remembered failures. """
+    for state in (login_buckets, login.failed_logins):
+        state.clear()
+        test.addCleanup(state.clear)
+
+
+class TokenBucketStoreTests(TestCase):
+
+    @patch("core.throttling.time.monotonic")
+    def test_burst_then_refill(self, monotonic):
+        """ Test a bucket allows a burst and then refills over time. """
+        monotonic.return_value = 100.0
+        store = TokenBucketStore(10)
+
+        waits = [store.consume("key", 2, 0.5) for _ in range(3)]
+        self.assertEqual(waits[:2], [0, 0])
+        self.assertAlmostEqual(waits[2], 2.0)
+
+        monotonic.return_value = 102.0
+        self.assertEqual(store.consume("key", 2, 0.5), 0)
+
+    def test_bounded(self):
+        """ Test the least recently used buckets are evicted. """
+        store = TokenBucketStore(2)
+        for key in ("a", "b", "c"):
+            store.consume(key, 1, 1)
+
+        self.assertEqual(len(store), 2)
+
+
+class LoginPipelineTests(TestCase):
+
+    def setUp(self):
+        reset_login_state(self)
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(**PAYLOAD)
+
+    def login(self, **payload):
+        """ Post credentials to the token endpoint. """
+        return self.client.post(TOKEN_URL, {**PAYLOAD, **payload})
+
+    @override_settings(LOGIN_THROTTLE={"EMAIL_BURST": 2})
+    def test_throttled_per_email(self):
+        """ Test repeated attempts on one email are throttled. """
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+        self.login(password="wrong")
+
+        res = self.login()
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn("Retry-After", res)
+
+    @override_settings(LOGIN_THROTTLE={"IP_BURST": 2})
+    def test_throttled_per_ip(self):
+        """ Test attempts on many emails from one IP are throttled. """
+        self.login(email="one@hackfeed.com")
+        self.login(email="two@hackfeed.com")
+
+        res = self.login()
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @override_settings(LOGIN_THROTTLE={"IP_BURST": 2})
+    def test_forwarded_for_not_trusted(self):
+        """ Test a client can't dodge the IP limit with X-Forwarded-For. """
+        for index in range(2):
+            self.client.post(
+                TOKEN_URL,
+                {**PAYLOAD, "email": f"user{index}@hackfeed.com"},
+                HTTP_X_FORWARDED_FOR=f"10.0.0.{index}"
+            )
+
+        res = self.client.post(
+            TOKEN_URL,
+            {**PAYLOAD, "email": "user2@hackfeed.com"},
+            HTTP_X_FORWARDED_FOR="10.0.0.2"
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_repeated_failure_skips_hashing(self):
+        """ Test credentials that just failed aren't hashed again. """
+        self.login(password="wrong")
+
+        with patch.object(login.hashing_pool, "run") as run:
+            res = self.login(password="wrong")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        run.assert_not_called()
+
+    def test_unknown_email_hashed(self):
+        """ Test unknown emails still pay for a hash. """
+        with patch("user.login.make_password") as make_password:
+            res = self.login(email="nobody@hackfeed.com")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        make_password.assert_called_once_with(PAYLOAD["password"])
+
+    def test_password_change_forgets_failures(self):
+        """ Test a new password works even if it failed before. """
+        self.login(password="newpass")
+
+        self.user.set_password("newpass")
+        self.user.save()
+
+        self.assertEqual(
+            self.login(password="newpass").status_code,
+            status.HTTP_200_OK
+        )
+
+    def test_inactive_user_rejected(self):
+        """ Test inactive users can't log in. """
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertEqual(
+            self.login().status_code,
+            status.HTTP_400_BAD_REQUEST
+        )
+
+    def test_rehash_on_login(self):
+        """ Test hashes are upgraded to the preferred hasher on login. """
+        with override_settings(PASSWORD_HASHERS=[
+            "django.contrib.auth.hashers.MD5PasswordHasher",
+            "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+        ]):
+            self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+
+            self.user.refresh_from_db()
+            self.assertTrue(self.user.password.startswith("md5$"))
+            self.assertTrue(self.user.check_password(PAYLOAD["password"]))
+
+
+class HashingPoolTests(TestCase):
+
+    def test_run_and_stats(self):
+        """ Test results are returned and counted. """
+        pool = login.HashingPool(1, 0)
+
+        self.assertEqual(pool.run(sum, [1, 2]), 3)
+        self.assertEqual(pool.stats()["completed"], 1)
+
+    def test_full_pool_rejects(self):
+        """ Test attempts beyond the workers and queue are refused. """
+        pool = login.HashingPool(1, 0)
+        started = threading.Event()
+        release = threading.Event()
+
+        def block():
+            started.set()
+            release.wait(5)
+
+        thread = threading.Thread(target=pool.run, args=(block,))
+        thread.start()
+        started.wait(5)
+        try:
+            self.assertEqual(pool.stats()["in_flight"], 1)
+            with self.assertRaises(Throttled), \
+                    self.assertLogs("user.login", "WARNING"):
+                pool.run(sum, [1])
+        finally:
+            release.set()
+            thread.join()
+
+        self.assertEqual(pool.stats()["rejected"], 1)
+        self.assertEqual(pool.stats()["max_in_flight"], 1)
+
+    def test_timed_out_hash_keeps_slot(self):
+        """ Test abandoned hashes count against the bound until done. """
+        pool = login.HashingPool(1, 0)
+        release = threading.Event()
+
+        try:
+            with self.assertRaises(Throttled):
+                pool.run(release.wait, 5, timeout=0.01)
+
+            self.assertEqual(pool.stats()["in_flight"], 1)
+            self.assertEqual(pool.stats()["timed_out"], 1)
+            self.assertEqual(pool.stats()["completed"], 0)
+            with self.assertRaises(Throttled), \
+                    self.assertLogs("user.login", "WARNING"):
+                pool.run(sum, [1])
+        finally:
+            release.set()
+            pool._executor.shutdown(wait=True)
+
+        self.assertEqual(pool.stats()["in_flight"], 0)
+        self.assertEqual(pool.stats()["completed"], 1)
+
+    def test_exported_as_metrics(self):
+        """ Test the pool's depth and rejections are on the metrics page. """
+        pool = login.HashingPool(1, 0)
+        pool._count("rejected")
+
+        with patch.object(login, "hashing_pool", pool):
+            res = self.client.get(reverse("metrics"))
+
+        content = res.content.decode()
+        for line in (
+            "# TYPE login_hash_queued gauge",
+            "login_hash_in_flight 0",
+            "login_hash_queued 0",
+            "# TYPE login_hash_rejected_total counter",
+            "login_hash_rejected_total 1",
+        ):
+            self.assertIn(line, content)
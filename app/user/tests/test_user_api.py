@@ -5,6 +5,8 @@ from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from user.tests.test_login import reset_login_state
+
 
 CREATE_USER_URL = reverse("user:create")
 TOKEN_URL = reverse("user:token")
@@ -19,6 +21,7 @@ class PublicUserAPITests(TestCase):
     """ Test the users API (public). """
 
     def setUp(self):
+        reset_login_state(self)
         self.client = APIClient()
 
     def test_create_valid_user_success(self):